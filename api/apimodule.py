@@ -2,6 +2,9 @@ import os, re, time, requests, pandas as pd
 from urllib.parse import urlencode
 from pathlib import Path
 
+from instrumentation import REGISTRY, timed
+from vocabulary import VOCAB
+
 # HAL portal + filters
 HAL_PORTAL   = "u-pec"          # UPEC portal
 LANG_FILTER  = 'language_s:en'  # English only
@@ -60,9 +63,12 @@ FIELDS = ",".join([
     'keyword_t'
 ])
 
-BASE = f"https://api.archives-ouvertes.fr/search/{HAL_PORTAL}/"
+# HAL_API_BASE lets the benchmark harness point the crawler at its local stub server
+HAL_API_BASE = os.getenv("HAL_API_BASE", "https://api.archives-ouvertes.fr/search/")
+BASE = f"{HAL_API_BASE.rstrip('/')}/{HAL_PORTAL}/"
 
 
+@timed("fetch_page", rows=lambda data: len(data.get("response", {}).get("docs", [])))
 def fetch_page(cursor="*"):
     """Fetch one page from HAL using cursorMark pagination."""
     params = {
@@ -75,6 +81,8 @@ def fetch_page(cursor="*"):
         "fq": [LANG_FILTER, KEYWORD_FQ],   # English + must have keywords
     }
     r = requests.get(BASE, params=params, timeout=30)
+    REGISTRY.inc("http_requests_total", target="hal", status="ok" if r.ok else "error")
+    REGISTRY.inc("http_response_bytes_total", len(r.content), target="hal")
     r.raise_for_status()
     return r.json()
 
@@ -104,11 +112,11 @@ def consolidate_keywords(doc: dict) -> str:
     for k, v in doc.items():
         if k.lower().startswith("keyword"):
             if isinstance(v, list):
-                kw += [str(x) for x in v if str(x).strip()]
+                kw += [str(x) for x in v]
             elif v:
                 kw.append(str(v))
-    kw = sorted(set([x.strip() for x in kw if x.strip()]))
-    return "; ".join(kw)
+    # whitespace/separator variants of a keyword are one entry; case is kept (see vocabulary/)
+    return "; ".join(sorted(VOCAB.unique(kw)))
 
 def consolidate_domains(doc: dict) -> str:
     labels = to_list(doc.get("domainAll_s"))
@@ -189,11 +197,11 @@ def consolidate_keywords(doc: dict) -> str:
     for k, v in doc.items():
         if k.lower().startswith("keyword"):
             if isinstance(v, list):
-                kw += [str(x) for x in v if str(x).strip()]
+                kw += [str(x) for x in v]
             elif v:
                 kw.append(str(v))
-    kw = sorted(set([x.strip() for x in kw if x.strip()]))
-    return "; ".join(kw)
+    # whitespace/separator variants of a keyword are one entry; case is kept (see vocabulary/)
+    return "; ".join(sorted(VOCAB.unique(kw)))
 
 def consolidate_domains(doc: dict):
     labels = doc.get("domainAll_s")
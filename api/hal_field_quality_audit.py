@@ -3,7 +3,11 @@ import time
 import math
 import json
 import re
-from typing import Any, Dict, List, Tuple, Optional
+import csv
+import random
+import hashlib
+from array import array
+from typing import Any, Dict, Iterator, List, Tuple, Optional
 import requests
 import pandas as pd
 
@@ -14,6 +18,21 @@ PORTAL = "u-pec"         # p.ej. "u-pec" o "hal" (portal general)
 ROWS_PER_PAGE = 200      # seguro entre 200–500
 MAX_DOCS = 10         # cuántos docs quieres auditar (sube si quieres más robustez)
 SLEEP_SEC = 0.12         # respeta API
+SAMPLE_DOCS = 200        # filas de la hoja "sample_200" del Excel
+EXPORT_DOCS = True       # exportar los docs (sample_docs_rectangular.csv + hoja sample_200)
+EXPORT_DOCS_MAX = 5000   # tope de docs guardados para esa exportación; el perfil cubre todos
+COV_THRESHOLD = 30.0     # % mínimo de cobertura para recomendar KEEP en DB
+
+# Modo de auditoría: "full" = primeros MAX_DOCS docs por cursorMark;
+# "sample" = muestreo aleatorio estratificado por rangos de docid (ver StratifiedCoverageAudit)
+AUDIT_MODE = "full"
+N_STRATA = 10            # shards fq=docid:[a TO b]
+SAMPLE_MIN_DOCS = 100    # no se evalúa la parada antes de esto
+SAMPLE_MAX_DOCS = 2000   # tope de docs muestreados
+SAMPLE_ROUND = 50        # docs por ronda (repartidos proporcionalmente entre estratos)
+CI_Z = 1.96              # 95 %
+CI_HALF_WIDTH = 5.0      # puntos %: intervalo "estrecho" aunque no decida el umbral
+SAMPLE_SEED = 42
 
 # Filtros (agrega/quita; se envían como lista fq=)
 FQS = [
@@ -48,6 +67,27 @@ def fetch_page(cursor: str = "*", rows: int = ROWS_PER_PAGE, fqs: Optional[List[
     r.raise_for_status()
     return r.json()
 
+def solr_get(params: Dict[str, Any], fqs: Optional[List[str]] = None) -> Dict[str, Any]:
+    params = {"q": "*:*", "wt": "json", **params}
+    if fqs:
+        params["fq"] = fqs
+    r = requests.get(BASE, params=params, timeout=40)
+    r.raise_for_status()
+    return r.json()
+
+def count_docs(fqs: Optional[List[str]] = None) -> int:
+    return int(solr_get({"rows": 0}, fqs).get("response", {}).get("numFound", 0))
+
+def docid_bound(order: str, fqs: Optional[List[str]] = None) -> Optional[int]:
+    """docid mínimo ("asc") o máximo ("desc") con los filtros dados."""
+    docs = solr_get({"rows": 1, "fl": "docid", "sort": f"docid {order}"}, fqs).get("response", {}).get("docs", [])
+    return int(docs[0]["docid"]) if docs else None
+
+def fetch_doc_at(offset: int, fqs: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """El doc en la posición `offset` (orden por docid), con fl=*."""
+    docs = solr_get({"rows": 1, "start": offset, "fl": "*", "sort": "docid asc"}, fqs).get("response", {}).get("docs", [])
+    return docs[0] if docs else None
+
 def normalize_value(v: Any) -> Any:
     """Normaliza para DataFrame: deja listas como listas; objetos como JSON string."""
     # HAL devuelve mezclas: strings, listas, y a veces objetos.
@@ -61,31 +101,81 @@ def normalize_value(v: Any) -> Any:
     except Exception:
         return str(v)
 
-def harvest(max_docs: int, fqs: Optional[List[str]]) -> List[Dict[str, Any]]:
-    records, cursor = [], "*"
-    while len(records) < max_docs:
+def iter_harvest(max_docs: int, fqs: Optional[List[str]]) -> Iterator[Dict[str, Any]]:
+    """Recorre los docs por cursorMark y los entrega uno a uno sin acumularlos."""
+    seen, cursor = 0, "*"
+    while seen < max_docs:
         data = fetch_page(cursor=cursor, rows=ROWS_PER_PAGE, fqs=fqs)
         docs = data.get("response", {}).get("docs", [])
         if not docs:
             break
         for d in docs:
             # normalizamos valores por clave
-            norm = {k: normalize_value(v) for k, v in d.items()}
-            records.append(norm)
-            if len(records) >= max_docs:
-                break
+            yield {k: normalize_value(v) for k, v in d.items()}
+            seen += 1
+            if seen >= max_docs:
+                return
         next_c = data.get("nextCursorMark")
         if not next_c or next_c == cursor:
             break
         cursor = next_c
         time.sleep(SLEEP_SEC)
-    return records
 
-def build_rectangular_df(records: List[Dict[str, Any]]) -> pd.DataFrame:
-    """Une el universo de claves y regresa un DataFrame rectangular."""
-    # pandas ya alinea por columnas; nos aseguramos de no perder listas
-    df = pd.DataFrame.from_records(records)
-    return df
+class SparseColumns:
+    """Docs en formato columnar disperso: por campo, solo los índices de doc y los valores no vacíos.
+
+    Con fl=* hay cientos de campos y la mayoría de celdas están vacías; la memoria crece con
+    las celdas no vacías y no con docs × campos. El profiler y los exportadores leen de aquí.
+    """
+
+    def __init__(self):
+        self.n_rows = 0
+        self.columns: Dict[str, Tuple[array, List[Any]]] = {}  # campo -> (índices, valores)
+
+    def add(self, doc: Dict[str, Any]):
+        row = self.n_rows
+        self.n_rows += 1
+        for k, v in doc.items():
+            col = self.columns.get(k)
+            if col is None:
+                col = self.columns[k] = (array("l"), [])
+            if not is_empty_cell(v):
+                col[0].append(row)
+                col[1].append(v)
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def field_order(self, front: List[str]) -> List[str]:
+        """Campos con `front` (si existen) al principio y el resto en orden de aparición."""
+        head = [c for c in front if c in self.columns]
+        return head + [c for c in self.columns if c not in head]
+
+    def iter_rows(self, fields: List[str], limit: Optional[int] = None) -> Iterator[List[Any]]:
+        """Filas densas (None en celdas vacías) generadas una a una, sin materializar la tabla."""
+        pos = {f: 0 for f in fields}
+        for row in range(self.n_rows if limit is None else min(limit, self.n_rows)):
+            out = []
+            for f in fields:
+                idx, vals = self.columns[f]
+                i = pos[f]
+                if i < len(idx) and idx[i] == row:
+                    out.append(vals[i])
+                    pos[f] = i + 1
+                else:
+                    out.append(None)
+            yield out
+
+    def to_dataframe(self, fields: Optional[List[str]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        fields = fields or list(self.columns)
+        return pd.DataFrame(list(self.iter_rows(fields, limit)), columns=fields)
+
+    def to_csv(self, path: str, fields: Optional[List[str]] = None):
+        fields = fields or list(self.columns)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(fields)
+            w.writerows(self.iter_rows(fields))
 
 def is_empty_cell(x: Any) -> bool:
     """Considera vacío: None, '', [], {}."""
@@ -106,69 +196,239 @@ def cell_type(x: Any) -> str:
         return "scalar"
     return "json"
 
-def avg_len_nonempty(series: pd.Series) -> float:
-    """Longitud media (en caracteres) solo en celdas no vacías (scalar o json stringify)."""
-    lens = []
-    for v in series:
+def cell_len(v: Any) -> int:
+    """Longitud en caracteres de una celda no vacía (listas unidas con '; ')."""
+    if isinstance(v, list):
+        return len("; ".join([str(t) for t in v]))
+    return len(str(v))
+
+# =========================
+# PERFILADO EN STREAMING (una pasada, memoria acotada)
+# =========================
+class HyperLogLog:
+    """Estimador de cardinalidad: 2**p registros de 1 byte, error relativo ~1.04/sqrt(2**p)."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value: str):
+        h = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        idx = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)  # linear counting en rangos pequeños
+        return int(round(estimate))
+
+class FieldAccumulator:
+    """Métricas de un campo actualizadas celda a celda (una fila del informe de calidad)."""
+
+    EXACT_DISTINCT_LIMIT = 1000  # hasta aquí el conteo de distintos es exacto; después, HLL
+
+    def __init__(self):
+        self.nonempty = 0
+        self.type_counts = {"scalar": 0, "list": 0, "json": 0}
+        self.len_sum = 0
+        self.example = None
+        self._exact: Optional[set] = set()
+        self._hll = HyperLogLog()
+
+    def add(self, v: Any):
         if is_empty_cell(v):
-            continue
-        if isinstance(v, list):
-            s = "; ".join([str(t) for t in v])
-        else:
-            s = str(v)
-        lens.append(len(s))
-    return float(sum(lens)) / len(lens) if lens else 0.0
-
-def example_nonempty(series: pd.Series) -> Any:
-    for v in series:
-        if not is_empty_cell(v):
-            return v
-    return None
-
-def predominant_cell_type(series: pd.Series) -> str:
-    counts = {"scalar":0, "list":0, "json":0}
-    for v in series:
-        t = cell_type(v)
-        counts[t] = counts.get(t, 0) + 1
-    return max(counts, key=counts.get)
-
-def quality_report(df: pd.DataFrame) -> pd.DataFrame:
-    """Devuelve un DF con métricas por campo."""
-    rows = []
-    n = len(df)
-    for col in df.columns:
-        s = df[col]
-        nonempty_mask = ~s.apply(is_empty_cell)
-        nonempty = int(nonempty_mask.sum())
-        coverage = nonempty / n if n else 0.0
-        nunique = s[nonempty_mask].astype(str).nunique() if nonempty else 0
-        ex = example_nonempty(s)
-        avglen = avg_len_nonempty(s)
-        ptype = predominant_cell_type(s)
-        rows.append({
-            "field": col,
-            "nonempty": nonempty,
-            "total_rows": n,
-            "coverage_pct": round(100*coverage, 2),
-            "unique_nonempty": nunique,
-            "predominant_type": ptype,
-            "avg_len_nonempty": round(avglen, 1),
+            return
+        self.nonempty += 1
+        self.type_counts[cell_type(v)] += 1
+        self.len_sum += cell_len(v)
+        if self.example is None:
+            self.example = v
+        key = str(v)
+        self._hll.add(key)
+        if self._exact is not None:
+            self._exact.add(key)
+            if len(self._exact) > self.EXACT_DISTINCT_LIMIT:
+                self._exact = None
+
+    def distinct(self) -> int:
+        return len(self._exact) if self._exact is not None else self._hll.count()
+
+    def row(self, field: str, total_rows: int) -> Dict[str, Any]:
+        ex = self.example
+        return {
+            "field": field,
+            "nonempty": self.nonempty,
+            "total_rows": total_rows,
+            "coverage_pct": round(100 * self.nonempty / total_rows, 2) if total_rows else 0.0,
+            "unique_nonempty": self.distinct(),
+            "predominant_type": max(self.type_counts, key=self.type_counts.get),
+            "avg_len_nonempty": round(self.len_sum / self.nonempty, 1) if self.nonempty else 0.0,
             "example_value": ex if (isinstance(ex, (str,int,float)) or ex is None) else json.dumps(ex, ensure_ascii=False)  # para Excel
-        })
-    rep = pd.DataFrame(rows).sort_values(["coverage_pct","field"], ascending=[False, True])
-    return rep
+        }
+
+class StreamingFieldProfiler:
+    """Consume docs de iter_harvest uno a uno; una clave ausente en un doc cuenta como vacía."""
+
+    def __init__(self):
+        self.total_rows = 0
+        self.fields: Dict[str, FieldAccumulator] = {}
+
+    def add(self, doc: Dict[str, Any]):
+        self.total_rows += 1
+        for k, v in doc.items():
+            acc = self.fields.get(k)
+            if acc is None:
+                acc = self.fields[k] = FieldAccumulator()
+            acc.add(v)
+
+    def report(self) -> pd.DataFrame:
+        rows = [acc.row(field, self.total_rows) for field, acc in self.fields.items()]
+        return pd.DataFrame(rows).sort_values(["coverage_pct","field"], ascending=[False, True])
+
+# =========================
+# MUESTREO ESTRATIFICADO CON INTERVALOS DE CONFIANZA
+# =========================
+class Stratum:
+    def __init__(self, fq: str, size: int):
+        self.fq = fq
+        self.size = size
+        self.drawn = set()  # offsets ya muestreados (sin reemplazo)
+        self.profiler = StreamingFieldProfiler()
+
+    def exhausted(self) -> bool:
+        return len(self.drawn) >= self.size
+
+class StratifiedCoverageAudit:
+    """Estima coverage_pct de cada campo con una muestra aleatoria estratificada.
 
-def save_outputs(df_docs: pd.DataFrame, df_quality: pd.DataFrame):
+    El rango de docid se parte en N_STRATA shards (fq=docid:[a TO b]); en cada ronda se
+    muestrean docs al azar (offsets sin reemplazo) en proporción al tamaño de cada shard.
+    La cobertura es la media ponderada de los estratos y su varianza incluye la corrección
+    por población finita. El muestreo se detiene cuando, para todos los campos vistos, el
+    intervalo queda entero a un lado de COV_THRESHOLD o su semiancho es <= CI_HALF_WIDTH.
+    """
+
+    def __init__(self, fqs: Optional[List[str]], n_strata: int = N_STRATA, seed: int = SAMPLE_SEED):
+        self.fqs = list(fqs or [])
+        self.n_strata = n_strata
+        self.rng = random.Random(seed)
+        self.strata: List[Stratum] = []
+        self.profiler = StreamingFieldProfiler()  # métricas no ponderadas de toda la muestra
+        self.docs = SparseColumns()               # docs muestreados, para exportar
+
+    def build_strata(self):
+        lo, hi = docid_bound("asc", self.fqs), docid_bound("desc", self.fqs)
+        if lo is None or hi is None:
+            return
+        step = math.ceil((hi - lo + 1) / self.n_strata)
+        for a in range(lo, hi + 1, step):
+            fq = f"docid:[{a} TO {min(hi, a + step - 1)}]"
+            size = count_docs(self.fqs + [fq])
+            if size:
+                self.strata.append(Stratum(fq, size))
+            time.sleep(SLEEP_SEC)
+
+    @property
+    def population(self) -> int:
+        return sum(st.size for st in self.strata)
+
+    def draw(self, stratum: Stratum, k: int):
+        for _ in range(k):
+            if stratum.exhausted():
+                return
+            offset = self.rng.randrange(stratum.size)
+            while offset in stratum.drawn:
+                offset = self.rng.randrange(stratum.size)
+            stratum.drawn.add(offset)
+            doc = fetch_doc_at(offset, self.fqs + [stratum.fq])
+            time.sleep(SLEEP_SEC)
+            if doc is None:
+                continue
+            doc = {k: normalize_value(v) for k, v in doc.items()}
+            stratum.profiler.add(doc)
+            self.profiler.add(doc)
+            self.docs.add(doc)
+
+    def allocate(self, round_size: int) -> List[int]:
+        """Docs por estrato en una ronda: proporcional al tamaño, al menos 1 si quedan docs."""
+        N = self.population
+        return [0 if st.exhausted() else max(1, round(round_size * st.size / N)) for st in self.strata]
+
+    def coverage_ci(self, field: str, z: float = CI_Z) -> Tuple[float, float, float]:
+        """(coverage_pct, límite inferior, límite superior) en %."""
+        N = self.population
+        est, var = 0.0, 0.0
+        for st in self.strata:
+            n_h = st.profiler.total_rows
+            if not n_h:
+                continue
+            w = st.size / N
+            acc = st.profiler.fields.get(field)
+            x = acc.nonempty if acc else 0
+            est += w * x / n_h
+            # p "ajustado" (+1/+2) para que un estrato con 0 % o 100 % no tenga varianza nula
+            p_adj = (x + 1) / (n_h + 2)
+            var += w * w * p_adj * (1 - p_adj) / n_h * (1 - n_h / st.size)
+        half = z * math.sqrt(var)
+        return 100 * est, 100 * max(0.0, est - half), 100 * min(1.0, est + half)
+
+    def settled(self, threshold: float) -> bool:
+        for field in self.profiler.fields:
+            _, low, high = self.coverage_ci(field)
+            if low >= threshold or high < threshold or (high - low) / 2 <= CI_HALF_WIDTH:
+                continue
+            return False
+        return True
+
+    def run(self, threshold: float = COV_THRESHOLD, min_docs: int = SAMPLE_MIN_DOCS,
+            max_docs: int = SAMPLE_MAX_DOCS, round_size: int = SAMPLE_ROUND) -> "StratifiedCoverageAudit":
+        self.build_strata()
+        print(f"Población: {self.population} docs en {len(self.strata)} estratos")
+        while self.profiler.total_rows < max_docs:
+            plan = self.allocate(min(round_size, max_docs - self.profiler.total_rows))
+            if not any(plan):
+                break  # población agotada: la "muestra" es el censo
+            for st, k in zip(self.strata, plan):
+                self.draw(st, k)
+            print(f"  muestreados: {self.profiler.total_rows}")
+            if self.profiler.total_rows >= min_docs and self.settled(threshold):
+                break
+        return self
+
+    def report(self, threshold: float = COV_THRESHOLD) -> pd.DataFrame:
+        rep = self.profiler.report()
+        cis = [self.coverage_ci(f) for f in rep["field"]]
+        rep["coverage_pct"] = [round(c[0], 2) for c in cis]
+        rep["coverage_ci_low"] = [round(c[1], 2) for c in cis]
+        rep["coverage_ci_high"] = [round(c[2], 2) for c in cis]
+        rep["population_docs"] = self.population
+        rep["KEEP_candidate"] = [
+            "YES" if low >= threshold else "NO" if high < threshold else "UNCERTAIN"
+            for _, low, high in cis
+        ]
+        return rep.sort_values(["coverage_pct","field"], ascending=[False, True])
+
+def save_outputs(docs: Optional[SparseColumns], df_quality: pd.DataFrame, fields: Optional[List[str]] = None):
+    """Sin `docs` (EXPORT_DOCS = False) solo se guardan el informe de calidad y su hoja Excel."""
     csv_docs = os.path.join(OUT_DIR, "sample_docs_rectangular.csv")
     csv_quality = os.path.join(OUT_DIR, "field_quality_report.csv")
     xlsx_path = os.path.join(OUT_DIR, "hal_field_quality.xlsx")
 
-    df_docs.to_csv(csv_docs, index=False, encoding="utf-8")
+    if docs is not None:
+        docs.to_csv(csv_docs, fields)
     df_quality.to_csv(csv_quality, index=False, encoding="utf-8")
 
     with pd.ExcelWriter(xlsx_path, engine="xlsxwriter") as writer:
         df_quality.to_excel(writer, index=False, sheet_name="field_quality")
-        df_docs.head(200).to_excel(writer, index=False, sheet_name="sample_200")  # muestra para inspección
+        if docs is not None:
+            docs.to_dataframe(fields, limit=SAMPLE_DOCS).to_excel(writer, index=False, sheet_name="sample_200")  # muestra para inspección
         # ancho de columnas para calidad
         ws_q = writer.sheets["field_quality"]
         ws_q.set_column("A:A", 36)  # field
@@ -178,7 +438,8 @@ def save_outputs(df_docs: pd.DataFrame, df_quality: pd.DataFrame):
         ws_q.set_column("G:G", 18)  # avg_len
         ws_q.set_column("H:H", 80)  # example_value
 
-    print(f"Guardado CSV docs: {os.path.abspath(csv_docs)}")
+    if docs is not None:
+        print(f"Guardado CSV docs: {os.path.abspath(csv_docs)}")
     print(f"Guardado CSV quality: {os.path.abspath(csv_quality)}")
     print(f"Guardado Excel: {os.path.abspath(xlsx_path)}")
 
@@ -186,27 +447,38 @@ def save_outputs(df_docs: pd.DataFrame, df_quality: pd.DataFrame):
 # MAIN
 # =========================
 if __name__ == "__main__":
-    print(f"Portal: {PORTAL} | Filtros: {FQS} | Máx. docs: {MAX_DOCS}")
-    records = harvest(MAX_DOCS, FQS)
-    print(f"Docs recolectados: {len(records)}")
+    if AUDIT_MODE == "sample":
+        print(f"Portal: {PORTAL} | Filtros: {FQS} | Muestreo estratificado ({SAMPLE_MIN_DOCS}-{SAMPLE_MAX_DOCS} docs)")
+        audit = StratifiedCoverageAudit(FQS).run()
+        profiler, docs = audit.profiler, (audit.docs if EXPORT_DOCS else None)
+    else:
+        print(f"Portal: {PORTAL} | Filtros: {FQS} | Máx. docs: {MAX_DOCS}")
+        # el perfil se calcula al vuelo; solo los primeros EXPORT_DOCS_MAX docs se guardan para exportar
+        profiler = StreamingFieldProfiler()
+        docs = SparseColumns() if EXPORT_DOCS else None
+        for doc in iter_harvest(MAX_DOCS, FQS):
+            profiler.add(doc)
+            if docs is not None and len(docs) < EXPORT_DOCS_MAX:
+                docs.add(doc)
+    print(f"Docs recolectados: {profiler.total_rows}")
 
-    if not records:
+    if not profiler.total_rows:
         print("No se recuperaron documentos con esos filtros. Intenta quitar/ajustar FQS.")
         exit(0)
 
-    df_docs = build_rectangular_df(records)
     # opcional: reordenar primeras columnas “clásicas” si existen
-    front_cols = [c for c in ["docid","halId_s","title_s","abstract_s","domainAll_s","domainAllCode_s","keyword_s"] if c in df_docs.columns]
-    other_cols = [c for c in df_docs.columns if c not in front_cols]
-    df_docs = df_docs[front_cols + other_cols]
-
-    df_quality = quality_report(df_docs)
+    front = ["docid","halId_s","title_s","abstract_s","domainAll_s","domainAllCode_s","keyword_s"]
+    fields = docs.field_order(front) if docs is not None else None
 
-    # Recomendación “naive” para KEEP en DB (ajusta umbral según tu proyecto)
-    COV_THRESHOLD = 30.0  # % mínimo
-    df_quality["KEEP_candidate"] = df_quality["coverage_pct"].apply(lambda x: "YES" if x >= COV_THRESHOLD else "NO")
+    if AUDIT_MODE == "sample":
+        # KEEP según el intervalo: UNCERTAIN si cruza el umbral al llegar a SAMPLE_MAX_DOCS
+        df_quality = audit.report(COV_THRESHOLD)
+    else:
+        df_quality = profiler.report()
+        # Recomendación “naive” para KEEP en DB (ajusta umbral según tu proyecto)
+        df_quality["KEEP_candidate"] = df_quality["coverage_pct"].apply(lambda x: "YES" if x >= COV_THRESHOLD else "NO")
 
-    save_outputs(df_docs, df_quality)
+    save_outputs(docs, df_quality, fields)
 
     # Mini resumen por consola
     print("\nTOP 25 campos por cobertura:")
@@ -214,6 +486,5 @@ if __name__ == "__main__":
 
     # Sugerencia: imprime algunas claves interesantes si existen
     for k in ["status_i","docType_s","producedDate_tdate","submittedDate_tdate","authorityInstitution_s","authOrganismId_i"]:
-        if k in df_docs.columns:
-            filled = df_docs[k].notna().sum()
-            print(f"Campo {k}: {filled}/{len(df_docs)} no vacíos")
+        if k in profiler.fields:
+            print(f"Campo {k}: {profiler.fields[k].nonempty}/{profiler.total_rows} no vacíos")
@@ -1,7 +1,8 @@
-import os, re, time, requests, pandas as pd
+import argparse, os, re, time, requests, pandas as pd
 from urllib.parse import urlencode
 from pathlib import Path
 
+from instrumentation import add_profile_args, finish_run, maybe_profile, serve_from_env, stage
 from api.apimodule import NEED_N, choose_url, consolidate_domains, consolidate_keywords, \
     fallback_text_match_for_discipline, fetch_page, hal_record_url, map_codes_to_discipline, savetojson
 
@@ -9,13 +10,10 @@ NEED_N = 5
 FIELD ="Chemical Engineering"
 FILE ="upec_chemical_20_5.json"
 
-records, cursor = [], "*"
-
-if __name__ == '__main__':
-    """call api module"""
-    # Crawl
-    
-    while len(records) < NEED_N:
+def crawl(need_n=NEED_N, field=FIELD, sleep_sec=0.12):
+    """Crawl HAL until `need_n` records of `field` (any of the 5 disciplines if None) are collected."""
+    records, cursor = [], "*"
+    while len(records) < need_n:
         data = fetch_page(cursor)
         docs = data.get("response", {}).get("docs", [])
         if not docs: #si nohay documentos no hago nada
@@ -51,7 +49,7 @@ if __name__ == '__main__':
             if discipline is None:
                 continue  # not one of your 5 buckets
 
-            if discipline != FIELD:
+            if field is not None and discipline != field:
                  continue
 
             d["discipline"] = discipline
@@ -84,29 +82,46 @@ if __name__ == '__main__':
                 'keyword_t': d.get("keyword_t")
     })
 
-            if len(records) >= NEED_N:
+            if len(records) >= need_n:
                 break
 
         next_c = data.get("nextCursorMark")
         if not next_c or next_c == cursor:
             break
         cursor = next_c
-        time.sleep(0.12)
+        time.sleep(sleep_sec)
+    return records
+
+
+def main():
+    """call api module"""
+    # Crawl
+    serve_from_env()
+    with stage("crawl"):
+        records = crawl()
 
     # ---------------------------------------------
     # ✅ Save results inside /api/data/
     # ---------------------------------------------
-    df_sample = pd.DataFrame.from_records(records)
-    print("Rows in sample:", len(df_sample))
-    df_sample = df_sample.drop(columns=["domain_labels"], errors="ignore")
+    with stage("save"):
+        df_sample = pd.DataFrame.from_records(records)
+        print("Rows in sample:", len(df_sample))
+        df_sample = df_sample.drop(columns=["domain_labels"], errors="ignore")
+
+        # Define /api/data/ directory and file names
+        BASE_DIR = Path(__file__).resolve().parent / "data"
+        BASE_DIR.mkdir(parents=True, exist_ok=True)
 
-    # Define /api/data/ directory and file names
-    BASE_DIR = Path(__file__).resolve().parent / "data"
-    BASE_DIR.mkdir(parents=True, exist_ok=True)
+        json_path = BASE_DIR / FILE
 
-    json_path = BASE_DIR / FILE
-   
-    # Save to JSON (via your apimodule function)
-    savetojson(df_sample, json_path.name)  # ✅ will save to /api/data/
+        # Save to JSON (via your apimodule function)
+        savetojson(df_sample, json_path.name)  # ✅ will save to /api/data/
+    finish_run("harvest")
 
-  
\ No newline at end of file
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Harvest a HAL sample into api/data/.")
+    add_profile_args(parser)
+    args = parser.parse_args()
+    with maybe_profile("harvest", args):
+        main()
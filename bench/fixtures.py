@@ -0,0 +1,223 @@
+"""
+Fixtures replayed by the benchmark stub server.
+
+HAL: raw `search` docs. `python -m bench.fixtures record` saves real pages to
+bench/fixtures/hal_docs.json.gz; without a recording the api/data samples are
+converted back to the raw HAL shape. `scale_corpus` replicates them (new docids)
+to any corpus size.
+
+Wikidata: `wbsearchentities`/`wbgetentities` responses keyed by their request
+parameters, recorded from the linker's own API cache. Requests missing from the
+recording get deterministic synthetic responses (see `SyntheticWikidata`).
+
+No recording is committed: until `record` has been run, HAL comes from the samples and
+every Wikidata answer is synthetic (`fixture_sources` says which).
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+HAL_FIXTURE = FIXTURE_DIR / "hal_docs.json.gz"
+WIKIDATA_FIXTURE = FIXTURE_DIR / "wikidata_responses.json.gz"
+SAMPLE_DIR = REPO_ROOT / "api" / "data"
+
+# Keys added by api/main.py on top of the raw HAL doc
+DERIVED_KEYS = ("keywords_joined", "domain_codes", "domain_labels", "discipline", "url_primary")
+DOCID_STRIDE = 100_000_000  # docid offset between replicas of the fixture
+
+
+def read_json(path: Path):
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(obj, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+
+
+# =============== HAL =================
+
+def sample_to_hal_doc(rec: Dict) -> Dict:
+    """api/data record -> raw HAL doc (lists for multi-valued fields, no derived keys)."""
+    doc = {k: v for k, v in rec.items() if k not in DERIVED_KEYS and v is not None}
+    codes = rec.get("domain_codes")
+    if codes:
+        doc["domainAllCode_s"] = [c.strip() for c in codes.split(";") if c.strip()]
+    if doc.get("docid") is not None:
+        doc["docid"] = int(doc["docid"])
+    return doc
+
+
+def load_hal_docs(path: Path = HAL_FIXTURE) -> List[Dict]:
+    if path.exists():
+        return read_json(path)
+    docs, seen = [], set()
+    for sample in sorted(SAMPLE_DIR.glob("*.json")):
+        for rec in read_json(sample):
+            doc = sample_to_hal_doc(rec)
+            if doc.get("docid") in seen:
+                continue
+            seen.add(doc.get("docid"))
+            docs.append(doc)
+    return docs
+
+
+def scale_corpus(docs: List[Dict], n: int) -> List[Dict]:
+    """`n` docs sorted by docid: the fixture repeated with shifted docids and halIds."""
+    out = []
+    replica = 0
+    while len(out) < n:
+        for doc in docs:
+            if len(out) >= n:
+                break
+            if replica:
+                doc = {**doc, "docid": doc["docid"] + replica * DOCID_STRIDE}
+                if doc.get("halId_s"):
+                    doc["halId_s"] = f"{doc['halId_s']}-r{replica}"
+            out.append(doc)
+        replica += 1
+    out.sort(key=lambda d: d["docid"])
+    return out
+
+
+# =============== WIKIDATA =================
+
+def wikidata_key(params: Dict) -> str:
+    """Request identity as seen over HTTP: every value as a string, without `format`."""
+    return json.dumps({k: str(v) for k, v in params.items() if k != "format"}, sort_keys=True)
+
+
+def load_wikidata_responses(path: Path = WIKIDATA_FIXTURE) -> Dict[str, Dict]:
+    return read_json(path) if path.exists() else {}
+
+
+def fixture_sources() -> Dict[str, str]:
+    """What the stub server replays, for reports."""
+    return {
+        "hal_source": "recorded" if HAL_FIXTURE.exists() else "api/data samples",
+        "wikidata_source": "recorded (synthetic for missing requests)" if WIKIDATA_FIXTURE.exists() else "synthetic",
+    }
+
+
+def _qid(text: str, base: int = 1_000_000, span: int = 8_000_000) -> str:
+    return f"Q{base + int(hashlib.sha1(text.lower().encode('utf-8')).hexdigest()[:8], 16) % span}"
+
+
+class SyntheticWikidata:
+    """Deterministic stand-in responses: each term gets three candidates, each entity a
+    P31 and a P279 chain of up to three classes, so the linker exercises every code path."""
+
+    CLASS_BASE = 900_000
+    N_CLASSES = 40
+    P31_CONCEPT = "Q151885"
+
+    def __init__(self):
+        self.labels: Dict[str, str] = {}
+
+    def search(self, term: str, limit: int) -> Dict:
+        term = term[len("label:"):] if term.startswith("label:") else term
+        hits = []
+        for variant in (term, f"{term} theory", f"{term} (journal)"):
+            qid = _qid(variant)
+            self.labels[qid] = variant
+            hits.append({"id": qid, "label": variant, "description": f"synthetic entity for {variant}",
+                         "aliases": [], "match": {"type": "label", "text": variant}})
+        return {"search": hits[:limit], "success": 1}
+
+    def _claim(self, qid: str) -> Dict:
+        return {"mainsnak": {"datavalue": {"value": {"id": qid}}}}
+
+    def _class_parent(self, n: int) -> Optional[int]:
+        return None if n == 0 else n // 3
+
+    def entity(self, qid: str) -> Dict:
+        num = int(qid[1:])
+        if self.CLASS_BASE <= num < self.CLASS_BASE + self.N_CLASSES:
+            n = num - self.CLASS_BASE
+            label = f"class {n}"
+            parent = self._class_parent(n)
+            claims = {"P279": [self._claim(f"Q{self.CLASS_BASE + parent}")]} if parent is not None else {}
+        else:
+            label = self.labels.get(qid, qid)
+            claims = {
+                "P31": [self._claim(self.P31_CONCEPT)],
+                "P279": [self._claim(f"Q{self.CLASS_BASE + num % self.N_CLASSES}")],
+            }
+            if label.endswith("(journal)"):
+                claims["P31"] = [self._claim("Q737498")]  # academic journal: blocked by the linker
+        return {"id": qid, "labels": {lg: {"language": lg, "value": label} for lg in ("en", "fr")},
+                "descriptions": {"en": {"language": "en", "value": f"synthetic entity for {label}"}},
+                "aliases": {}, "claims": claims}
+
+    def respond(self, params: Dict) -> Dict:
+        action = params.get("action")
+        if action == "wbsearchentities":
+            return self.search(params.get("search", ""), int(params.get("limit", 7)))
+        if action == "wbgetentities":
+            return {"entities": {q: self.entity(q) for q in params.get("ids", "").split("|") if q}, "success": 1}
+        return {"error": {"code": "badvalue", "info": f"unsupported action {action!r}"}}
+
+
+# =============== RECORDING =================
+
+def record(n_docs: int, link_docs: int):
+    """Save real HAL pages and the Wikidata responses the linker needs for them."""
+    sys.path.insert(0, str(REPO_ROOT))
+    from api import apimodule
+
+    docs, cursor = [], "*"
+    while len(docs) < n_docs:
+        data = apimodule.fetch_page(cursor)
+        page = data.get("response", {}).get("docs", [])
+        if not page:
+            break
+        docs.extend(page)
+        next_c = data.get("nextCursorMark")
+        if not next_c or next_c == cursor:
+            break
+        cursor = next_c
+    docs = docs[:n_docs]
+    write_json(docs, HAL_FIXTURE)
+    print(f"HAL: {len(docs)} docs -> {HAL_FIXTURE}")
+
+    sys.path.insert(0, str(REPO_ROOT / "wikidata"))
+    from linking_runner import load_linker
+
+    linker = load_linker()
+    linker.LINKER_BACKEND = "api"
+    linker.map_keywords(docs[:link_docs], None)
+    responses = {wikidata_key(json.loads(k)): v for k, v in linker._API_CACHE.items()}
+    write_json(responses, WIKIDATA_FIXTURE)
+    print(f"Wikidata: {len(responses)} responses -> {WIKIDATA_FIXTURE}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fixtures.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record", help="record HAL pages and Wikidata responses from the live APIs")
+    rec.add_argument("--docs", type=int, default=500)
+    rec.add_argument("--link-docs", type=int, default=100)
+    sub.add_parser("info", help="show what the stub server would replay")
+    args = parser.parse_args()
+
+    if args.cmd == "record":
+        record(args.docs, args.link_docs)
+    else:
+        sources = fixture_sources()
+        print(f"HAL docs: {len(load_hal_docs())} ({sources['hal_source']})")
+        print(f"Wikidata responses: {len(load_wikidata_responses())} recorded; source: {sources['wikidata_source']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+End-to-end benchmark: harvest -> normalize -> load -> link -> graph.
+
+Every stage runs against local stand-ins: HAL and Wikidata are replayed by
+bench.stub_server, MySQL is a SQLite file (or --mysql-url), and Neo4j is an
+in-memory driver (or --neo4j-uri). For each corpus size and stage the report
+gives units processed, wall time, throughput, p50/p99 latency per unit and peak
+RSS, as JSON.
+
+    python -m bench.run_bench --sizes 1000,10000,100000 --out bench_results.json
+
+Latency units: harvest = one HAL page, normalize/load = one chunk of --chunk docs
+(all five tables), link = one document, graph = one UNWIND write transaction.
+
+As in the orchestrator, link records the graph rows map_keywords produces (documents,
+keywords, items, P31 types and the P279 lineage) and graph writes them through the
+linker's Neo4jConnector.
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from bench.fixtures import REPO_ROOT, fixture_sources, load_hal_docs, load_wikidata_responses, sample_to_hal_doc, scale_corpus
+from bench.standins import InMemoryDriver, TimedDriver, sqlite_url
+from bench.stub_server import StubServer
+from bench.synthetic import CorpusModel, generate
+from orchestrator.stages import GraphRowRecorder
+
+STAGES = ["harvest", "normalize", "load", "link", "graph"]
+TABLES = ["documents", "authors", "keywords", "identifiers", "organisms"]
+
+try:
+    import psutil
+except ImportError:  # optional
+    psutil = None
+
+
+# =============== MEASUREMENT =================
+
+def rss_bytes() -> int:
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource  # peak of the whole process, the best we can do here
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSS:
+    """Samples the RSS in a background thread while the block runs."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self) -> "PeakRSS":
+        self.start = self.peak = rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+def percentile_ms(sorted_lat: List[float], q: float) -> Optional[float]:
+    if not sorted_lat:
+        return None
+    return round(sorted_lat[min(len(sorted_lat) - 1, int(len(sorted_lat) * q))] * 1000, 3)
+
+
+def summarize(units: int, latencies: List[float], wall: float, rss: PeakRSS, **extra) -> Dict:
+    lat = sorted(latencies)
+    return {
+        "units": units,
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(units / wall, 1) if wall else None,
+        "p50_ms": percentile_ms(lat, 0.5),
+        "p99_ms": percentile_ms(lat, 0.99),
+        "latency_samples": len(lat),
+        "rss_start_mb": round(rss.start / 2**20, 1),
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+        **extra,
+    }
+
+
+def timed(fn: Callable, latencies: List[float]) -> Callable:
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - t0)
+    return wrapper
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """The stages print per document/table; keep that out of the report."""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def chunks(seq: List, size: int):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+# =============== STAGES =================
+
+class _NoWait:
+    """Rate limiter for the linker's `_get`: the stub needs no politeness delay."""
+
+    def wait(self):
+        pass
+
+
+def stage_harvest(size: int) -> Dict:
+    from api import main as harvest_main
+
+    latencies: List[float] = []
+    original = harvest_main.fetch_page
+    harvest_main.fetch_page = timed(original, latencies)
+    try:
+        t0 = time.perf_counter()
+        with PeakRSS() as rss, quiet():
+            records = harvest_main.crawl(need_n=size, field=None, sleep_sec=0)
+        wall = time.perf_counter() - t0
+    finally:
+        harvest_main.fetch_page = original
+    return {"records": records, "summary": summarize(len(records), latencies, wall, rss, pages=len(latencies))}
+
+
+def stage_normalize(records: List[Dict], chunk: int) -> Dict:
+    import pandas as pd
+    from pipeline import main as pipeline_main
+
+    normalizers = [pipeline_main.normalize_documents, pipeline_main.normalize_authors,
+                   pipeline_main.normalize_keywords, pipeline_main.normalize_identifiers,
+                   pipeline_main.normalize_organisms]
+    latencies: List[float] = []
+    tables: Dict[str, List] = {t: [] for t in TABLES}
+    t0 = time.perf_counter()
+    with PeakRSS() as rss, quiet():
+        for part in chunks(records, chunk):
+            t1 = time.perf_counter()
+            df = pd.DataFrame(part)
+            for table, fn in zip(TABLES, normalizers):
+                tables[table].append(fn(df))
+            latencies.append(time.perf_counter() - t1)
+    wall = time.perf_counter() - t0
+    rows = {t: sum(len(df) for df in dfs) for t, dfs in tables.items()}
+    return {"tables": tables, "summary": summarize(len(records), latencies, wall, rss, rows=rows)}
+
+
+def use_database(url: str):
+    """Point pipeline.load (and pipeline.main, which imports load_data) at `url`; the engine
+    is built from PIPELINE_DB_URL at import, so both modules are reloaded."""
+    os.environ["PIPELINE_DB_URL"] = url
+    from pipeline import load, main as pipeline_main
+
+    importlib.reload(load)
+    importlib.reload(pipeline_main)
+
+
+def table_rows(tables: List[str]) -> Dict[str, int]:
+    """Rows actually in the database, so a load that wrote nothing shows up in the report."""
+    from sqlalchemy import inspect, text
+    from pipeline.load import engine
+
+    existing = set(inspect(engine).get_table_names())
+    with engine.connect() as conn:
+        return {t: conn.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar() if t in existing else 0 for t in tables}
+
+
+def stage_load(tables: Dict[str, List]) -> Dict:
+    from pipeline.load import load_data
+
+    latencies: List[float] = []
+    errors: Dict[str, str] = {}
+    n_chunks = max((len(dfs) for dfs in tables.values()), default=0)
+    t0 = time.perf_counter()
+    with PeakRSS() as rss, quiet():
+        for i in range(n_chunks):
+            t1 = time.perf_counter()
+            for table, dfs in tables.items():
+                if i >= len(dfs) or dfs[i].empty or table in errors:
+                    continue
+                try:
+                    load_data(dfs[i], table, if_exists="append")
+                except Exception as e:  # report, keep measuring the other tables
+                    errors[table] = f"{type(e).__name__}: {e}"[:300]
+            latencies.append(time.perf_counter() - t1)
+    wall = time.perf_counter() - t0
+    rows = sum(len(df) for t, dfs in tables.items() if t not in errors for df in dfs)
+    return {"summary": summarize(rows, latencies, wall, rss, chunks=n_chunks, errors=errors,
+                                 db_rows=table_rows(list(tables)))}
+
+
+def load_linker(wikidata_api: str):
+    sys.path.insert(0, str(REPO_ROOT / "wikidata"))
+    from linking_runner import load_linker as _load
+
+    linker = _load()
+    linker.LINKER_BACKEND = "api"
+    linker.WIKIDATA_API = wikidata_api
+    linker.RATE_LIMITER = _NoWait()
+    linker._API_CACHE.clear()  # each corpus size starts cold
+    return linker
+
+
+def stage_link(linker, records: List[Dict]) -> Dict:
+    latencies: List[float] = []
+    rows: List[Dict] = []
+    recorder = GraphRowRecorder()
+    conn = linker.BulkExportConnector(recorder)  # the P31/P279 ingestion runs and is recorded
+    t0 = time.perf_counter()
+    with PeakRSS() as rss, quiet():
+        for rec in records:
+            t1 = time.perf_counter()
+            rows.extend(linker.map_keywords([rec], conn))
+            latencies.append(time.perf_counter() - t1)
+    wall = time.perf_counter() - t0
+    linked = sum(1 for r in rows if r.get("wikidata_qid"))
+    return {"graph_rows": recorder.rows, "summary": summarize(len(records), latencies, wall, rss,
+                                                              csv_rows=len(rows), linked_rows=linked,
+                                                              graph_rows=len(recorder.rows),
+                                                              api_cache_entries=len(linker._API_CACHE))}
+
+
+def stage_graph(linker, graph_rows: List, neo4j_cfg: Optional[tuple]) -> Dict:
+    from neo4j import GraphDatabase
+
+    if neo4j_cfg:
+        uri, user, password = neo4j_cfg
+        driver = TimedDriver(GraphDatabase.driver(uri, auth=(user, password)))
+    else:
+        driver = TimedDriver(InMemoryDriver())
+    conn = linker.Neo4jConnector(None, None, None, driver=driver)
+
+    counts: Dict[str, int] = {}
+    t0 = time.perf_counter()
+    with PeakRSS() as rss, quiet():
+        try:
+            for name, row in graph_rows:
+                conn.batch.add(name, row)
+                counts[name] = counts.get(name, 0) + 1
+        finally:
+            conn.close()
+    wall = time.perf_counter() - t0
+    return {"summary": summarize(len(graph_rows), driver.latencies, wall, rss,
+                                 transactions=len(driver.latencies), rows=counts)}
+
+
+# =============== RUNNER =================
+
+def build_corpus(kind: str, size: int, hal_docs: List[Dict], model: Optional[CorpusModel], seed: int) -> Iterable[Dict]:
+    if kind == "synthetic":  # streamed to the stub server as the harvest pages through it
+        return (sample_to_hal_doc(rec) for rec in generate(size, seed, model=model))
+    return scale_corpus(hal_docs, size)
+
+
+def bench_size(stub: StubServer, corpus: Iterable[Dict], size: int, stages: List[str],
+               chunk: int, max_link_docs: Optional[int], neo4j_cfg: Optional[tuple]) -> Dict:
+    stub.reset(corpus, total=size)
+    result: Dict = {"corpus_docs": size, "stages": {}}
+
+    harvested = stage_harvest(size)
+    records = harvested["records"]
+    if "harvest" in stages:
+        result["stages"]["harvest"] = harvested["summary"]
+
+    if "normalize" in stages or "load" in stages:
+        normalized = stage_normalize(records, chunk)
+        if "normalize" in stages:
+            result["stages"]["normalize"] = normalized["summary"]
+        if "load" in stages:
+            result["stages"]["load"] = stage_load(normalized["tables"])["summary"]
+
+    if "link" in stages or "graph" in stages:
+        linker = load_linker(stub.wikidata_api)
+        to_link = records[:max_link_docs] if max_link_docs else records
+        linked = stage_link(linker, to_link)
+        if "link" in stages:
+            result["stages"]["link"] = linked["summary"]
+        if "graph" in stages:
+            result["stages"]["graph"] = stage_graph(linker, linked["graph_rows"], neo4j_cfg)["summary"]
+
+    result["stub_requests"] = dict(stub.counts)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against local stand-ins.")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--corpus", choices=["fixture", "synthetic"], default="fixture",
+                        help="replicated fixture docs, or bench.synthetic records fitted to api/data")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic corpus")
+    parser.add_argument("--chunk", type=int, default=1000, help="docs per normalize/load chunk")
+    parser.add_argument("--max-link-docs", type=int, default=None,
+                        help="link/graph only the first N harvested docs (the slowest stages)")
+    parser.add_argument("--mysql-url", default=None, help="SQLAlchemy URL; default: temporary SQLite file")
+    parser.add_argument("--neo4j-uri", default=None, help="real Neo4j instead of the in-memory driver")
+    parser.add_argument("--neo4j-user", default="neo4j")
+    parser.add_argument("--neo4j-password", default="test")
+    parser.add_argument("--out", type=Path, default=Path("bench_results.json"))
+    args = parser.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",")]
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+    neo4j_cfg = (args.neo4j_uri, args.neo4j_user, args.neo4j_password) if args.neo4j_uri else None
+
+    hal_docs = load_hal_docs()
+    model = CorpusModel.fit() if args.corpus == "synthetic" else None
+    wikidata_responses = load_wikidata_responses()
+    if not wikidata_responses:
+        print("warning: no recorded Wikidata responses (python -m bench.fixtures record); "
+              "link/graph run against synthetic answers", file=sys.stderr)
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": args.corpus,
+        "fixture_docs": len(hal_docs),
+        **fixture_sources(),
+        "recorded_wikidata_responses": len(wikidata_responses),
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp, StubServer([], wikidata_responses) as stub:
+        os.environ["HAL_API_BASE"] = stub.hal_base
+        for size in sizes:
+            # fresh database per size so load times are not skewed by earlier rows
+            use_database(args.mysql_url or sqlite_url(Path(tmp) / f"pipeline_{size}.db"))
+            print(f"== {size} docs", file=sys.stderr)
+            corpus = build_corpus(args.corpus, size, hal_docs, model, args.seed)
+            report["results"].append(bench_size(stub, corpus, size, stages,
+                                                args.chunk, args.max_link_docs, neo4j_cfg))
+
+    args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    failed = [(r["corpus_docs"], r["stages"]["load"]["errors"]) for r in report["results"]
+              if r["stages"].get("load", {}).get("errors")]
+    if failed:
+        sys.exit(f"load failed: {failed}")
+
+
+if __name__ == "__main__":
+    main()
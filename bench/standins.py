@@ -0,0 +1,103 @@
+"""
+Local stand-ins for the databases the benchmarked stages write to.
+
+MySQL: a SQLite file through `PIPELINE_DB_URL` (pipeline/load.py builds its engine
+from it). Neo4j: `InMemoryDriver` accepts the connector's sessions and write
+transactions and only counts them; `TimedDriver` wraps either it or a real driver
+and records the latency of every write transaction.
+"""
+
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+def sqlite_url(path: Path) -> str:
+    return f"sqlite:///{Path(path).resolve()}"
+
+
+class _Result:
+    def consume(self):
+        return None
+
+
+class _Tx:
+    def __init__(self, driver: "InMemoryDriver"):
+        self.driver = driver
+
+    def run(self, query: str, parameters: Dict = None, **kwargs):
+        self.driver.queries += 1
+        rows = (parameters or {}).get("rows")
+        self.driver.rows += len(rows) if isinstance(rows, list) else 1
+        return _Result()
+
+
+class _Session:
+    def __init__(self, driver: "InMemoryDriver"):
+        self.driver = driver
+
+    def run(self, query: str, parameters: Dict = None, **kwargs):
+        return _Tx(self.driver).run(query, parameters)
+
+    def execute_write(self, fn, *args, **kwargs):
+        return fn(_Tx(self.driver), *args, **kwargs)
+
+    execute_read = execute_write
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InMemoryDriver:
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+
+    def session(self, **kwargs) -> _Session:
+        return _Session(self)
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _TimedSession:
+    def __init__(self, session, latencies: List[float]):
+        self._session = session
+        self._latencies = latencies
+
+    def execute_write(self, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return self._session.execute_write(fn, *args, **kwargs)
+        finally:
+            self._latencies.append(time.perf_counter() - t0)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._session.close()
+
+
+class TimedDriver:
+    def __init__(self, driver):
+        self._driver = driver
+        self.latencies: List[float] = []
+
+    def session(self, **kwargs) -> _TimedSession:
+        return _TimedSession(self._driver.session(**kwargs), self.latencies)
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
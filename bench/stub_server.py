@@ -0,0 +1,143 @@
+"""
+Local HTTP stub for the HAL search API and the Wikidata action API.
+
+    with StubServer(scale_corpus(load_hal_docs(), 10_000)) as stub:
+        os.environ["HAL_API_BASE"] = stub.hal_base
+        linker.WIKIDATA_API = stub.wikidata_api
+
+HAL pages follow `cursorMark` pagination over the corpus in docid order (`q`, `fq`
+and `fl` are ignored: the corpus is already the filtered result). The corpus may be a
+list or, with its `total`, any iterable (e.g. `bench.synthetic.generate`): a stream is
+served page by page as the client walks the cursor, so it is never held whole. Wikidata requests
+are answered from the recorded responses, falling back to `SyntheticWikidata`.
+"""
+
+import itertools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from bench.fixtures import SyntheticWikidata, wikidata_key
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] if len(v) == 1 else v for k, v in parse_qs(url.query).items()}
+        if url.path.startswith("/search/"):
+            body = self.server.stub.hal_page(params)
+        elif url.path == "/w/api.php":
+            body = self.server.stub.wikidata(params)
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    stub: "StubServer"
+
+
+class StubServer:
+    def __init__(self, hal_docs: Iterable[Dict], wikidata_responses: Optional[Dict[str, Dict]] = None,
+                 host: str = "127.0.0.1", port: int = 0, total: Optional[int] = None):
+        self._set_corpus(hal_docs, total)
+        self.wikidata_responses = wikidata_responses or {}
+        self.synthetic = SyntheticWikidata()
+        self.counts = {"hal": 0, "wikidata": 0, "wikidata_recorded": 0}
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def hal_base(self) -> str:
+        return f"{self.base_url}/search/"
+
+    @property
+    def wikidata_api(self) -> str:
+        return f"{self.base_url}/w/api.php"
+
+    def __enter__(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="bench-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _set_corpus(self, hal_docs: Iterable[Dict], total: Optional[int]):
+        if isinstance(hal_docs, list):
+            self.hal_docs: Optional[List[Dict]] = hal_docs
+            self.num_found = len(hal_docs)
+        elif total is None:
+            raise ValueError("a streamed corpus needs its total (HAL's numFound)")
+        else:
+            self.hal_docs = None
+            self.num_found = total
+        self._stream = iter(hal_docs)
+        self._last_page = (-1, [])  # (start, docs) of the last streamed page, for retries
+
+    def reset(self, hal_docs: Iterable[Dict], total: Optional[int] = None):
+        """Serve another corpus (the URLs stay the same: api/apimodule.py reads them at import)."""
+        with self._lock:
+            self._set_corpus(hal_docs, total)
+            self.counts = dict.fromkeys(self.counts, 0)
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def hal_page(self, params: Dict) -> Dict:
+        self._count("hal")
+        rows = int(params.get("rows", 10))
+        cursor = params.get("cursorMark", "*")
+        start = 0 if cursor == "*" else int(cursor)
+        start = int(params.get("start", start))
+        docs = self.hal_docs[start:start + rows] if self.hal_docs is not None else self._streamed_page(start, rows)
+        end = start + len(docs)
+        # same cursor back once exhausted, as HAL does
+        next_cursor = str(end) if end < self.num_found and docs else cursor
+        return {"response": {"numFound": self.num_found, "start": start, "docs": docs},
+                "nextCursorMark": next_cursor}
+
+    def _streamed_page(self, start: int, rows: int) -> List[Dict]:
+        if rows <= 0:  # numFound probes (api/main.py counts before crawling)
+            return []
+        with self._lock:
+            last_start, last_docs = self._last_page
+            if start == last_start:
+                return last_docs
+            if start != max(last_start, 0) + len(last_docs):
+                raise ValueError(f"streamed corpus: page at {start} requested out of order")
+            docs = list(itertools.islice(self._stream, rows))
+            self._last_page = (start, docs)
+            return docs
+
+    def wikidata(self, params: Dict) -> Dict:
+        self._count("wikidata")
+        recorded = self.wikidata_responses.get(wikidata_key(params))
+        if recorded is not None:
+            self._count("wikidata_recorded")
+            return recorded
+        with self._lock:
+            return self.synthetic.respond(params)
@@ -0,0 +1,235 @@
+"""
+Synthetic HAL corpus generator for scale testing.
+
+`CorpusModel.fit` learns empirical distributions from the api/data samples:
+- authors per doc, first/last names and authQuality_s
+- organisms per doc, and each (authOrganismId_i, authOrganism_s) pair
+- keywords per doc and the keyword_s vocabulary
+- domain code sets, together with their discipline
+- titles and abstracts, which are spliced pairwise
+
+`generate` streams records in the same shape as api/data (what api/main.py writes
+and what pipeline/main.py and the Wikidata linker read). Values that occurred only
+once in the samples give the Good-Turing probability of drawing an unseen value, so
+names, organisms and keywords keep growing with the corpus, as they do in HAL.
+
+    python -m bench.synthetic --docs 1000000 --out corpus.ndjson.gz
+    python -m bench.synthetic --docs 1000000 --out corpus.parquet    # needs pyarrow
+    python -m orchestrator run --input corpus.ndjson.gz             # streamed by orchestrator.artifacts.read_ndjson
+"""
+
+import argparse
+import bisect
+import gzip
+import itertools
+import json
+import random
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional
+
+from bench.fixtures import SAMPLE_DIR, read_json
+
+PARQUET_BATCH = 10_000
+
+
+class Empirical:
+    """Sampling from observed frequencies, plus the Good-Turing mass of unseen values."""
+
+    def __init__(self, observations: Iterable[Hashable]):
+        counts = Counter(observations)
+        self.values = list(counts)
+        self.cum = list(itertools.accumulate(counts[v] for v in self.values))
+        total = self.cum[-1] if self.cum else 0
+        singletons = sum(1 for c in counts.values() if c == 1)
+        self.novel_prob = singletons / total if total else 1.0
+
+    def __bool__(self) -> bool:
+        return bool(self.values)
+
+    def sample(self, rng: random.Random):
+        return self.values[bisect.bisect_right(self.cum, rng.random() * self.cum[-1])]
+
+    def sample_many(self, rng: random.Random, k: int) -> list:
+        return rng.choices(self.values, cum_weights=self.cum, k=k)
+
+    def is_novel(self, rng: random.Random) -> bool:
+        return rng.random() < self.novel_prob
+
+
+def _as_list(v) -> list:
+    if isinstance(v, list):
+        return v
+    return [] if v is None else [v]
+
+
+class CorpusModel:
+    def __init__(self, records: List[Dict]):
+        self.n_authors = Empirical(len(_as_list(r.get("authFirstName_s"))) for r in records)
+        self.first_names = Empirical(x for r in records for x in _as_list(r.get("authFirstName_s")) if x)
+        self.last_names = Empirical(x for r in records for x in _as_list(r.get("authLastName_s")) if x)
+        self.quality = Empirical(x for r in records for x in _as_list(r.get("authQuality_s")) if x)
+
+        with_org = [r for r in records if _as_list(r.get("authOrganismId_i"))]
+        self.p_organisms = len(with_org) / len(records) if records else 0.0
+        self.n_organisms = Empirical(len(_as_list(r["authOrganismId_i"])) for r in with_org)
+        self.organisms = Empirical(
+            (oid, name)
+            for r in with_org
+            for oid, name in itertools.zip_longest(_as_list(r["authOrganismId_i"]), _as_list(r.get("authOrganism_s")))
+            if oid is not None
+        )
+        # first ID for unseen organisms; the counter itself lives in each generate() run
+        self.first_new_org_id = max((oid for oid, _ in self.organisms.values), default=0) + 1
+
+        self.n_keywords = Empirical(len(_as_list(r.get("keyword_s"))) for r in records)
+        self.keywords = Empirical(k for r in records for k in _as_list(r.get("keyword_s")) if k)
+        self.keyword_tokens = Empirical(t for k in self.keywords.values for t in k.split())
+
+        self.domains = Empirical((r.get("domain_codes") or "", r.get("discipline") or "") for r in records)
+
+        self.titles = Empirical(tuple(r["title_s"].split()) for r in records if r.get("title_s"))
+        abstracts = [r["abstract_s"] for r in records if r.get("abstract_s")]
+        self.p_abstract = len(abstracts) / len(records) if records else 0.0
+        self.abstracts = Empirical(tuple(a.split()) for a in abstracts)
+
+    @classmethod
+    def fit(cls, sample_dir: Path = SAMPLE_DIR) -> "CorpusModel":
+        records, seen = [], set()
+        for path in sorted(Path(sample_dir).glob("*.json")):
+            for rec in read_json(path):
+                if rec.get("docid") not in seen:
+                    seen.add(rec.get("docid"))
+                    records.append(rec)
+        return cls(records)
+
+    # --- value generators ---
+    def _name(self, dist: Empirical, rng: random.Random) -> str:
+        if not dist.is_novel(rng):
+            return dist.sample(rng)
+        a, b = dist.sample(rng), dist.sample(rng)  # unseen name: prefix of one + suffix of another
+        return (a[: max(1, len(a) // 2)] + b[len(b) // 2:]).capitalize()
+
+    def _keyword(self, rng: random.Random) -> str:
+        if not self.keywords.is_novel(rng):
+            return self.keywords.sample(rng)
+        return " ".join(self.keyword_tokens.sample_many(rng, rng.choice((1, 2, 2, 3)))).capitalize()
+
+    def _organism(self, rng: random.Random, new_org_ids: Iterator[int]):
+        if not self.organisms.is_novel(rng):
+            return self.organisms.sample(rng)
+        oid = next(new_org_ids)
+        _, name = self.organisms.sample(rng)
+        return oid, f"{name} ({oid})" if name else None
+
+    def _text(self, texts: Empirical, rng: random.Random) -> str:
+        # two sample texts spliced at a random word: real phrasing, new combinations
+        a, b = texts.sample(rng), texts.sample(rng)
+        cut = rng.randint(0, min(len(a), len(b)))
+        return " ".join(a[:cut] + b[cut:])
+
+    def record(self, docid: int, rng: random.Random, new_org_ids: Iterator[int]) -> Dict:
+        """One record; `new_org_ids` numbers the unseen organisms of the current run."""
+        n_auth = self.n_authors.sample(rng)
+        keywords = list(dict.fromkeys(self._keyword(rng) for _ in range(self.n_keywords.sample(rng))))
+        codes, discipline = self.domains.sample(rng)
+        org_ids = org_names = None
+        if self.organisms and rng.random() < self.p_organisms:
+            orgs = [self._organism(rng, new_org_ids) for _ in range(self.n_organisms.sample(rng))]
+            org_ids = [oid for oid, _ in orgs]
+            org_names = [name for _, name in orgs if name]
+        hal_id = f"hal-{docid:08d}"
+        return {
+            "docid": str(docid),
+            "halId_s": hal_id,
+            "title_s": self._text(self.titles, rng),
+            "abstract_s": self._text(self.abstracts, rng) if rng.random() < self.p_abstract else None,
+            "keywords_joined": "; ".join(sorted(keywords)),
+            "domain_codes": codes,
+            "discipline": discipline,
+            "url_primary": f"https://hal.science/{hal_id}",
+            "authOrganismId_i": org_ids,
+            "authFirstName_s": [self._name(self.first_names, rng) for _ in range(n_auth)],
+            "authFirstName_sci": None,
+            "authLastName_s": [self._name(self.last_names, rng) for _ in range(n_auth)],
+            "authLastName_sci": None,
+            "authQuality_s": [self.quality.sample(rng) for _ in range(n_auth)],
+            "authOrganism_s": org_names or None,
+            "authorityInstitution_s": None,
+            "keyword_s": keywords,
+            "keyword_sci": None,
+            "keyword_t": None,
+        }
+
+
+def generate(n: int, seed: int = 0, start_docid: int = 10_000_000,
+             model: Optional[CorpusModel] = None) -> Iterator[Dict]:
+    """`n` records with increasing (gapped, like HAL) docids; same seed, same corpus,
+    also when `model` is reused across runs."""
+    model = model or CorpusModel.fit()
+    rng = random.Random(seed)
+    new_org_ids = itertools.count(model.first_new_org_id)
+    docid = start_docid
+    for _ in range(n):
+        docid += rng.randint(1, 5)
+        yield model.record(docid, rng, new_org_ids)
+
+
+# =============== WRITERS =================
+
+def write_ndjson(records: Iterable[Dict], path: Path) -> int:
+    # fastest gzip level: at millions of records compression, not generation, dominates
+    f = gzip.open(path, "wt", encoding="utf-8", compresslevel=1) if path.suffix == ".gz" else open(path, "w", encoding="utf-8")
+    n = 0
+    with f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            n += 1
+    return n
+
+
+def write_parquet(records: Iterable[Dict], path: Path, batch_size: int = PARQUET_BATCH) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise SystemExit("Parquet output needs pyarrow (pip install pyarrow); use .ndjson otherwise") from e
+
+    str_list = pa.list_(pa.string())
+    schema = pa.schema([
+        ("docid", pa.string()), ("halId_s", pa.string()), ("title_s", pa.string()), ("abstract_s", pa.string()),
+        ("keywords_joined", pa.string()), ("domain_codes", pa.string()), ("discipline", pa.string()),
+        ("url_primary", pa.string()), ("authOrganismId_i", pa.list_(pa.int64())),
+        ("authFirstName_s", str_list), ("authFirstName_sci", str_list), ("authLastName_s", str_list),
+        ("authLastName_sci", str_list), ("authQuality_s", str_list), ("authOrganism_s", str_list),
+        ("authorityInstitution_s", str_list), ("keyword_s", str_list), ("keyword_sci", str_list),
+        ("keyword_t", str_list),
+    ])
+    n = 0
+    with pq.ParquetWriter(str(path), schema) as writer:
+        it = iter(records)
+        while True:
+            batch = list(itertools.islice(it, batch_size))
+            if not batch:
+                break
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            n += len(batch)
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic HAL records fitted to api/data samples.")
+    parser.add_argument("--docs", type=int, required=True)
+    parser.add_argument("--out", type=Path, required=True, help=".ndjson, .ndjson.gz or .parquet")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-docid", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    records = generate(args.docs, args.seed, args.start_docid)
+    writer = write_parquet if args.out.suffix == ".parquet" else write_ndjson
+    n = writer(records, args.out)
+    print(f"{n} synthetic records -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
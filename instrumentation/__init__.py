@@ -0,0 +1,6 @@
+from instrumentation.metrics import REGISTRY, MetricsRegistry, finish_run, serve, serve_from_env, timed
+
+from instrumentation.profiling import ProfileRun, add_profile_args, maybe_profile, stage
+
+__all__ = ["REGISTRY", "MetricsRegistry", "ProfileRun", "add_profile_args", "finish_run", "maybe_profile", "serve",
+           "serve_from_env", "stage", "timed"]
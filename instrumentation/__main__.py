@@ -0,0 +1,28 @@
+"""
+    python -m instrumentation compare <run_dir_a> <run_dir_b>
+
+Per-stage wall clock of two `--profile` runs (see instrumentation.profiling).
+"""
+
+import argparse
+from pathlib import Path
+
+from instrumentation.profiling import compare
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile run directories.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    cmp_ = sub.add_parser("compare", help="per-stage wall clock of two runs")
+    cmp_.add_argument("a", type=Path)
+    cmp_.add_argument("b", type=Path)
+    args = parser.parse_args()
+
+    print(f"{'stage':<28} {'a_s':>10} {'b_s':>10} {'change':>9}")
+    for row in compare(args.a, args.b):
+        change = f"{row['change_pct']:+.1f}%" if row["change_pct"] is not None else "n/a"
+        print(f"{row['stage']:<28} {row['a_s']!s:>10} {row['b_s']!s:>10} {change:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Shared run metrics for harvest, normalize, load and link.
+
+One process-wide registry of counters and timers, with labels:
+
+    hal_pipeline_stage_seconds{stage}             time spent per call (count/sum/max)
+    hal_pipeline_rows_total{stage[,table]}        rows produced or written
+    hal_pipeline_http_requests_total{target,status}
+    hal_pipeline_http_response_bytes_total{target}
+    hal_pipeline_http_retries_total{target}
+    hal_pipeline_cache_lookups_total{cache,result}   result = hit | miss
+    hal_pipeline_errors_total{stage}
+
+`to_prometheus()` renders the Prometheus text exposition format, and `summary()` a
+JSON-friendly dict with the derived figures (rows/s, cache hit ratio). Entry points
+call `serve_from_env()` at start-up (serves /metrics over HTTP if METRICS_PORT is set)
+and `finish_run(name)` at the end, which writes both files to METRICS_DIR.
+
+Each process has its own registry: linking_runner workers are not aggregated.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+PREFIX = "hal_pipeline_"
+METRICS_DIR = Path(os.getenv("METRICS_DIR", "metrics_out"))
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_labels(labels: Labels, extra: Optional[Dict] = None) -> str:
+    items = list(labels) + sorted((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in items) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.timers: Dict[str, Dict[Labels, list]] = {}  # [count, sum, max]
+        self.started = time.time()
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+            self.started = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            stat = self.timers.setdefault(name, {}).setdefault(key, [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] = max(stat[2], seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("errors_total", stage=stage)
+            raise
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - t0, stage=stage)
+
+    # --- export ---
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{PREFIX}{name}{_render_labels(labels)} {value:g}")
+            for name, series in sorted(self.timers.items()):
+                lines.append(f"# TYPE {PREFIX}{name} summary")
+                for labels, (count, total, peak) in sorted(series.items()):
+                    lines.append(f"{PREFIX}{name}_count{_render_labels(labels)} {count}")
+                    lines.append(f"{PREFIX}{name}_sum{_render_labels(labels)} {total:.6f}")
+                    lines.append(f"{PREFIX}{name}{_render_labels(labels, {'quantile': '1'})} {peak:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def _counter_by(self, name: str, label: str) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for labels, value in self.counters.get(name, {}).items():
+            key = dict(labels).get(label, "")
+            out[key] = out.get(key, 0) + value
+        return out
+
+    def summary(self) -> Dict:
+        with self._lock:
+            stages = {}
+            rows = self._counter_by("rows_total", "stage")
+            errors = self._counter_by("errors_total", "stage")
+            for labels, (count, total, peak) in self.timers.get("stage_seconds", {}).items():
+                stage = dict(labels).get("stage", "")
+                stages[stage] = {
+                    "calls": count,
+                    "total_s": round(total, 4),
+                    "mean_ms": round(1000 * total / count, 3) if count else None,
+                    "max_ms": round(1000 * peak, 3),
+                    "rows": int(rows.get(stage, 0)),
+                    "rows_per_s": round(rows[stage] / total, 1) if rows.get(stage) and total else None,
+                    "errors": int(errors.get(stage, 0)),
+                }
+
+            caches = {}
+            for labels, value in self.counters.get("cache_lookups_total", {}).items():
+                d = dict(labels)
+                c = caches.setdefault(d.get("cache", ""), {"hit": 0, "miss": 0})
+                c[d.get("result", "miss")] = c.get(d.get("result", "miss"), 0) + int(value)
+            for c in caches.values():
+                lookups = c["hit"] + c["miss"]
+                c["hit_ratio"] = round(c["hit"] / lookups, 4) if lookups else None
+
+            http = {}
+            for labels, value in self.counters.get("http_requests_total", {}).items():
+                d = dict(labels)
+                h = http.setdefault(d.get("target", ""), {"requests": 0, "errors": 0, "bytes": 0, "retries": 0})
+                h["requests"] += int(value)
+                if d.get("status") == "error":
+                    h["errors"] += int(value)
+            for target, value in self._counter_by("http_response_bytes_total", "target").items():
+                http.setdefault(target, {"requests": 0, "errors": 0, "bytes": 0, "retries": 0})["bytes"] = int(value)
+            for target, value in self._counter_by("http_retries_total", "target").items():
+                http.setdefault(target, {"requests": 0, "errors": 0, "bytes": 0, "retries": 0})["retries"] = int(value)
+
+        return {
+            "wall_s": round(time.time() - self.started, 3),
+            "stages": dict(sorted(stages.items())),
+            "http": http,
+            "caches": caches,
+        }
+
+
+REGISTRY = MetricsRegistry()
+
+# Context-manager factories entered around every @timed call, e.g. the tracemalloc
+# snapshots of instrumentation.profiling; each is called with the stage name.
+STAGE_HOOKS: List[Callable] = []
+
+
+def timed(stage: Optional[str] = None, rows: Optional[Callable] = None):
+    """Decorator: time every call as `stage` (default: the function name);
+    `rows(result)` adds the rows produced to rows_total."""
+    def decorator(fn):
+        name = stage or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with ExitStack() as hooks:
+                for hook in list(STAGE_HOOKS):
+                    hooks.enter_context(hook(name))
+                with REGISTRY.timer(name):
+                    result = fn(*args, **kwargs)
+            if rows is not None:
+                REGISTRY.inc("rows_total", rows(result), stage=name)
+            return result
+        return wrapper
+    return decorator
+
+
+def serve(port: int, registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text) from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def serve_from_env() -> Optional[ThreadingHTTPServer]:
+    """Entry points call this at start-up: serves /metrics if METRICS_PORT is set."""
+    port = os.getenv("METRICS_PORT")
+    return serve(int(port)) if port else None
+
+
+def finish_run(name: str, out_dir: Path = METRICS_DIR, registry: MetricsRegistry = REGISTRY) -> Dict:
+    """Write <name>.prom and <name>.json to `out_dir` and print a short summary."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary = registry.summary()
+    (out_dir / f"{name}.prom").write_text(registry.to_prometheus(), encoding="utf-8")
+    (out_dir / f"{name}.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    for stage, s in summary["stages"].items():
+        rate = f", {s['rows_per_s']} rows/s" if s["rows_per_s"] else ""
+        print(f"[metrics] {stage}: {s['calls']} calls, {s['total_s']}s{rate}")
+    for cache, c in summary["caches"].items():
+        print(f"[metrics] cache {cache}: hit ratio {c['hit_ratio']}")
+    print(f"[metrics] {out_dir / (name + '.prom')} / {out_dir / (name + '.json')}")
+    return summary
@@ -0,0 +1,202 @@
+"""
+`--profile` mode for the pipeline entry points.
+
+    python -m pipeline.main --profile
+    python -m api.main --profile --profile-sampler pyinstrument
+    python wikidata/Neo4j-wikidata_v2.py --profile
+
+Each profiled run writes a directory under PROFILE_DIR (default profile_runs/):
+
+    run.json            argv, git revision, per-stage wall clock, metrics summary
+    cpu.prof            cProfile stats (pstats / snakeviz)
+    cpu_cumulative.txt  top functions by cumulative and by own time
+    memory_<stage>.txt  tracemalloc: allocations that grew during each normalize_* call
+    sampler.html/.txt   pyinstrument output, with --profile-sampler pyinstrument (optional dependency)
+    metrics.prom        the run's metrics (see instrumentation.metrics)
+
+Stages are the sections wrapped in `stage(name)` plus every @timed function (nested, so
+their shares overlap). Compare two runs stage by stage with:
+
+    python -m instrumentation compare profile_runs/<a> profile_runs/<b>
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from instrumentation.metrics import REGISTRY, STAGE_HOOKS
+
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profile_runs"))
+MEMORY_STAGE_PREFIXES = ("normalize_",)
+MEMORY_TOP = 25
+CPU_TOP = 60
+
+_active: Optional["ProfileRun"] = None
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                             cwd=Path(__file__).resolve().parent)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class ProfileRun:
+    def __init__(self, name: str, root: Path = PROFILE_DIR, sampler: Optional[str] = None,
+                 trace_memory: bool = True):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.name = name
+        self.run_dir = Path(root) / f"{name}_{stamp}"
+        self.sampler_name = sampler
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict] = {}
+        self._profiler = cProfile.Profile()
+        self._sampler = None
+        self._t0 = 0.0
+        self.started_at: Optional[str] = None
+
+    # --- stages ---
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            s = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0})
+            s["calls"] += 1
+            s["wall_s"] += time.perf_counter() - t0
+
+    @contextmanager
+    def _stage_hook(self, stage: str):
+        """Registered in STAGE_HOOKS: every @timed call is a stage, and the normalizers
+        also get a tracemalloc snapshot before/after."""
+        if not (self.trace_memory and stage.startswith(MEMORY_STAGE_PREFIXES)):
+            with self.stage(stage):
+                yield
+            return
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        try:
+            with self.stage(stage):
+                yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            diff = tracemalloc.take_snapshot().compare_to(before, "lineno")
+            lines = [f"{stage}: peak traced {peak / 2**20:.1f} MiB", ""]
+            lines += [str(stat) for stat in diff[:MEMORY_TOP]]
+            with open(self.run_dir / f"memory_{stage}.txt", "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n\n")
+            s = self.stages[stage]
+            s["peak_traced_mb"] = max(s.get("peak_traced_mb", 0.0), round(peak / 2**20, 2))
+
+    # --- lifecycle ---
+    def _start_sampler(self):
+        if self.sampler_name != "pyinstrument":
+            return
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("[profile] pyinstrument is not installed: sampling profiler skipped")
+            return
+        self._sampler = Profiler()
+        self._sampler.start()
+
+    def __enter__(self) -> "ProfileRun":
+        global _active
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        if self.trace_memory:
+            tracemalloc.start(10)
+        STAGE_HOOKS.append(self._stage_hook)
+        _active = self
+        self._start_sampler()
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self._t0 = time.perf_counter()
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        self._profiler.disable()
+        wall = time.perf_counter() - self._t0
+        _active = None
+        STAGE_HOOKS.remove(self._stage_hook)
+        if self._sampler is not None:
+            self._sampler.stop()
+            (self.run_dir / "sampler.html").write_text(self._sampler.output_html(), encoding="utf-8")
+            (self.run_dir / "sampler.txt").write_text(self._sampler.output_text(unicode=True), encoding="utf-8")
+        if self.trace_memory:
+            tracemalloc.stop()
+        self._write(wall, failed=exc[0] is not None)
+        print(f"[profile] {self.run_dir}")
+
+    def _write(self, wall: float, failed: bool):
+        self._profiler.dump_stats(str(self.run_dir / "cpu.prof"))
+        buf = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=buf)
+        stats.sort_stats("cumulative").print_stats(CPU_TOP)
+        stats.sort_stats("tottime").print_stats(CPU_TOP)
+        (self.run_dir / "cpu_cumulative.txt").write_text(buf.getvalue(), encoding="utf-8")
+        (self.run_dir / "metrics.prom").write_text(REGISTRY.to_prometheus(), encoding="utf-8")
+
+        for s in self.stages.values():
+            s["wall_s"] = round(s["wall_s"], 4)
+            s["share"] = round(s["wall_s"] / wall, 4) if wall else None
+        run = {
+            "name": self.name,
+            "argv": sys.argv,
+            "started_at": self.started_at,
+            "git_revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "wall_s": round(wall, 4),
+            "failed": failed,
+            "stages": self.stages,
+            "metrics": REGISTRY.summary(),
+        }
+        (self.run_dir / "run.json").write_text(json.dumps(run, indent=2), encoding="utf-8")
+
+
+def stage(name: str):
+    """Wall-clock section of the active profile run (no-op without one)."""
+    return _active.stage(name) if _active is not None else nullcontext()
+
+
+def add_profile_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--profile", action="store_true", help="write CPU/memory profiles to a run directory")
+    parser.add_argument("--profile-sampler", choices=["pyinstrument"], default=None,
+                        help="also run a sampling profiler (optional dependency)")
+    parser.add_argument("--profile-dir", type=Path, default=PROFILE_DIR)
+
+
+def maybe_profile(name: str, args: argparse.Namespace):
+    if not getattr(args, "profile", False):
+        return nullcontext()
+    return ProfileRun(name, args.profile_dir, args.profile_sampler)
+
+
+# =============== COMPARE =================
+
+def compare(a: Path, b: Path) -> List[Dict]:
+    ra = json.loads((Path(a) / "run.json").read_text(encoding="utf-8"))
+    rb = json.loads((Path(b) / "run.json").read_text(encoding="utf-8"))
+    rows = []
+    for stage_name in sorted(set(ra["stages"]) | set(rb["stages"])):
+        wa = ra["stages"].get(stage_name, {}).get("wall_s")
+        wb = rb["stages"].get(stage_name, {}).get("wall_s")
+        change = round(100 * (wb - wa) / wa, 1) if wa and wb is not None else None
+        rows.append({"stage": stage_name, "a_s": wa, "b_s": wb, "change_pct": change})
+    rows.append({"stage": "(total)", "a_s": ra["wall_s"], "b_s": rb["wall_s"],
+                 "change_pct": round(100 * (rb["wall_s"] - ra["wall_s"]) / ra["wall_s"], 1) if ra["wall_s"] else None})
+    return rows
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
+from neomodel import config
 
 
 class MoviesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'movies'
+
+    def ready(self):
+        # django_neomodel only reads the bolt URL; keep db.cypher_query on the same database as streaming.py
+        database = getattr(settings, 'NEOMODEL_DATABASE_NAME', None)
+        if database:
+            config.DATABASE_NAME = database
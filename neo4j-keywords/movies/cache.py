@@ -0,0 +1,35 @@
+import hashlib
+
+from django.core.cache import cache
+
+# Responses built from Neo4j are cached under a version number that is bumped on
+# every write to the graph, so a single incr() invalidates all of them at once.
+GRAPH_CACHE_TIMEOUT = 300
+_VERSION_KEY = "neo4j_graph_version"
+
+
+def graph_cache_version():
+    return cache.get_or_set(_VERSION_KEY, 1, None)
+
+
+def invalidate_graph_cache():
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 2, None)
+
+
+def cache_key(prefix, *parts):
+    # parts may be free text (titles, search terms); hash them into a safe, fixed-size key
+    digest = hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f"{prefix}:v{graph_cache_version()}:{digest}"
+
+
+def get_or_build(prefix, parts, build, timeout=GRAPH_CACHE_TIMEOUT):
+    """Return the cached payload for (prefix, parts), building and storing it on a miss."""
+    key = cache_key(prefix, *parts)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, timeout)
+    return payload
@@ -0,0 +1,73 @@
+import logging
+import re
+import sys
+from pathlib import Path
+
+from neo4j.exceptions import ClientError
+from neomodel import db
+
+# wikidata/graph_schema.py owns the schema of the graph built by wikidata/Neo4j-wikidata_v2.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "wikidata"))
+from graph_schema import GRAPH_FULLTEXT_INDEXES  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# name -> (label, properties)
+FULLTEXT_INDEXES = {
+    "movie_title_fulltext": ("Movie", ["title"]),
+    **{name: (label, [prop]) for name, label, prop in GRAPH_FULLTEXT_INDEXES},
+}
+
+_LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+
+def ensure_fulltext_indexes():
+    """Create the full-text indexes that do not exist yet (idempotent)."""
+    for name, (label, props) in FULLTEXT_INDEXES.items():
+        fields = ", ".join(f"n.{p}" for p in props)
+        db.cypher_query(f"CREATE FULLTEXT INDEX {name} IF NOT EXISTS FOR (n:{label}) ON EACH [{fields}]")
+
+
+def lucene_query(text):
+    """
+    Build an autocomplete query: every term must match as a prefix, and the exact
+    phrase is boosted so full matches rank first. Returns None for blank input.
+    """
+    terms = [_LUCENE_SPECIAL.sub(r"\\\1", t) for t in text.lower().split()]
+    if not terms:
+        return None
+    prefix = " AND ".join(f"{t}*" for t in terms)
+    return f'"{" ".join(terms)}"^4 OR ({prefix})'
+
+
+def _contains_nodes(index, text, limit):
+    """Case-insensitive CONTAINS scan over the index's properties, every score 0.0."""
+    label, props = FULLTEXT_INDEXES[index]
+    match = " OR ".join(f"toLower(n.{p}) CONTAINS $text" for p in props)
+    results, _ = db.cypher_query(
+        f"MATCH (n:{label}) WHERE {match} RETURN n, 0.0 AS score ORDER BY n.{props[0]} LIMIT $limit",
+        {"text": text.lower(), "limit": limit},
+    )
+    return results
+
+
+def query_nodes(index, text, limit):
+    """
+    Rows of (node, score) from a full-text index, best score first. Until the index
+    exists (./manage.py install_fulltext_indexes) this falls back to a CONTAINS scan.
+    """
+    query = lucene_query(text)
+    if query is None:
+        return []
+    try:
+        results, _ = db.cypher_query(
+            "CALL db.index.fulltext.queryNodes($index, $query) YIELD node, score "
+            "RETURN node, score ORDER BY score DESC LIMIT $limit",
+            {"index": index, "query": query, "limit": limit},
+        )
+    except ClientError as e:
+        if "no such fulltext schema index" not in str(e).lower():
+            raise
+        logger.warning("full-text index %s is missing, scanning instead; run ./manage.py install_fulltext_indexes", index)
+        return _contains_nodes(index, text.strip(), limit)
+    return results
@@ -0,0 +1,149 @@
+from django.http import JsonResponse, StreamingHttpResponse
+from neomodel import db
+
+from .cache import get_or_build
+from .params import int_param
+from .streaming import json_stream, ndjson_stream, stream_records
+
+# Read-only API over the Document/Keyword/Item/Class graph written by
+# wikidata/Neo4j-wikidata_v2.py. That graph is not written through Django, so
+# these responses only expire through the cache timeout.
+
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 500
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 8
+# classes with more direct subclasses than this are not walked to find related keywords
+RELATED_MAX_FANOUT = 50
+
+
+def _page(request):
+    return (
+        int_param(request, "limit", PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT),
+        int_param(request, "offset", 0),
+    )
+
+
+def _depth(request):
+    # variable-length bounds cannot be parameters in Cypher, so clamp before formatting
+    return max(1, int_param(request, "depth", DEFAULT_DEPTH, MAX_DEPTH))
+
+
+def _paged(results, limit, offset):
+    return {
+        "results": results,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(results) == limit else None,
+    }
+
+
+def documents_for_keyword(request, name):
+    limit, offset = _page(request)
+
+    def build():
+        rows, _ = db.cypher_query(
+            """
+            MATCH (d:Document)-[:CONTAINS_KEYWORD]->(:Keyword {name: $name})
+            RETURN d.id AS id ORDER BY id SKIP $offset LIMIT $limit
+            """,
+            {"name": name, "offset": offset, "limit": limit},
+        )
+        return _paged([{"id": doc_id} for (doc_id,) in rows], limit, offset)
+
+    return JsonResponse(get_or_build("kw_documents", (name, limit, offset), build))
+
+
+def item_ancestors(request, qid):
+    depth = _depth(request)
+    limit, offset = _page(request)
+
+    def build():
+        rows, _ = db.cypher_query(
+            f"""
+            MATCH p = (:Item {{qid: $qid}})-[:SUBCLASS_OF*1..{depth}]->(a:Item)
+            WITH a, min(length(p)) AS distance
+            RETURN a.qid AS qid, a.label AS label, distance
+            ORDER BY distance, qid SKIP $offset LIMIT $limit
+            """,
+            {"qid": qid, "offset": offset, "limit": limit},
+        )
+        results = [{"qid": q, "label": label, "distance": dist} for q, label, dist in rows]
+        return {**_paged(results, limit, offset), "qid": qid, "depth": depth}
+
+    return JsonResponse(get_or_build("item_ancestors", (qid, depth, limit, offset), build))
+
+
+def related_keywords(request, name):
+    """Keywords under the same SUBCLASS_OF ancestors, closest common ancestor first.
+
+    Hub classes (more than RELATED_MAX_FANOUT direct subclasses) are skipped, both as
+    common ancestors and as intermediate steps on the way down, so the downward walk
+    never fans out through broad classes such as "science" or "entity".
+    """
+    depth = _depth(request)
+    limit, offset = _page(request)
+
+    def build():
+        rows, _ = db.cypher_query(
+            f"""
+            MATCH p = (:Keyword {{name: $name}})-[:MAPS_TO]->(:Item)-[:SUBCLASS_OF*0..{depth}]->(a:Item)
+            WITH a, min(length(p)) - 1 AS up
+            OPTIONAL MATCH (a)<-[sub:SUBCLASS_OF]-()
+            WITH a, up, count(sub) AS fanout
+            WHERE fanout <= $max_fanout
+            MATCH q = (a)<-[:SUBCLASS_OF*0..{depth}]-(:Item)<-[:MAPS_TO]-(other:Keyword)
+            WHERE other.name <> $name
+              // the classes walked through below `a` (not the leaf Item) obey the same bound
+              AND ALL(n IN nodes(q)[1..-2] WHERE size((n)<-[:SUBCLASS_OF]-()) <= $max_fanout)
+            WITH other, min(up + length(q) - 1) AS distance, count(DISTINCT a) AS shared
+            RETURN other.name AS keyword, distance, shared
+            ORDER BY distance, shared DESC, keyword SKIP $offset LIMIT $limit
+            """,
+            {"name": name, "max_fanout": RELATED_MAX_FANOUT, "offset": offset, "limit": limit},
+        )
+        results = [
+            {"keyword": kw, "distance": dist, "shared_ancestors": shared} for kw, dist, shared in rows
+        ]
+        return {**_paged(results, limit, offset), "keyword": name, "depth": depth}
+
+    return JsonResponse(get_or_build("kw_related", (name, depth, limit, offset), build))
+
+
+# label -> key property, as MERGEd by the linker (see wikidata/graph_export.py)
+EXPORT_NODE_KEYS = {"Document": "id", "Keyword": "name", "Item": "qid", "Class": "qid"}
+EXPORT_RELS = {
+    "CONTAINS_KEYWORD": ("Document", "Keyword"),
+    "MAPS_TO": ("Keyword", "Item"),
+    "SUBCLASS_OF": ("Item", "Item"),
+    "INSTANCE_OF": ("Item", "Class"),
+}
+
+
+def _export_nodes():
+    for label, key in EXPORT_NODE_KEYS.items():
+        display = "null" if label in ("Document", "Keyword") else "n.label"
+        for key_value, title in stream_records(f"MATCH (n:{label}) RETURN n.{key} AS key, {display} AS title"):
+            yield {"id": f"{label}:{key_value}", "label": label.lower(), "title": title if title is not None else key_value}
+
+
+def _export_links():
+    for rel, (src, dst) in EXPORT_RELS.items():
+        query = (
+            f"MATCH (a:{src})-[:{rel}]->(b:{dst}) "
+            f"RETURN a.{EXPORT_NODE_KEYS[src]} AS source, b.{EXPORT_NODE_KEYS[dst]} AS target"
+        )
+        for source, target in stream_records(query):
+            yield {"source": f"{src}:{source}", "target": f"{dst}:{target}", "type": rel}
+
+
+def export_keyword_graph(request):
+    """Stream the whole keyword graph; links reference nodes by "<Label>:<key>" ids.
+
+    ?format=ndjson (default) writes one {"type": "nodes"|"links", ...} object per line,
+    ?format=json writes a single {"nodes": [...], "links": [...]} document.
+    """
+    sections = {"nodes": _export_nodes(), "links": _export_links()}
+    if request.GET.get("format") == "json":
+        return StreamingHttpResponse(json_stream(sections), content_type="application/json")
+    return StreamingHttpResponse(ndjson_stream(sections), content_type="application/x-ndjson")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from movies.fulltext import FULLTEXT_INDEXES, ensure_fulltext_indexes
+
+
+class Command(BaseCommand):
+    help = "Create the Neo4j full-text indexes used by the search endpoints"
+
+    def handle(self, *args, **options):
+        ensure_fulltext_indexes()
+        for name, (label, props) in FULLTEXT_INDEXES.items():
+            self.stdout.write(f"{name}: {label}({', '.join(props)})")
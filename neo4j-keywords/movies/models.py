@@ -1,39 +1,76 @@
 from django.db import models
 from django_neomodel import DjangoNode
-from neomodel import ArrayProperty, StringProperty, IntegerProperty, RelationshipFrom, RelationshipTo, StructuredRel, UniqueIdProperty
+from neomodel import ArrayProperty, StringProperty, IntegerProperty, RelationshipFrom, RelationshipTo, StructuredRel, UniqueIdProperty, ZeroOrMore
+
+from .cache import invalidate_graph_cache
+
+
+class InvalidatesGraphCache:
+    """neomodel hooks: any node save/delete invalidates the cached graph responses."""
+
+    def post_save(self):
+        super().post_save()  # DjangoNode sends the Django post_save signal
+        invalidate_graph_cache()
+
+    def post_delete(self):
+        super().post_delete()
+        invalidate_graph_cache()
+
+
+class InvalidatingRelationship(ZeroOrMore):
+    """Relationship manager that invalidates the cached graph responses on connect/disconnect
+    (replace() goes through disconnect_all() and connect())."""
+
+    def connect(self, node, properties=None):
+        rel = super().connect(node, properties)
+        invalidate_graph_cache()
+        return rel
+
+    def reconnect(self, old_node, new_node):
+        rel = super().reconnect(old_node, new_node)
+        invalidate_graph_cache()
+        return rel
+
+    def disconnect(self, node):
+        super().disconnect(node)
+        invalidate_graph_cache()
+
+    def disconnect_all(self):
+        super().disconnect_all()
+        invalidate_graph_cache()
 
 
 class ActedIn(StructuredRel):
     roles = ArrayProperty(StringProperty())
 
 
-class Movie(DjangoNode):
+class Movie(InvalidatesGraphCache, DjangoNode):
     uuid = UniqueIdProperty(primary_key=True)
     title = StringProperty()
     tagline = StringProperty()
     released = IntegerProperty()
 
-    directors = RelationshipFrom('Person', 'DIRECTED')
-    writters = RelationshipFrom('Person', 'WROTE')
-    producers = RelationshipFrom('Person', 'PRODUCED')
-    reviewers = RelationshipFrom('Person', 'REVIEWED')
-    actors = RelationshipFrom('Person', 'ACTED_IN', model=ActedIn)
+    directors = RelationshipFrom('Person', 'DIRECTED', cardinality=InvalidatingRelationship)
+    writters = RelationshipFrom('Person', 'WROTE', cardinality=InvalidatingRelationship)
+    producers = RelationshipFrom('Person', 'PRODUCED', cardinality=InvalidatingRelationship)
+    reviewers = RelationshipFrom('Person', 'REVIEWED', cardinality=InvalidatingRelationship)
+    actors = RelationshipFrom('Person', 'ACTED_IN', model=ActedIn, cardinality=InvalidatingRelationship)
 
     class Meta:
         app_label = 'movies'
 
 
-class Person(DjangoNode):
+class Person(InvalidatesGraphCache, DjangoNode):
     uuid = UniqueIdProperty(primary_key=True)
     name = StringProperty()
     born = IntegerProperty()
 
-    follows = RelationshipTo('Person', 'FOLLOWS')
-    directed = RelationshipFrom('Movie', 'DIRECTED')
-    wrote = RelationshipFrom('Movie', 'WROTE')
-    produced = RelationshipFrom('Movie', 'PRODUCED')
-    reviewed = RelationshipFrom('Movie', 'REVIEWED')
-    acted_in = RelationshipFrom('Movie', 'ACTED_IN')
+    follows = RelationshipTo('Person', 'FOLLOWS', cardinality=InvalidatingRelationship)
+    directed = RelationshipFrom('Movie', 'DIRECTED', cardinality=InvalidatingRelationship)
+    wrote = RelationshipFrom('Movie', 'WROTE', cardinality=InvalidatingRelationship)
+    produced = RelationshipFrom('Movie', 'PRODUCED', cardinality=InvalidatingRelationship)
+    reviewed = RelationshipFrom('Movie', 'REVIEWED', cardinality=InvalidatingRelationship)
+    acted_in = RelationshipFrom('Movie', 'ACTED_IN', cardinality=InvalidatingRelationship)
 
     class Meta:
         app_label = 'movies'
@@ -0,0 +1,7 @@
+def int_param(request, name, default, maximum=None):
+    """Non-negative integer query parameter, `default` when malformed, clamped to `maximum`."""
+    try:
+        value = max(0, int(request.GET.get(name, default)))
+    except ValueError:
+        value = default
+    return min(value, maximum) if maximum is not None else value
@@ -0,0 +1,57 @@
+import json
+
+from django.conf import settings
+from neomodel import config, db
+
+# Bytes buffered before a chunk is handed to the WSGI server
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def stream_records(query, params=None):
+    """Yield records from a Neo4j result cursor instead of materializing them like db.cypher_query.
+
+    The session stays open until the generator is exhausted or closed, which Django does
+    when the StreamingHttpResponse finishes or the client disconnects.
+    """
+    if not db.driver:
+        db.set_connection(url=config.DATABASE_URL)
+    with db.driver.session(database=getattr(settings, "NEOMODEL_DATABASE_NAME", None)) as session:
+        yield from session.run(query, params or {})
+
+
+def _chunked(pieces, size=STREAM_CHUNK_SIZE):
+    buf, buffered = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield "".join(buf)
+            buf, buffered = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def ndjson_stream(sections):
+    """One JSON object per line; `sections` maps a section name ("nodes", "links") to an iterable of dicts."""
+
+    def lines():
+        for kind, items in sections.items():
+            for item in items:
+                yield json.dumps({"type": kind, **item}, ensure_ascii=False) + "\n"
+
+    return _chunked(lines())
+
+
+def json_stream(sections):
+    """A single JSON object {"<section>": [...], ...} written element by element."""
+
+    def pieces():
+        yield "{"
+        for i, (kind, items) in enumerate(sections.items()):
+            yield ("," if i else "") + json.dumps(kind) + ":["
+            for j, item in enumerate(items):
+                yield ("," if j else "") + json.dumps(item, ensure_ascii=False)
+            yield "]"
+        yield "}"
+
+    return _chunked(pieces())
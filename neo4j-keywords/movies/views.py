@@ -1,8 +1,12 @@
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
-from neomodel import Traversal
+from neomodel import Traversal, db
 from neomodel.sync_ import match
+
+from .cache import get_or_build
+from .fulltext import query_nodes
 from .models import Movie, Person
+from .params import int_param
 
 
 def movies_index(request):
@@ -10,117 +14,161 @@ def movies_index(request):
     return render(request, "index.html", {"movies": movies})
 
 
+# cap for an explicit ?limit=; without one /graph returns every movie, as it always has
+GRAPH_MAX_LIMIT = 1000
+
+# Role relationships drawn in /graph (WROTE is left out, as before)
+GRAPH_ROLES = {
+    "ACTED_IN": "actor",
+    "DIRECTED": "director",
+    "PRODUCED": "producer",
+    "REVIEWED": "reviewer",
+}
+
+
+def build_graph(limit, offset):
+    """One Cypher round-trip: a page of movies with actors (all of them when `limit` is None),
+    plus every role relationship of those movies."""
+    id_fn = db.get_id_method()
+    query = f"""
+        MATCH (m:Movie) WHERE (m)<-[:ACTED_IN]-(:Person)
+        WITH m ORDER BY m.title SKIP $offset{"" if limit is None else " LIMIT $limit"}
+        OPTIONAL MATCH (p:Person)-[r:{"|".join(GRAPH_ROLES)}]->(m)
+        RETURN {id_fn}(m) AS movie_id, m.title AS title,
+               collect([{id_fn}(p), p.name, type(r)]) AS people
+        ORDER BY title
+    """
+    results, _ = db.cypher_query(query, {"limit": limit, "offset": offset})
+
+    nodes, rels, index = [], [], {}
+
+    def ensure_node(node):
+        key = (node["id"], node["label"])
+        if key not in index:
+            index[key] = len(nodes)
+            nodes.append(node)
+        return index[key]
+
+    for movie_id, title, people in results:
+        m_idx = ensure_node({"id": str(movie_id), "title": title, "label": "movie"})
+        for person_id, name, rel_type in people:
+            if person_id is None:
+                continue
+            p_idx = ensure_node({"id": str(person_id), "title": name, "label": GRAPH_ROLES[rel_type]})
+            rels.append({"source": p_idx, "target": m_idx, "type": rel_type})
+
+    return {"nodes": nodes, "links": rels, "limit": limit, "offset": offset}
+
+
 def graph(request):
-    nodes = []
-    rels = []
-    movies = Movie.nodes.has(actors=True)
-
-    i = 0
-
-    def ensure_node(n):
-        try:
-            return nodes.index(n)
-        except ValueError:
-            nodes.append(n)
-            return len(nodes) - 1
-
-    for movie in movies:
-        mnode = {"id": movie.element_id, "title": movie.title, "label": "movie"}
-        m_idx = ensure_node(mnode)
-
-        # 1) Actores
-        for person in movie.actors:
-            p = {"id": person.element_id, "title": person.name, "label": "actor"}
-            p_idx = ensure_node(p)
-            rels.append({"source": p_idx, "target": m_idx, "type": "ACTED_IN"})
-
-        # 2) Directores
-        for person in movie.directors:
-            p = {"id": person.element_id, "title": person.name, "label": "director"}
-            p_idx = ensure_node(p)
-            rels.append({"source": p_idx, "target": m_idx, "type": "DIRECTED"})
-
-        # # 3) Guionistas
-        # for person in movie.writers:  # <- corrige el typo aquí
-        #     p = {"id": person.element_id, "title": person.name, "label": "writer"}
-        #     p_idx = ensure_node(p)
-        #     rels.append({"source": p_idx, "target": m_idx, "type": "WROTE"})
-
-        # 4) Productores
-        for person in movie.producers:
-            p = {"id": person.element_id, "title": person.name, "label": "producer"}
-            p_idx = ensure_node(p)
-            rels.append({"source": p_idx, "target": m_idx, "type": "PRODUCED"})
-
-        # 5) Reviewers (si los manejas)
-        for person in movie.reviewers:
-            p = {"id": person.element_id, "title": person.name, "label": "reviewer"}
-            p_idx = ensure_node(p)
-            rels.append({"source": p_idx, "target": m_idx, "type": "REVIEWED"})
-
-    return JsonResponse({"nodes": nodes, "links": rels})
-
-    return JsonResponse({"nodes": nodes, "links": rels})
+    limit = int_param(request, "limit", GRAPH_MAX_LIMIT, GRAPH_MAX_LIMIT) if "limit" in request.GET else None
+    offset = int_param(request, "offset", 0)
+    payload = get_or_build("graph", (limit, offset), lambda: build_graph(limit, offset))
+    return JsonResponse(payload)
+
+
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+
+
+def _search_movies(q, limit):
+    return [
+        {
+            "id": movie.element_id,
+            "title": movie.title,
+            "tagline": movie.tagline,
+            "released": movie.released,
+            "label": "movie",
+            "score": score,
+        }
+        for movie, score in ((Movie.inflate(node), score) for node, score in query_nodes("movie_title_fulltext", q, limit))
+    ]
 
 
 def search(request):
     try:
         q = request.GET["q"]
     except KeyError:
-        return JsonResponse([])
-
-    movies = Movie.nodes.filter(title__icontains=q)
-    return JsonResponse(
-        [
-            {
-                "id": movie.element_id,
-                "title": movie.title,
-                "tagline": movie.tagline,
-                "released": movie.released,
-                "label": "movie",
-            }
-            for movie in movies
-        ],
-        safe=False,
-    )
+        return JsonResponse([], safe=False)
+
+    limit = int_param(request, "limit", SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT)
+    movies = get_or_build("search", (limit, q.lower()), lambda: _search_movies(q, limit))
+    return JsonResponse(movies, safe=False)
+
+
+def _search_keywords(q, limit):
+    hits = [
+        {"id": node.element_id, "title": node.get("name"), "label": "keyword", "score": score}
+        for node, score in query_nodes("keyword_name_fulltext", q, limit)
+    ]
+    hits += [
+        {"id": node.element_id, "title": node.get("label"), "qid": node.get("qid"), "label": "item", "score": score}
+        for node, score in query_nodes("item_label_fulltext", q, limit)
+    ]
+    hits.sort(key=lambda h: h["score"], reverse=True)
+    return hits[:limit]
+
 
+def search_keywords(request):
+    """Autocomplete over Keyword.name and Item.label of the Wikidata graph."""
+    q = request.GET.get("q", "")
+    limit = int_param(request, "limit", SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT)
+    hits = get_or_build("search_keywords", (limit, q.lower()), lambda: _search_keywords(q, limit))
+    return JsonResponse(hits, safe=False)
 
-def serialize_cast(person, job, rel=None):
+
+def serialize_cast(person, job, roles=None):
     return {
         "id": person.element_id,
         "name": person.name,
         "job": job,
-        "role": rel.roles if rel else None,
+        "role": roles,
     }
 
 
-def movie_by_title(request, title):
-    movie = Movie.nodes.get(title=title)
-    cast = []
-
-    for person in movie.directors:
-        cast.append(serialize_cast(person, "directed"))
-
-    for person in movie.writters:
-        cast.append(serialize_cast(person, "wrote"))
-
-    for person in movie.producers:
-        cast.append(serialize_cast(person, "produced"))
-
-    for person in movie.reviewers:
-        cast.append(serialize_cast(person, "reviewed"))
+# Relationship type -> job, in the order the cast is listed
+CAST_JOBS = {
+    "DIRECTED": "directed",
+    "WROTE": "wrote",
+    "PRODUCED": "produced",
+    "REVIEWED": "reviewed",
+    "ACTED_IN": "acted",
+}
+
+
+def build_movie_detail(title):
+    """The movie, every role relationship and ACTED_IN.roles in one Cypher round-trip."""
+    results, _ = db.cypher_query(
+        f"""
+        MATCH (m:Movie {{title: $title}})
+        RETURN m, [(p:Person)-[r:{"|".join(CAST_JOBS)}]->(m) | [p, type(r), r.roles]] AS cast
+        LIMIT 1
+        """,
+        {"title": title},
+    )
+    if not results:
+        return None
+
+    node, rows = results[0]
+    movie = Movie.inflate(node)
+    order = list(CAST_JOBS)
+    rows = sorted(rows, key=lambda row: order.index(row[1]))
+    cast = [
+        serialize_cast(Person.inflate(p), CAST_JOBS[rel_type], roles if rel_type == "ACTED_IN" else None)
+        for p, rel_type, roles in rows
+    ]
+    return {
+        "id": movie.element_id,
+        "title": movie.title,
+        "tagline": movie.tagline,
+        "released": movie.released,
+        "label": "movie",
+        "cast": cast,
+    }
 
-    for person in movie.actors:
-        rel = movie.actors.relationship(person)
-        cast.append(serialize_cast(person, "acted", rel))
 
-    return JsonResponse(
-        {
-            "id": movie.element_id,
-            "title": movie.title,
-            "tagline": movie.tagline,
-            "released": movie.released,
-            "label": "movie",
-            "cast": cast,
-        }
-    )
+def movie_by_title(request, title):
+    payload = get_or_build("movie", (title,), lambda: build_movie_detail(title) or {})
+    if not payload:
+        raise Http404(f"Movie {title!r} not found")
+    return JsonResponse(payload)
@@ -14,13 +14,18 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.urls import path
-from movies import views
+from movies import keyword_views, views
 from django.contrib import admin
 
 urlpatterns = [
     path('', views.movies_index),
     path('search', views.search),
+    path('search/keywords', views.search_keywords),
     path('graph', views.graph),
     path('movie/<str:title>', views.movie_by_title),
+    path('keywords/export', keyword_views.export_keyword_graph),
+    path('keywords/<str:name>/documents', keyword_views.documents_for_keyword),
+    path('keywords/<str:name>/related', keyword_views.related_keywords),
+    path('items/<str:qid>/ancestors', keyword_views.item_ancestors),
     path('admin/', admin.site.urls),
 ]
@@ -0,0 +1,82 @@
+"""
+One command for the whole pipeline: harvest -> normalize -> load (MySQL) and
+harvest -> link -> graph (Neo4j), with cached, typed artifacts under --work-dir.
+
+    python -m orchestrator run                                # everything
+    python -m orchestrator run graph --input api/data/upec_chemical_20_5.json
+    python -m orchestrator run --refresh                      # re-harvest, redo only what changed
+    python -m orchestrator plan load graph                    # what would run
+
+A stage is skipped when its code, parameters and input artifacts hash the same as in
+the last successful run (see orchestrator.dag); within a stage that does run, only the
+documents whose content changed are processed (see orchestrator.docstore).
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from instrumentation import add_profile_args, finish_run, maybe_profile, serve_from_env, stage
+from orchestrator.dag import Dag, StageFailed
+from orchestrator.stages import STAGE_NAMES, build_stages
+
+WORK_DIR = Path(os.getenv("ORCHESTRATOR_DIR", "pipeline_runs"))
+DEFAULT_TARGETS = ["load", "graph"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the HAL -> MySQL / Wikidata -> Neo4j pipeline as a DAG.")
+    parser.add_argument("command", choices=["run", "plan"])
+    parser.add_argument("targets", nargs="*", help=f"stages to bring up to date (default: {' '.join(DEFAULT_TARGETS)})")
+    parser.add_argument("--work-dir", type=Path, default=WORK_DIR)
+    parser.add_argument("--input", type=Path, default=None,
+                        help="use an existing harvest instead of crawling HAL: a JSON list, or .ndjson[.gz] "
+                             "(streamed record by record)")
+    parser.add_argument("--need-n", type=int, default=200, help="records to harvest")
+    parser.add_argument("--field", default=None, help="discipline to keep (default: any of the five)")
+    parser.add_argument("--refresh", action="store_true", help="re-harvest even if the harvest is cached")
+    parser.add_argument("--force", action="append", default=[], choices=STAGE_NAMES,
+                        help="re-run this stage even if it is up to date (repeatable)")
+    parser.add_argument("--mysql-url", default=None, help="SQLAlchemy URL (default: pipeline/load.py settings)")
+    parser.add_argument("--graph-mode", choices=["neo4j", "export"], default=os.getenv("GRAPH_MODE", "neo4j"))
+    parser.add_argument("--full", action="store_true",
+                        help="normalize/load and link/graph every document, not only the changed ones")
+    parser.add_argument("--jobs", "-j", type=int, default=2, help="stages running at the same time")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    targets = args.targets or DEFAULT_TARGETS
+    unknown = set(targets) - set(STAGE_NAMES)
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+    if args.mysql_url:
+        os.environ["PIPELINE_DB_URL"] = args.mysql_url  # read by pipeline/load.py at import
+    dag = Dag(build_stages(args.work_dir, args.input, args.need_n, args.field, args.mysql_url, args.graph_mode,
+                           incremental=not args.full), args.work_dir)
+    force = set(args.force) | ({"harvest"} if args.refresh else set())
+
+    if args.command == "plan":
+        for name, status in dag.plan(targets, force).items():
+            print(f"{name:<10} {status}")
+        return
+
+    # cProfile only sees the thread that enabled it, and concurrent tracemalloc diffs overlap:
+    # a profiled run executes the stages one by one in this thread
+    jobs = 1 if args.profile else args.jobs
+    if args.profile and args.jobs > 1:
+        print("[profile] stages run sequentially (--jobs 1) so cpu.prof and the memory diffs cover them")
+    serve_from_env()
+    with maybe_profile("orchestrator", args):
+        try:
+            results = dag.run(targets, force, max_workers=jobs, wrap=stage)
+        except StageFailed as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            finish_run("orchestrator")
+    print(" ".join(f"{name}={status}" for name, status in results.items()))
+
+
+if __name__ == "__main__":
+    main()
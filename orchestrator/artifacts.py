@@ -0,0 +1,176 @@
+"""
+Typed intermediate artifacts of the orchestrator DAG.
+
+Each stage writes exactly one artifact under the work directory, and each artifact
+type knows how to save, load and fingerprint itself. `digest()` hashes the bytes on
+disk, so downstream cache keys change only when the content does.
+"""
+
+import gzip
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import pandas as pd
+
+TABLES = ["documents", "authors", "keywords", "identifiers", "organisms"]
+
+
+def file_digest(path: Path, h=None) -> str:
+    h = h or hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_ndjson(path: Path) -> Iterator[Dict]:
+    """One record per line, gzipped if the name ends in .gz (what bench.synthetic writes)."""
+    path = Path(path)
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_records(path: Path) -> Iterable[Dict]:
+    """Harvest input: a JSON list as in api/data/, or a stream of .ndjson[.gz] lines."""
+    path = Path(path)
+    if path.name.endswith((".ndjson", ".ndjson.gz", ".jsonl", ".jsonl.gz")):
+        return read_ndjson(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Artifact:
+    """A file or directory produced by one stage."""
+
+    name = "artifact"
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def files(self) -> List[Path]:
+        if self.path.is_dir():
+            return sorted(p for p in self.path.rglob("*") if p.is_file())
+        return [self.path]
+
+    def digest(self) -> str:
+        h = hashlib.sha256()
+        for p in self.files():
+            if p != self.path:
+                h.update(p.relative_to(self.path).as_posix().encode("utf-8") + b"\0")
+            file_digest(p, h)
+        return h.hexdigest()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.path})"
+
+
+class _DocsMixin:
+    """Directory artifacts that carry the document versions they were built from
+    (orchestrator.docstore.doc_versions), for the sink stage to mark as processed."""
+
+    @property
+    def docs_path(self) -> Path:
+        return self.path / "docs.json"
+
+    def save_docs(self, versions: List[Dict]):
+        self.docs_path.write_text(json.dumps(versions, ensure_ascii=False), encoding="utf-8")
+
+    def docs(self) -> List[Dict]:
+        return json.loads(self.docs_path.read_text(encoding="utf-8"))
+
+
+class RecordsArtifact(Artifact):
+    """Harvested HAL records, the JSON list that api/main.py saves to api/data/."""
+
+    name = "records.json"
+
+    def save(self, records: Iterable[Dict]) -> int:
+        n = 0
+        for _ in self.writing(records):
+            n += 1
+        return n
+
+    def writing(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """Pass `records` through while appending each one to the list on disk, so a
+        stream is written without holding it; the file is complete once exhausted."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("[")
+            sep = "\n"
+            for rec in records:
+                f.write(sep + json.dumps(rec, ensure_ascii=False))
+                sep = ",\n"
+                yield rec
+            f.write("\n]\n")
+
+    def load(self) -> List[Dict]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+class TablesArtifact(_DocsMixin, Artifact):
+    """The five normalized tables of pipeline/main.py, one pickled DataFrame each
+    (pickle keeps the dtypes that to_sql relies on)."""
+
+    name = "tables"
+
+    def save(self, tables: Dict[str, pd.DataFrame], versions: List[Dict]):
+        self.path.mkdir(parents=True, exist_ok=True)
+        for table in TABLES:
+            tables[table].to_pickle(self.path / f"{table}.pkl", compression=None)
+        self.save_docs(versions)
+
+    def load(self) -> Dict[str, pd.DataFrame]:
+        return {table: pd.read_pickle(self.path / f"{table}.pkl", compression=None) for table in TABLES}
+
+
+class LinkArtifact(_DocsMixin, Artifact):
+    """Keyword -> Wikidata links: the CSV rows of Neo4j-wikidata_v2.py plus the graph rows
+    (item, subclass_of, instance_of, document_map) that map_keywords queued for Neo4j."""
+
+    name = "linked"
+
+    @property
+    def csv_path(self) -> Path:
+        return self.path / "mapping.csv"
+
+    @property
+    def graph_rows_path(self) -> Path:
+        return self.path / "graph_rows.jsonl.gz"
+
+    def save(self, write_csv, rows: List[Dict], graph_rows: List[Tuple[str, Dict]], versions: List[Dict]):
+        self.path.mkdir(parents=True, exist_ok=True)
+        write_csv(rows, self.csv_path)
+        self.save_docs(versions)
+        # mtime=0: same rows, same bytes, same digest
+        with open(self.graph_rows_path, "wb") as raw, \
+                gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=1, mtime=0) as gz:
+            for name, row in graph_rows:
+                gz.write((json.dumps([name, row], ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def iter_graph_rows(self) -> Iterator[Tuple[str, Dict]]:
+        with gzip.open(self.graph_rows_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                name, row = json.loads(line)
+                yield name, row
+
+
+class ReceiptArtifact(Artifact):
+    """What a side-effecting stage (MySQL load, Neo4j ingest) did, as JSON."""
+
+    name = "receipt.json"
+
+    def save(self, receipt: Dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(receipt, indent=2, sort_keys=True), encoding="utf-8")
+
+    def load(self) -> Dict:
+        return json.loads(self.path.read_text(encoding="utf-8"))
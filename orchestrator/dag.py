@@ -0,0 +1,217 @@
+"""
+Minimal DAG runner with content-hash caching.
+
+A `Stage` declares its dependencies, the artifact type it produces and the source
+files its result depends on. Before running a stage the runner computes its key:
+
+    sha256(stage name, params, source file hashes, digests of the input artifacts)
+
+and skips the stage if the manifest already records that key and the artifact on disk
+still has the recorded digest. Because keys use the *digest* of the inputs, a stage that
+re-runs and produces identical bytes leaves everything downstream up to date.
+
+Independent stages run concurrently in a thread pool (the stages are I/O bound:
+HTTP, MySQL, Neo4j). With max_workers=1 they run one by one in the calling thread.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Type, Union
+
+from orchestrator.artifacts import Artifact, file_digest
+
+MANIFEST = "manifest.json"
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable, output: Type[Artifact], deps: Dict[str, Type[Artifact]] = None,
+                 params: Union[Dict, Callable[[], Dict], None] = None, sources: Iterable[Path] = ()):
+        """`fn(out, params, **inputs)` must fill the artifact `out`; `deps` maps each
+        keyword argument to the stage it comes from, and the type that stage must produce.
+        `params` may be a callable, resolved the first time the stage is planned or run, for
+        parameters that are costly to compute or need imports the other stages do not."""
+        self.name = name
+        self.fn = fn
+        self.output = output
+        self.deps = deps or {}
+        self._params = params if callable(params) else (params or {})
+        self.sources = [Path(p) for p in sources]
+
+    @property
+    def params(self) -> Dict:
+        if callable(self._params):
+            self._params = self._params() or {}
+        return self._params
+
+    def key(self, inputs: Dict[str, Artifact]) -> str:
+        h = hashlib.sha256()
+        h.update(self.name.encode("utf-8"))
+        h.update(json.dumps(self.params, sort_keys=True, default=str).encode("utf-8"))
+        for path in sorted(self.sources):
+            h.update(path.name.encode("utf-8"))
+            file_digest(path, h)
+        for arg in sorted(inputs):
+            h.update(f"{arg}={inputs[arg].digest()}".encode("utf-8"))
+        return h.hexdigest()
+
+
+class StageFailed(RuntimeError):
+    pass
+
+
+class Dag:
+    def __init__(self, stages: List[Stage], work_dir: Path):
+        self.stages = {s.name: s for s in stages}
+        self.work_dir = Path(work_dir)
+        self._lock = threading.Lock()
+        for stage in stages:
+            for arg, dep_type in stage.deps.items():
+                dep = self.stages.get(arg)
+                if dep is None:
+                    raise ValueError(f"{stage.name}: unknown dependency {arg!r}")
+                if not issubclass(dep.output, dep_type):
+                    raise TypeError(f"{stage.name}: {arg} produces {dep.output.__name__}, expected {dep_type.__name__}")
+
+    # --- manifest ---
+    @property
+    def manifest_path(self) -> Path:
+        return self.work_dir / MANIFEST
+
+    def manifest(self) -> Dict[str, Dict]:
+        if not self.manifest_path.exists():
+            return {}
+        return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    def _record(self, name: str, entry: Dict):
+        with self._lock:
+            manifest = self.manifest()
+            manifest[name] = entry
+            self.work_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.manifest_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+            tmp.replace(self.manifest_path)
+
+    # --- graph ---
+    def artifact(self, name: str) -> Artifact:
+        stage = self.stages[name]
+        return stage.output(self.work_dir / name / stage.output.name)
+
+    def closure(self, targets: Iterable[str]) -> List[str]:
+        """`targets` and everything they depend on, in dependency order."""
+        order: List[str] = []
+        seen: Set[str] = set()
+
+        def visit(name: str):
+            if name in seen:
+                return
+            if name not in self.stages:
+                raise KeyError(f"unknown stage {name!r}")
+            seen.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            order.append(name)
+
+        for t in targets:
+            visit(t)
+        return order
+
+    def is_current(self, name: str) -> Optional[str]:
+        """The stage key if its recorded output is up to date, else None.
+        Only meaningful once the inputs are themselves current."""
+        stage = self.stages[name]
+        inputs = {arg: self.artifact(arg) for arg in stage.deps}
+        if not all(a.exists() for a in inputs.values()):
+            return None
+        entry = self.manifest().get(name)
+        out = self.artifact(name)
+        key = stage.key(inputs)
+        if entry and entry.get("key") == key and out.exists() and entry.get("digest") == out.digest():
+            return key
+        return None
+
+    def plan(self, targets: Iterable[str], force: Iterable[str] = ()) -> Dict[str, str]:
+        """stage -> "cached" | "run", assuming a stage re-runs when any upstream stage does
+        (at run time the content hash may still let it skip)."""
+        force = set(force)
+        status: Dict[str, str] = {}
+        for name in self.closure(targets):
+            upstream_runs = any(status[d] == "run" for d in self.stages[name].deps)
+            fresh = name not in force and not upstream_runs and self.is_current(name)
+            status[name] = "cached" if fresh else "run"
+        return status
+
+    # --- execution ---
+    def _execute(self, name: str, forced: bool, log: Callable[[str], None]) -> str:
+        stage = self.stages[name]
+        inputs = {arg: self.artifact(arg) for arg in stage.deps}
+        out = self.artifact(name)
+        key = stage.key(inputs)
+        entry = self.manifest().get(name)
+        if not forced and entry and entry.get("key") == key and out.exists() and entry.get("digest") == out.digest():
+            log(f"[{name}] up to date")
+            return "cached"
+
+        log(f"[{name}] running")
+        t0 = time.perf_counter()
+        out.path.parent.mkdir(parents=True, exist_ok=True)
+        stage.fn(out, stage.params, **inputs)
+        wall = time.perf_counter() - t0
+        digest = out.digest()
+        changed = not entry or entry.get("digest") != digest
+        self._record(name, {
+            "key": key, "digest": digest, "artifact": str(out.path.relative_to(self.work_dir)),
+            "type": stage.output.__name__, "wall_s": round(wall, 3),
+            "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        })
+        log(f"[{name}] done in {wall:.1f}s" + ("" if changed else " (output unchanged)"))
+        return "ran"
+
+    def run(self, targets: Iterable[str], force: Iterable[str] = (), max_workers: int = 4,
+            log: Callable[[str], None] = print, wrap: Callable = None) -> Dict[str, str]:
+        """Run the closure of `targets`; each stage starts as soon as its dependencies finish.
+        `wrap(name)` is an optional context manager around each stage (e.g. profiling stages).
+        With max_workers=1 the stages run in the calling thread, in dependency order, so a
+        profiler enabled in that thread sees them."""
+        order = self.closure(targets)
+        force = set(force)
+        results: Dict[str, str] = {}
+        pending = list(order)
+        running: Dict[Future, str] = {}
+
+        def call(name: str) -> str:
+            if wrap is None:
+                return self._execute(name, name in force, log)
+            with wrap(name):
+                return self._execute(name, name in force, log)
+
+        if max_workers <= 1:
+            for name in order:
+                try:
+                    results[name] = call(name)
+                except Exception as e:
+                    raise StageFailed(f"stage {name!r} failed: {type(e).__name__}: {e}") from e
+            return results
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage") as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = self.stages[name].deps
+                    if any(d in pending or d in running.values() for d in deps):
+                        continue
+                    pending.remove(name)
+                    running[pool.submit(call, name)] = name
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    try:
+                        results[name] = fut.result()
+                    except Exception as e:
+                        for f in running:
+                            f.cancel()
+                        raise StageFailed(f"stage {name!r} failed: {type(e).__name__}: {e}") from e
+        return results
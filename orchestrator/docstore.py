@@ -0,0 +1,168 @@
+"""
+Content-addressed store of harvested documents (SQLite).
+
+Each record is fingerprinted over its normalized fields (`doc_hash`): strings stripped,
+NaN/empty values dropped, keys sorted. The JSON body is stored once per hash in
+`objects`, and `heads` points each docid at its current hash. `processed` records which
+hash each sink stage (load, graph) last wrote for a docid, and with which `version` of the
+code and settings that produced it, so a stage asks `pending()` for the documents whose
+content changed since (all of them when the version did), and refreshes cost work
+proportional to the real edits.
+
+    store = DocumentStore(work_dir / "docstore.sqlite")
+    store.put(records)                              # {"new": 3, "changed": 1, "unchanged": 196}
+    todo = store.pending("load", records, version)  # the 4 that differ from what load wrote
+    ...
+    store.mark("load", doc_versions(todo), version)
+"""
+
+import hashlib
+import json
+import math
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# HAL bookkeeping that changes without the document changing
+VOLATILE_FIELDS = {"_version_", "score", "domain_labels"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    hash TEXT PRIMARY KEY,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS heads (
+    docid      TEXT PRIMARY KEY,
+    hash       TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS processed (
+    stage      TEXT NOT NULL,
+    docid      TEXT NOT NULL,
+    hash       TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    version    TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (stage, docid)
+);
+"""
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (list, tuple)):
+        items = [_normalize(v) for v in value]
+        return [v for v in items if v is not None] or None
+    if isinstance(value, dict):
+        return {k: v for k, v in ((k, _normalize(v)) for k, v in value.items()) if v is not None} or None
+    return value
+
+
+def normalized_doc(rec: Dict) -> Dict:
+    fields = ((k, _normalize(v)) for k, v in sorted(rec.items()) if k not in VOLATILE_FIELDS)
+    return {k: v for k, v in fields if v is not None}
+
+
+def canonical_json(rec: Dict) -> str:
+    return json.dumps(normalized_doc(rec), sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def doc_hash(rec: Dict) -> str:
+    return hashlib.sha256(canonical_json(rec).encode("utf-8")).hexdigest()
+
+
+def doc_key(rec: Dict) -> str:
+    """docid as the store key (halId_s for records without one, as the linker does)."""
+    return str(rec.get("docid") or rec.get("halId_s") or "")
+
+
+def doc_versions(records: Iterable[Dict]) -> List[Dict]:
+    """[{"docid", "key", "hash"}] of `records`: what a stage hands to the next one and marks."""
+    return [{"docid": rec.get("docid") or rec.get("halId_s"), "key": doc_key(rec), "hash": doc_hash(rec)}
+            for rec in records]
+
+
+class DocumentStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(processed)")}
+        if "version" not in columns:  # stores created before versions: everything is pending once
+            with self.conn:
+                self.conn.execute("ALTER TABLE processed ADD COLUMN version TEXT NOT NULL DEFAULT ''")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self) -> "DocumentStore":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    def put(self, records: Iterable[Dict]) -> Dict[str, int]:
+        """Store every record under its hash and move the docid heads; counts new/changed/unchanged."""
+        heads = dict(self.conn.execute("SELECT docid, hash FROM heads"))
+        counts = {"new": 0, "changed": 0, "unchanged": 0}
+        now = self._now()
+        with self.conn:
+            for rec in records:
+                docid, body = doc_key(rec), canonical_json(rec)
+                h = hashlib.sha256(body.encode("utf-8")).hexdigest()
+                old = heads.get(docid)
+                if old == h:
+                    counts["unchanged"] += 1
+                    continue
+                counts["new" if old is None else "changed"] += 1
+                heads[docid] = h
+                self.conn.execute("INSERT OR IGNORE INTO objects (hash, body) VALUES (?, ?)", (h, body))
+                self.conn.execute(
+                    "INSERT INTO heads (docid, hash, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (docid) DO UPDATE SET hash = excluded.hash, updated_at = excluded.updated_at",
+                    (docid, h, now))
+        return counts
+
+    def head(self, docid) -> Optional[str]:
+        row = self.conn.execute("SELECT hash FROM heads WHERE docid = ?", (str(docid),)).fetchone()
+        return row[0] if row else None
+
+    def get(self, docid) -> Optional[Dict]:
+        """Current (normalized) content of a docid."""
+        row = self.conn.execute(
+            "SELECT o.body FROM heads h JOIN objects o ON o.hash = h.hash WHERE h.docid = ?", (str(docid),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def processed(self, stage: str) -> Dict[str, str]:
+        return dict(self.conn.execute("SELECT docid, hash FROM processed WHERE stage = ?", (stage,)))
+
+    def pending(self, stage: str, records: List[Dict], version: str = "") -> List[Dict]:
+        """Records whose content differs from what `stage` last processed (or that it never saw),
+        or that it processed with another `version` of the code and settings."""
+        done = {docid: (h, v) for docid, h, v in
+                self.conn.execute("SELECT docid, hash, version FROM processed WHERE stage = ?", (stage,))}
+        return [rec for rec in records if done.get(doc_key(rec)) != (doc_hash(rec), version)]
+
+    def mark(self, stage: str, versions: List[Dict], version: str = ""):
+        """Record that `stage` wrote these document versions (see `doc_versions`) with `version`."""
+        now = self._now()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO processed (stage, docid, hash, updated_at, version) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (stage, docid) DO UPDATE SET hash = excluded.hash, updated_at = excluded.updated_at, "
+                "version = excluded.version",
+                [(stage, v["key"], v["hash"], now, version) for v in versions])
+
+    def forget(self, stage: str):
+        """Make every document pending again for `stage` (e.g. after wiping its database)."""
+        with self.conn:
+            self.conn.execute("DELETE FROM processed WHERE stage = ?", (stage,))
@@ -0,0 +1,230 @@
+"""
+The pipeline as a DAG:
+
+    harvest ──> normalize ──> load      (MySQL)
+        └─────> link ───────> graph     (Neo4j)
+
+load and link only share harvest, so the two branches run concurrently. Each stage
+wraps the functions the standalone scripts already use: api.main.crawl,
+pipeline.main.normalize_*, pipeline.load.upsert_documents, and map_keywords / the
+batched graph writer of wikidata/Neo4j-wikidata_v2.py.
+
+Harvested documents go into the DocumentStore (orchestrator.docstore). With
+`incremental`, normalize and link only take the documents whose content hash differs
+from what their sink (load / graph) last wrote, and the sink marks them once written.
+The marks carry the branch's `sink_version` (see `branch_version`): after a change to the
+code or settings of either stage of a branch, every document is pending again.
+"""
+
+import hashlib
+import json
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from orchestrator.artifacts import TABLES, LinkArtifact, ReceiptArtifact, RecordsArtifact, TablesArtifact
+from orchestrator.artifacts import file_digest, read_records
+from orchestrator.dag import Stage
+from orchestrator.docstore import DocumentStore, doc_versions
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+STAGE_NAMES = ["harvest", "normalize", "load", "link", "graph"]
+
+
+def load_linker():
+    sys.path.insert(0, str(REPO_ROOT / "wikidata"))
+    from linking_runner import load_linker as _load
+
+    return _load()
+
+
+def mask_url(url: str) -> str:
+    """Drop the password from a database/bolt URL before it goes into a receipt or key."""
+    return re.sub(r"(://[^:/@]+):[^@]*@", r"\1:***@", url)
+
+
+class GraphRowRecorder:
+    """Stands in for the graph writer during linking: keeps the rows for the graph stage."""
+
+    def __init__(self):
+        self.rows: List[Tuple[str, Dict]] = []
+
+    def add(self, name: str, row: Dict):
+        self.rows.append((name, row))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# =============== STAGES =================
+
+def run_harvest(out: RecordsArtifact, params: Dict):
+    if params.get("input"):
+        records = read_records(params["input"])  # .ndjson[.gz] is streamed, never held whole
+    else:
+        from api.main import crawl
+
+        records = crawl(need_n=params["need_n"], field=params["field"])
+    # as api/main.py does before saving
+    records = ({k: v for k, v in rec.items() if k != "domain_labels"} for rec in records)
+    with DocumentStore(params["docstore"]) as store:
+        counts = store.put(out.writing(records))
+    print(f"[harvest] {sum(counts.values())} documents: {counts['new']} new, {counts['changed']} changed, "
+          f"{counts['unchanged']} unchanged")
+
+
+def pending_records(params: Dict, harvest: RecordsArtifact, sink: str) -> List[Dict]:
+    records = harvest.load()
+    if not params["incremental"]:
+        return records
+    with DocumentStore(params["docstore"]) as store:
+        todo = store.pending(sink, records, params["sink_version"])
+    print(f"{len(todo)}/{len(records)} documents changed since the last {sink}")
+    return todo
+
+
+def run_normalize(out: TablesArtifact, params: Dict, harvest: RecordsArtifact):
+    from pipeline import main as pipeline_main
+
+    records = pending_records(params, harvest, "load")
+    if not records:  # nothing changed; the normalizers expect the HAL columns
+        out.save({table: pd.DataFrame() for table in TABLES}, [])
+        return
+    df_sample = pd.DataFrame(records)
+    out.save({
+        "documents": pipeline_main.normalize_documents(df_sample),
+        "authors": pipeline_main.normalize_authors(df_sample),
+        "keywords": pipeline_main.normalize_keywords(df_sample),
+        "identifiers": pipeline_main.normalize_identifiers(df_sample),
+        "organisms": pipeline_main.normalize_organisms(df_sample),
+    }, doc_versions(records))
+
+
+def run_load(out: ReceiptArtifact, params: Dict, normalize: TablesArtifact):
+    from pipeline.load import upsert_documents
+
+    tables = normalize.load()
+    # only numeric docids reach MySQL; the rest stay pending instead of being marked as loaded
+    written = [v for v in normalize.docs() if str(v["docid"]).isdigit()]
+    doc_ids = sorted({int(v["docid"]) for v in written})
+    if doc_ids:
+        upsert_documents(tables, doc_ids)
+    with DocumentStore(params["docstore"]) as store:
+        store.mark("load", written, params["sink_version"])
+    out.save({"database": params["database"], "documents": len(doc_ids),
+              "rows": {table: len(df) for table, df in tables.items()}, "tables_digest": normalize.digest()})
+
+
+def run_link(out: LinkArtifact, params: Dict, harvest: RecordsArtifact):
+    linker = load_linker()
+    records = pending_records(params, harvest, "graph")
+    recorder = GraphRowRecorder()
+    rows = linker.map_keywords(records, linker.BulkExportConnector(recorder))
+    out.save(linker.write_csv, rows, recorder.rows, doc_versions(records))
+
+
+# keywords dropped from a re-harvested document must not stay attached to it
+DETACH_KEYWORDS = """
+    UNWIND $ids AS id
+    MATCH (:Document {id: id})-[r:CONTAINS_KEYWORD]->()
+    DELETE r
+"""
+
+
+def run_graph(out: ReceiptArtifact, params: Dict, link: LinkArtifact):
+    linker = load_linker()
+    versions = link.docs()
+    counts: Counter = Counter()
+    with DocumentStore(params["docstore"]) as store:
+        if params["mode"] == "export":
+            exporter = linker.GraphCsvExporter(out.path.parent / "neo4j_import", linker.EXPORT_LOAD_CSV_DIR)
+            conn = linker.BulkExportConnector(exporter)
+        else:
+            conn = linker.connect_neo4j()
+            if conn is None:
+                raise RuntimeError(f"cannot connect to Neo4j at {params['target']}")
+            written = store.processed("graph")
+            changed = [v["docid"] for v in versions if v["key"] in written]
+            if changed:
+                conn.run_query(DETACH_KEYWORDS, {"ids": changed})
+        try:
+            for name, row in link.iter_graph_rows():
+                conn.batch.add(name, row)
+                counts[name] += 1
+        finally:
+            # raises GraphWriteError if any batch failed: nothing is marked and every
+            # document of this run stays pending for the next one
+            conn.close()
+        store.mark("graph", versions, params["sink_version"])
+    out.save({"mode": params["mode"], "target": params["target"], "documents": len(versions),
+              "rows": dict(counts), "link_digest": link.digest()})
+
+
+# =============== DAG =================
+
+def database_target(mysql_url: Optional[str]) -> str:
+    if mysql_url:
+        return mask_url(mysql_url)
+    from pipeline import load  # the URL load_data will actually use (env overrides included)
+
+    return mask_url(load.DB_URL)
+
+
+def branch_version(sources: List[Path], params: Dict) -> str:
+    """Code and settings of a normalize->load or link->graph branch, as stored with the
+    documents its sink marks: a different version makes them all pending again."""
+    h = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    for path in sorted(sources):
+        h.update(path.name.encode("utf-8"))
+        file_digest(path, h)
+    return h.hexdigest()[:16]
+
+
+def build_stages(work_dir: Path, input_json: Optional[Path] = None, need_n: int = 200, field: Optional[str] = None,
+                 mysql_url: Optional[str] = None, graph_mode: str = "neo4j", incremental: bool = True) -> List[Stage]:
+    linker = load_linker()
+    linker_path = REPO_ROOT / "wikidata" / "Neo4j-wikidata_v2.py"
+    graph_target = str(linker.EXPORT_LOAD_CSV_DIR) if graph_mode == "export" else mask_url(linker.NEO4J_URI)
+    docstore = str(Path(work_dir) / "docstore.sqlite")
+    harvest_params = {"input": str(input_json)} if input_json else {"need_n": need_n, "field": field}
+    harvest_params["docstore"] = docstore
+    harvest_sources = [input_json] if input_json else [REPO_ROOT / "api" / "main.py", REPO_ROOT / "api" / "apimodule.py"]
+    vocabulary = REPO_ROOT / "vocabulary" / "keywords.py"
+
+    normalize_sources = [REPO_ROOT / "pipeline" / "main.py", vocabulary]
+    load_sources = [REPO_ROOT / "pipeline" / "load.py"]
+
+    def mysql_branch() -> Dict:
+        # resolved only when normalize/load is planned or run: pipeline.load needs SQLAlchemy
+        settings = {"database": database_target(mysql_url), "tables": TABLES}
+        return {"docstore": docstore, "incremental": incremental, **settings,
+                "sink_version": branch_version(normalize_sources + load_sources, settings)}
+
+    link_sources = [linker_path, REPO_ROOT / "wikidata" / "offline_index.py", vocabulary]
+    graph_sources = [REPO_ROOT / "wikidata" / "graph_export.py", REPO_ROOT / "wikidata" / "graph_schema.py"]
+    graph_settings = {"scoring": linker.scoring_config_hash(), "mode": graph_mode, "target": graph_target}
+    neo4j_branch = {
+        "docstore": docstore,
+        # the export files are full builds: every document, every time
+        "incremental": incremental and graph_mode == "neo4j",
+        **graph_settings,
+        "sink_version": branch_version(link_sources + graph_sources, graph_settings),
+    }
+    return [
+        Stage("harvest", run_harvest, RecordsArtifact, params=harvest_params, sources=harvest_sources),
+        Stage("normalize", run_normalize, TablesArtifact, {"harvest": RecordsArtifact}, params=mysql_branch,
+              sources=normalize_sources),
+        Stage("load", run_load, ReceiptArtifact, {"normalize": TablesArtifact}, params=mysql_branch,
+              sources=load_sources),
+        Stage("link", run_link, LinkArtifact, {"harvest": RecordsArtifact}, params=neo4j_branch,
+              sources=link_sources),
+        Stage("graph", run_graph, ReceiptArtifact, {"link": LinkArtifact}, params=neo4j_branch,
+              sources=graph_sources),
+    ]
@@ -1,7 +1,10 @@
 # Import necessary libraries
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, text
 import pandas as pd
+from typing import Dict, List
+
+from instrumentation import REGISTRY, timed
 
 # ---- Connection config (override with env vars if you like) ----
 MYSQL_USER = os.getenv("MYSQL_USER", "citizix_user")
@@ -21,9 +24,12 @@ DB_URL = (
     f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}"
     f"@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}?charset=utf8mb4"
 )
+# Full SQLAlchemy URL override, e.g. sqlite:///bench.db for the benchmark harness
+DB_URL = os.getenv("PIPELINE_DB_URL", DB_URL)
 
 engine = create_engine(DB_URL, pool_pre_ping=True, future=True)
 
+@timed("load_data")
 def load_data(df: pd.DataFrame, table_name: str = "EcommerceData", if_exists: str = "replace"):
     """
     Load a pandas DataFrame into a MySQL table.
@@ -46,4 +52,27 @@ def load_data(df: pd.DataFrame, table_name: str = "EcommerceData", if_exists: st
             chunksize=1000,
             method="multi"
         )
-    print("Data successfully written to MySQL.")
\ No newline at end of file
+    REGISTRY.inc("rows_total", len(df), stage="load_data", table=table_name)
+    print("Data successfully written to MySQL.")
+
+
+@timed("upsert_documents")
+def upsert_documents(tables: Dict[str, pd.DataFrame], doc_ids: List[int], chunk: int = 500):
+    """
+    Replace the rows of `doc_ids` in every table of `tables`, in one transaction.
+
+    :param tables:  table name -> DataFrame, parents first ("documents" before the others)
+    :param doc_ids: documents to replace; their old rows are deleted even if they now have none
+    """
+    with engine.begin() as conn:
+        # children first, documents last
+        for table_name in reversed(list(tables)):
+            delete = text(f"DELETE FROM {table_name} WHERE doc_id IN :ids").bindparams(bindparam("ids", expanding=True))
+            for i in range(0, len(doc_ids), chunk):
+                conn.execute(delete, {"ids": doc_ids[i:i + chunk]})
+        for table_name, df in tables.items():
+            if df is None or df.empty:
+                continue
+            df.to_sql(name=table_name, con=conn, if_exists="append", index=False, chunksize=1000, method="multi")
+            REGISTRY.inc("rows_total", len(df), stage="upsert_documents", table=table_name)
+    print(f"{len(doc_ids)} documents upserted into MySQL.")
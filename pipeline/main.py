@@ -3,6 +3,7 @@
 # from etl.transform import clean_data, transform_data
 # import etl.load as load
 
+import argparse
 import yaml
 import os
 import time
@@ -15,9 +16,12 @@ from sqlalchemy import create_engine
 
 
 # ====== Normalizers to your schema ======
+from instrumentation import add_profile_args, finish_run, maybe_profile, serve_from_env, stage, timed
 from pipeline.load import load_data
+from vocabulary import VOCAB
 
 
+@timed(rows=len)
 def normalize_documents(df: pd.DataFrame) -> pd.DataFrame:
     # Your table wants: id (auto), doc_id, title, abstract
     # Map df fields: docid -> doc_id, title_s -> title, abstract_s -> abstract
@@ -29,6 +33,7 @@ def normalize_documents(df: pd.DataFrame) -> pd.DataFrame:
     out = out.dropna(subset=["doc_id"])
     return out
 
+@timed(rows=len)
 def normalize_authors(df: pd.DataFrame) -> pd.DataFrame:
     # authors table: doc_id, authFirstName_s, authFirstName_sci, authLastName_s,
     #                authLastName_sci, authQuality_s, organismId_i
@@ -65,6 +70,7 @@ def normalize_authors(df: pd.DataFrame) -> pd.DataFrame:
             })
     return pd.DataFrame(rows)
 
+@timed(rows=len)
 def normalize_keywords(df: pd.DataFrame) -> pd.DataFrame:
     # keywords table: doc_id, keyword_s, keyword_sci, keyword_t
     base_doc = pd.to_numeric(df.get("docid"), errors="coerce")
@@ -74,7 +80,7 @@ def normalize_keywords(df: pd.DataFrame) -> pd.DataFrame:
     for doc, kws, kw_sci, kw_t in zip(base_doc, kw, df.get("keyword_sci"), df.get("keyword_t")):
         if not kws:
             continue
-        for k in kws:
+        for k in VOCAB.unique(kws):
             rows.append({
                 "doc_id": doc,
                 "keyword_s": k,
@@ -83,6 +89,7 @@ def normalize_keywords(df: pd.DataFrame) -> pd.DataFrame:
             })
     return pd.DataFrame(rows)
 
+@timed(rows=len)
 def normalize_identifiers(df: pd.DataFrame) -> pd.DataFrame:
     # identifiers: doc_id, doi_s, halId_s, isbn
     out = pd.DataFrame({
@@ -95,6 +102,7 @@ def normalize_identifiers(df: pd.DataFrame) -> pd.DataFrame:
     return out
 
 
+@timed(rows=len)
 def normalize_organisms(df: pd.DataFrame) -> pd.DataFrame:
     """
     Explota listas y devuelve filas con:
@@ -143,13 +151,12 @@ def normalize_organisms(df: pd.DataFrame) -> pd.DataFrame:
 
 # ====== Your crawler glue: build df_sample (using your existing code) ======
 
-def crawl_to_df_sample():
-    # ---- paste your crawling loop here ----
-    # For demo, we assume you already produced df_sample
-    # from your script with `records` and `pd.DataFrame.from_records(records)`
-    # If you're reading your sample JSON file:
-    # df_sample = pd.read_json("sample.json")
-    raise NotImplementedError("Replace with your existing crawl code that returns df_sample")
+def crawl_to_df_sample(need_n: int = 200, field=None) -> pd.DataFrame:
+    """Harvest `need_n` HAL records (see api.main.crawl) as the df_sample run_pipeline expects."""
+    from api.main import crawl
+
+    records = crawl(need_n=need_n, field=field)
+    return pd.DataFrame.from_records(records).drop(columns=["domain_labels"], errors="ignore")
 
 def run_pipeline(df_sample: pd.DataFrame):
     # Minimal cleanup
@@ -158,28 +165,38 @@ def run_pipeline(df_sample: pd.DataFrame):
     # df_sample.rename(columns={"authOrganismId_i": "organismId_i"}, inplace=True)  # uncomment if needed
 
     # Normalize into tables
-    docs_df = normalize_documents(df_sample)
-    auth_df = normalize_authors(df_sample)
-    kw_df = normalize_keywords(df_sample)
-    id_df = normalize_identifiers(df_sample)
-    org_df = normalize_organisms(df_sample)
+    with stage("normalize"):
+        docs_df = normalize_documents(df_sample)
+        auth_df = normalize_authors(df_sample)
+        kw_df = normalize_keywords(df_sample)
+        id_df = normalize_identifiers(df_sample)
+        org_df = normalize_organisms(df_sample)
 
     # Load
-    load_data(docs_df, "documents", if_exists="append")
-    load_data(auth_df, "authors", if_exists="append")
-    load_data(kw_df, "keywords", if_exists="append")
-    load_data(id_df, "identifiers", if_exists="append")
-    load_data(org_df, "organisms", if_exists="append")
+    with stage("load"):
+        load_data(docs_df, "documents", if_exists="append")
+        load_data(auth_df, "authors", if_exists="append")
+        load_data(kw_df, "keywords", if_exists="append")
+        load_data(id_df, "identifiers", if_exists="append")
+        load_data(org_df, "organisms", if_exists="append")
 
 if __name__ == "__main__":
     # If you’re using your in-memory 'records' from the code you pasted:
     # Just import them or read from the JSON you saved with savetojson(...)
     # Example using the JSON you showed in the message:
     import json
-    data_path= os.path.join(os.path.dirname(__file__), '..', 'api', 'data','upec_sample200_keywords_domains.json')
-    with open(data_path, "r", encoding="utf-8") as f:
-        sample_list = json.load(f)
-    df_sample = pd.DataFrame(sample_list)
+    parser = argparse.ArgumentParser(description="Normalize the HAL sample and load it into MySQL.")
+    add_profile_args(parser)
+    args = parser.parse_args()
 
-    print("Rows in sample:", len(df_sample))
-    run_pipeline(df_sample)
\ No newline at end of file
+    data_path= os.path.join(os.path.dirname(__file__), '..', 'api', 'data','upec_sample200_keywords_domains.json')
+    with maybe_profile("pipeline", args):
+        with stage("read_input"):
+            with open(data_path, "r", encoding="utf-8") as f:
+                sample_list = json.load(f)
+            df_sample = pd.DataFrame(sample_list)
+
+        print("Rows in sample:", len(df_sample))
+        serve_from_env()
+        run_pipeline(df_sample)
+        finish_run("pipeline")
@@ -0,0 +1,4 @@
+from vocabulary.keywords import (EMPTY_ID, VOCAB, KeywordForms, KeywordVocabulary, normalize_kw, singularize_en,
+                                 split_keywords)
+
+__all__ = ["EMPTY_ID", "VOCAB", "KeywordForms", "KeywordVocabulary", "normalize_kw", "singularize_en", "split_keywords"]
@@ -0,0 +1,97 @@
+"""
+Shared keyword vocabulary.
+
+Every raw keyword string is interned once and mapped to a canonical integer ID:
+keywords that differ only in whitespace, NBSP/BOM or stray separators share the ID.
+Case is kept: acronyms and symbols such as "CO"/"Co", "NO"/"No" or "HF"/"Hf" are
+different keywords. Their normalized, lower-case and singular forms are computed on
+first sight and memoized, so the harvest, normalize and linking stages stop
+re-processing the same strings.
+
+    from vocabulary import VOCAB
+    VOCAB.id(" Catalysts ;")          # 0
+    VOCAB.id("Catalysts")             # 0
+    VOCAB.id("catalysts")             # 1
+    VOCAB.forms("catalysts").singular # "catalyst"
+    VOCAB.unique(["Catalysts", " Catalysts ;"])  # ["Catalysts"]
+
+IDs live for the process: they are assigned in order of first sight and are not persisted.
+"""
+
+import re
+import threading
+from typing import Dict, Iterable, List, NamedTuple
+
+_ws_re = re.compile(r"\s+", re.UNICODE)
+_split_re = re.compile(r"[;,]")
+EMPTY_ID = -1  # ID of keywords that normalize to ""
+
+
+def normalize_kw(s: str) -> str:
+    if not s: return ""
+    s = s.replace("\u00A0", " ").replace("\ufeff", "")
+    s = _ws_re.sub(" ", s.strip())
+    s = s.strip(";, ")
+    return s
+
+
+def singularize_en(word: str) -> str:
+    w = normalize_kw(word)
+    wl = w.lower()
+    if len(w) > 3 and wl.endswith("ies"): return w[:-3] + "y"
+    if len(w) > 3 and wl.endswith("ses"): return w[:-2]
+    if len(w) > 2 and wl.endswith("s") and not wl.endswith("ss"): return w[:-1]
+    return w
+
+
+def split_keywords(raw: str) -> List[str]:
+    """A joined keyword string ("a; b, c", as in keywords_joined) as a list."""
+    return [k.strip() for k in _split_re.split(raw or "") if k.strip()]
+
+
+class KeywordForms(NamedTuple):
+    id: int           # canonical ID (EMPTY_ID if nothing is left after normalizing)
+    normalized: str   # normalize_kw(raw)
+    lower: str
+    singular: str     # singularize_en(normalized), case kept
+    singular_lower: str
+
+
+class KeywordVocabulary:
+    def __init__(self):
+        self._forms: Dict[str, KeywordForms] = {}   # raw string -> forms (the memo)
+        self._canonical: Dict[str, int] = {}        # normalized form -> ID
+        self._lock = threading.Lock()
+
+    def forms(self, raw: str) -> KeywordForms:
+        f = self._forms.get(raw)
+        if f is not None:
+            return f
+        norm = normalize_kw(raw)
+        sing = singularize_en(norm)
+        with self._lock:
+            cid = self._canonical.get(norm, EMPTY_ID)
+            if cid == EMPTY_ID and norm:
+                cid = self._canonical[norm] = len(self._canonical)
+            f = self._forms[raw] = KeywordForms(cid, norm, norm.lower(), sing, sing.lower())
+        return f
+
+    # --- lookups ---
+    def id(self, raw: str) -> int:
+        return self.forms(raw).id
+
+    def unique(self, raws: Iterable[str]) -> List[str]:
+        """Normalized keywords of `raws`, once per ID, in order."""
+        seen, out = set(), []
+        for r in raws:
+            f = self.forms(r)
+            if f.id != EMPTY_ID and f.id not in seen:
+                seen.add(f.id)
+                out.append(f.normalized)
+        return out
+
+    def normalized(self, raw: str) -> str:
+        return self.forms(raw).normalized
+
+
+VOCAB = KeywordVocabulary()
@@ -1,30 +1,62 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse
 import csv
+import hashlib
 import json
+import os
+import queue
 import re
+import sys
+import threading
 import time
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 from pathlib import Path
 
 import requests
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
 # Importación corregida
 from neo4j import GraphDatabase, Driver, WRITE_ACCESS 
 
+from graph_export import BulkExportConnector, GraphCsvExporter
+from graph_schema import ensure_schema
+from mapping_state import MappingStateStore
+from offline_index import OfflineIndex
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # instrumentation/ está en la raíz del repo
+from instrumentation import REGISTRY, add_profile_args, finish_run, maybe_profile, serve_from_env, stage
+from vocabulary import VOCAB, normalize_kw, split_keywords
+
 # =============== CONFIG & CONSTANTS =================
-INPUT_JSON = Path(r"C:\Users\sanda\Documents\Langara_College\DANA-4850-001-Capstone_Project\hall-api-test-db-mysql\api\data\upec_chemical_20_5.json")
-OUTPUT_CSV = Path(r"C:\Users\sanda\Documents\Langara_College\DANA-4850-001-Capstone_Project\hall-api-test-db-mysql\wikidata\hal_field_audit_out\Wikidata_upec_chemical_20_5.csv")
+# Relativas al repo (antes rutas absolutas de Windows); se pueden sobrescribir por entorno
+REPO_ROOT = Path(__file__).resolve().parents[1]
+INPUT_JSON = Path(os.getenv("LINK_INPUT_JSON", REPO_ROOT / "api" / "data" / "upec_chemical_20_5.json"))
+OUTPUT_CSV = Path(os.getenv("LINK_OUTPUT_CSV", REPO_ROOT / "wikidata" / "hal_field_audit_out" / "Wikidata_upec_chemical_20_5.csv"))
 
 # Neo4j CONFIG
-NEO4J_URI = "bolt://localhost:7687"
-NEO4J_USER = "neo4j"
-NEO4J_PASSWORD = "your_password" # ¡ACTUALIZA ESTA LÍNEA!
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "your_password") # ¡ACTUALIZA ESTA LÍNEA!
 
-WIKIDATA_API = "https://www.wikidata.org/w/api.php"
+WIKIDATA_API = os.getenv("WIKIDATA_API", "https://www.wikidata.org/w/api.php")
 HEADERS = {"User-Agent": "Keyword2Wikidata/1.2 (contact: your-email@example.com)"}
 
+# Backend del linker: "api" (Wikidata en vivo) u "offline" (índice local de offline_index.py)
+LINKER_BACKEND = os.getenv("LINKER_BACKEND", "api")
+OFFLINE_INDEX_PATH = Path(os.getenv("OFFLINE_INDEX_PATH", Path(__file__).resolve().parent / "hal_field_audit_out" / "wikidata_subset_index.json.gz"))
+
+# Enlace incremental: solo los pares (docid, keyword) nuevos o con otra configuración de scoring
+# (no aplica con GRAPH_MODE=export, que siempre escribe el grafo completo)
+INCREMENTAL = os.getenv("INCREMENTAL", "1") != "0"
+STATE_DB = OUTPUT_CSV.with_suffix(".state.sqlite")
+
+# Destino del grafo: "neo4j" (MERGE por lotes) o "export" (CSV para neo4j-admin import / LOAD CSV)
+GRAPH_MODE = os.getenv("GRAPH_MODE", "neo4j")
+EXPORT_ADMIN_DIR = OUTPUT_CSV.parent / "neo4j_import"
+EXPORT_LOAD_CSV_DIR = Path(__file__).resolve().parents[1] / "tests" / "resources"  # montado en /import
+
 # Propiedades de Wikidata
 P_INSTANCE_OF = "P31"
 P_SUBCLASS_OF = "P279"
@@ -41,99 +73,276 @@ DISALLOWED_P31 = { "Q13442814", "Q571", "Q1002697", "Q737498", "Q732577", "Q4746
 PREFERRED_P31 = { "Q486972", "Q618123", "Q82794", "Q16889133", "Q151885", "Q11173", "Q11862829", "Q7187", "Q16521" }
 
 # =============== NEO4J CONNECTOR =================
+NEO4J_BATCH_SIZE = int(os.getenv("NEO4J_BATCH_SIZE", "500"))
+# Escrituras en un hilo aparte: el enlace (HTTP) produce filas en una cola acotada
+NEO4J_ASYNC_WRITES = os.getenv("NEO4J_ASYNC_WRITES", "1") != "0"
+NEO4J_QUEUE_SIZE = int(os.getenv("NEO4J_QUEUE_SIZE", "10000"))
+
+# Sentencias UNWIND del writer por lotes: cada fila del buffer es un elemento de $rows
+UNWIND_QUERIES = {
+    "item": """
+        UNWIND $rows AS r
+        MERGE (e:Item {qid: r.qid})
+        SET e.label = r.label
+    """,
+    "subclass_of": """
+        UNWIND $rows AS r
+        MERGE (child:Item {qid: r.child_qid})
+        MERGE (parent:Item {qid: r.parent_qid})
+        MERGE (child)-[:SUBCLASS_OF]->(parent)
+    """,
+    "instance_of": """
+        UNWIND $rows AS r
+        MERGE (item:Item {qid: r.item_qid})
+        MERGE (type:Class {qid: r.type_qid})
+        SET type.label = r.type_label
+        MERGE (item)-[:INSTANCE_OF]->(type)
+    """,
+    "document_map": """
+        UNWIND $rows AS r
+        MERGE (d:Document {id: r.docid})
+        MERGE (k:Keyword {name: r.keyword})
+        MERGE (q:Item {qid: r.qid})
+        MERGE (d)-[:CONTAINS_KEYWORD]->(k)
+        MERGE (k)-[:MAPS_TO]->(q)
+    """,
+}
+
+class GraphWriteError(RuntimeError):
+    """Uno o más lotes UNWIND no se pudieron escribir."""
+
+
+class BatchedGraphWriter:
+    """
+    Acumula filas por tipo de sentencia y las escribe con UNWIND en una sola sesión.
+    Un lote que falla se registra en `failures` y se sigue con el resto; `flush` y
+    `close` lanzan GraphWriteError si hubo alguno, para que quien escribe no dé por
+    guardados esos documentos.
+    """
+
+    def __init__(self, driver: Driver, batch_size: int = NEO4J_BATCH_SIZE):
+        self.driver = driver
+        self.batch_size = batch_size
+        self.buffers: Dict[str, List[Dict]] = {name: [] for name in UNWIND_QUERIES}
+        self.failures: List[Tuple[str, int, Exception]] = []  # (sentencia, filas, error)
+        self._session = None
+
+    def add(self, name: str, row: Dict):
+        buf = self.buffers[name]
+        buf.append(row)
+        if len(buf) >= self.batch_size:
+            self._flush_one(name)
+
+    def flush(self):
+        # orden fijo: nodos Item primero, luego relaciones
+        for name in UNWIND_QUERIES:
+            self._flush_one(name)
+        self._raise_failures()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _raise_failures(self):
+        if not self.failures:
+            return
+        failures, self.failures = self.failures, []
+        detail = "; ".join(f"'{name}' ({n} filas): {e}" for name, n, e in failures)
+        raise GraphWriteError(f"{len(failures)} lote(s) sin escribir en Neo4j: {detail}") from failures[0][2]
+
+    def _flush_one(self, name: str):
+        rows = self.buffers[name]
+        if not rows: return
+        self.buffers[name] = []
+        if self._session is None:
+            self._session = self.driver.session(default_access_mode=WRITE_ACCESS)
+        try:
+            with REGISTRY.timer("neo4j_write_batch"):
+                self._session.execute_write(Neo4jConnector._execute_query, UNWIND_QUERIES[name], {"rows": rows})
+            REGISTRY.inc("rows_total", len(rows), stage="neo4j_write_batch", query=name)
+        except Exception as e:
+            print(f"Error al escribir lote '{name}' ({len(rows)} filas): {e}")
+            self.failures.append((name, len(rows), e))
+
+class AsyncGraphWriter:
+    """
+    Consumidor de las filas de `BatchedGraphWriter` en un hilo dedicado.
+    `add` solo encola (y se bloquea si la cola está llena: backpressure), de modo que
+    las esperas de Neo4j se solapan con las llamadas HTTP a Wikidata.
+    """
+
+    _STOP = object()
+    _FLUSH = object()
+
+    _POLL_SEC = 0.5
+
+    def __init__(self, writer: BatchedGraphWriter, max_queue: int = NEO4J_QUEUE_SIZE, idle_flush_sec: float = 1.0):
+        self.writer = writer
+        self.idle_flush_sec = idle_flush_sec
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="neo4j-writer", daemon=True)
+        self._thread.start()
+
+    def _check(self):
+        """Relanza en el hilo llamador el error del hilo escritor (si murió)."""
+        if self._error is not None:
+            raise RuntimeError(f"El hilo escritor de Neo4j falló: {self._error}") from self._error
+        if not self._thread.is_alive():
+            raise RuntimeError("El hilo escritor de Neo4j ya no está activo.")
+
+    def _put(self, item):
+        # put con timeout: si el hilo escritor murió, la cola llena no se vaciaría nunca
+        while True:
+            self._check()
+            try:
+                self.queue.put(item, timeout=self._POLL_SEC)
+                return
+            except queue.Full:
+                continue
+
+    def add(self, name: str, row: Dict):
+        self._put((name, row))
+
+    def flush(self):
+        """Espera a que todo lo encolado hasta ahora esté escrito."""
+        done = threading.Event()
+        self._put((self._FLUSH, done))
+        while not done.wait(self._POLL_SEC):
+            self._check()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._put((self._STOP, None))
+            self._thread.join()
+        if self._error is not None:
+            raise RuntimeError(f"El hilo escritor de Neo4j falló: {self._error}") from self._error
+
+    def _run(self):
+        try:
+            self._loop()
+        except BaseException as e:  # se relanza en add/flush/close
+            self._error = e
+
+    def _loop(self):
+        while True:
+            try:
+                name, row = self.queue.get(timeout=self.idle_flush_sec)
+            except queue.Empty:
+                # sin trabajo nuevo: no retener lotes a medio llenar
+                self.writer.flush()
+                continue
+            if name is self._STOP:
+                self.writer.close()
+                return
+            if name is self._FLUSH:
+                self.writer.flush()
+                row.set()
+                continue
+            self.writer.add(name, row)
+
 class Neo4jConnector:
-    def __init__(self, uri, user, password):
-        self.driver: Driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri, user, password, batch_size: int = NEO4J_BATCH_SIZE, async_writes: bool = NEO4J_ASYNC_WRITES,
+                 driver: Optional[Driver] = None):
+        # `driver` permite inyectar uno ya creado (p. ej. el sustituto en memoria de bench/)
+        self.driver: Driver = driver or GraphDatabase.driver(uri, auth=(user, password))
+        self.batch = BatchedGraphWriter(self.driver, batch_size)
+        if async_writes:
+            self.batch = AsyncGraphWriter(self.batch)
+        # lo ya encolado en esta ejecución: aristas SUBCLASS_OF y labels de Item
+        self.written_edges: Set[Tuple[str, str]] = set()
+        self.written_labels: Dict[str, str] = {}
         
     def close(self):
-        self.driver.close()
+        try:
+            self.batch.close()
+        finally:
+            self.driver.close()
+
+    def flush(self):
+        self.batch.flush()
 
     def run_query(self, query: str, parameters: Optional[Dict] = None):
         # Usando WRITE_ACCESS para transacciones de escritura
+        t0 = time.perf_counter()
         with self.driver.session(default_access_mode=WRITE_ACCESS) as session:
             try:
                 result = session.execute_write(self._execute_query, query, parameters)
                 return result
             except Exception as e:
+                REGISTRY.inc("errors_total", stage="neo4j_run_query")
                 print(f"Error al ejecutar Cypher: {e}\nConsulta: {query}\nParámetros: {parameters}")
                 return None
+            finally:
+                REGISTRY.observe("stage_seconds", time.perf_counter() - t0, stage="neo4j_run_query")
 
     @staticmethod
     def _execute_query(tx, query, parameters):
         return tx.run(query, parameters).consume()
 
 # =============== NEO4J INGESTION LOGIC =================
+# Las funciones ingest_* solo encolan filas en connector.batch; la escritura real
+# ocurre por lotes (al llenarse un buffer, en connector.flush() o en close()),
+# en el hilo de AsyncGraphWriter si NEO4J_ASYNC_WRITES está activo.
 
 # 1. Función para guardar la entidad QID y su jerarquía P279
-# Acepta un mapa de etiquetas para los ancestros
-def ingest_p279_hierarchy(connector: Neo4jConnector, entity_qid: str, entity_label: str, 
-                         qid_paths: List[List[str]], labels_map: Dict[str, str]):
-    """Guarda la entidad principal (Item) y todos los caminos P279 hacia sus ancestros, incluyendo sus etiquetas."""
-    
-    # 1. Garantizar que el nodo entidad exista con su label inicial
-    connector.run_query("""
-        MERGE (e:Item {qid: $qid})
-        SET e.label = $label
-    """, {"qid": entity_qid, "label": entity_label})
-
-    # 2. Iterar sobre cada camino y crear las relaciones con labels en los nodos ancestros
+def p279_edge_set(entity_qid: str, qid_paths: List[List[str]]) -> Dict[Tuple[str, str], None]:
+    """Aristas hijo->padre únicas de todos los caminos (en orden de aparición)."""
+    edges: Dict[Tuple[str, str], None] = {}
     for path in qid_paths:
         current_child_qid = entity_qid
-        
         for parent_qid in path:
             if parent_qid == current_child_qid:
                 continue
-
-            # Obtener el label para el nodo padre (ancestral)
-            parent_label = labels_map.get(parent_qid, parent_qid)
-            
-            # Cypher MERGE: Crea los nodos si no existen y establece la propiedad 'label' en el padre.
-            connector.run_query("""
-                MERGE (child:Item {qid: $child_qid})
-                MERGE (parent:Item {qid: $parent_qid})
-                SET parent.label = $parent_label 
-                MERGE (child)-[:SUBCLASS_OF]->(parent)
-            """, {
-                "child_qid": current_child_qid,
-                "parent_qid": parent_qid,
-                "parent_label": parent_label # Pasa el label del nodo padre
-            })
-            
+            edges[(current_child_qid, parent_qid)] = None
             current_child_qid = parent_qid
+    return edges
 
-    print(f"   -> [Neo4j] Item {entity_qid} ingresado con {len(qid_paths)} rutas P279 (y sus etiquetas).")
-
+def _queue_item_label(connector: Neo4jConnector, qid: str, label: str):
+    if connector.written_labels.get(qid) == label: return
+    connector.written_labels[qid] = label
+    connector.batch.add("item", {"qid": qid, "label": label})
 
-# 2. Función para guardar el documento, keyword y la relación de mapeo (Se mantiene igual)
+# Acepta un mapa de etiquetas para los ancestros
+def ingest_p279_hierarchy(connector: Neo4jConnector, entity_qid: str, entity_label: str, 
+                         qid_paths: List[List[str]], labels_map: Dict[str, str]):
+    """
+    Guarda la entidad principal (Item) y su jerarquía P279 con las etiquetas de los ancestros.
+    Los caminos comparten la ontología superior, así que se colapsan en un conjunto de aristas
+    y cada arista/label se escribe una sola vez por ejecución.
+    """
+    _queue_item_label(connector, entity_qid, entity_label)
+
+    new_edges = 0
+    for child_qid, parent_qid in p279_edge_set(entity_qid, qid_paths):
+        _queue_item_label(connector, parent_qid, labels_map.get(parent_qid, parent_qid))
+        if (child_qid, parent_qid) in connector.written_edges:
+            continue
+        connector.written_edges.add((child_qid, parent_qid))
+        connector.batch.add("subclass_of", {"child_qid": child_qid, "parent_qid": parent_qid})
+        new_edges += 1
+
+    print(f"   -> [Neo4j] Item {entity_qid} ingresado con {len(qid_paths)} rutas P279 ({new_edges} aristas nuevas).")
+
+
+# 2. Función para guardar el documento, keyword y la relación de mapeo
 def ingest_document_map(connector: Neo4jConnector, docid: str, keyword: str, qid: str):
-    connector.run_query("""
-        // 1. Nodos base
-        MERGE (d:Document {id: $docid})
-        MERGE (k:Keyword {name: $keyword})
-        MERGE (q:Item {qid: $qid})
-
-        // 2. Relación Documento -> Keyword
-        MERGE (d)-[:CONTAINS_KEYWORD]->(k)
-
-        // 3. Relación Keyword -> Item
-        MERGE (k)-[:MAPS_TO]->(q)
-    """, {
+    connector.batch.add("document_map", {
         "docid": docid,
         "keyword": keyword,
         "qid": qid
     })
 
-# 3. Función para guardar las relaciones P31 (Instancia de) (Se mantiene igual)
+# 3. Función para guardar las relaciones P31 (Instancia de)
 def ingest_p31_types(connector: Neo4jConnector, entity_qid: str, p31_ids: set, p31_labels: Dict[str, str]):
     for p31_qid in p31_ids:
         label = p31_labels.get(p31_qid, p31_qid)
         
-        connector.run_query("""
-            MERGE (item:Item {qid: $item_qid})
-            MERGE (type:Class {qid: $type_qid})
-            SET type.label = $type_label
-            MERGE (item)-[:INSTANCE_OF]->(type)
-        """, {
+        connector.batch.add("instance_of", {
             "item_qid": entity_qid,
             "type_qid": p31_qid,
             "type_label": label
@@ -142,54 +351,70 @@ def ingest_p31_types(connector: Neo4jConnector, entity_qid: str, p31_ids: set, p
 
 # =============== Funciones Helper (sin cambios) =================
 
-_ws_re = re.compile(r"\s+", re.UNICODE)
+# normalize_kw / singularize_en viven en vocabulary/ (compartidas con api/ y pipeline/);
+# para keywords se usa VOCAB, que memoriza sus formas normalizada y singular.
 _token_re = re.compile(r"[^\w\-]+")
 
-def normalize_kw(s: str) -> str:
-    if not s: return ""
-    s = s.replace("\u00A0", " ").replace("\ufeff", "")
-    s = _ws_re.sub(" ", s.strip())
-    s = s.strip(";, ")
-    return s
-
 def tokenize(text: str) -> List[str]:
     return [t for t in _token_re.split((text or "").lower()) if t]
 
-def singularize_en(word: str) -> str:
-    w = normalize_kw(word)
-    wl = w.lower()
-    if len(w) > 3 and wl.endswith("ies"): return w[:-3] + "y"
-    if len(w) > 3 and wl.endswith("ses"): return w[:-2]
-    if len(w) > 2 and wl.endswith("s") and not wl.endswith("ss"): return w[:-1]
-    return w
+# Caché de respuestas de la API (propia de cada proceso) y limitador compartido
+# opcional; linking_runner.py instala uno común a todos los workers.
+_API_CACHE: Dict[str, Dict] = {}
+RATE_LIMITER = None
 
 def _get(params: Dict, sleep_sec: float = 0.1) -> Dict:
     params = {**params, "format": "json"}
+    cache_key = json.dumps(params, sort_keys=True)
+    if cache_key in _API_CACHE:
+        REGISTRY.inc("cache_lookups_total", cache="wikidata_api", result="hit")
+        return _API_CACHE[cache_key]
+    REGISTRY.inc("cache_lookups_total", cache="wikidata_api", result="miss")
     for attempt in range(5):
         try:
-            r = requests.get(WIKIDATA_API, params=params, headers=HEADERS, timeout=20)
+            if RATE_LIMITER is not None: RATE_LIMITER.wait()
+            with REGISTRY.timer("wikidata_get"):
+                r = requests.get(WIKIDATA_API, params=params, headers=HEADERS, timeout=20)
+            REGISTRY.inc("http_requests_total", target="wikidata", status="ok" if r.ok else "error")
+            REGISTRY.inc("http_response_bytes_total", len(r.content), target="wikidata")
             r.raise_for_status()
             data = r.json()
             if "error" in data: raise RuntimeError(data["error"])
-            time.sleep(sleep_sec)
+            if RATE_LIMITER is None: time.sleep(sleep_sec)
+            _API_CACHE[cache_key] = data
             return data
         except Exception:
             if attempt == 4: raise
+            REGISTRY.inc("http_retries_total", target="wikidata")
             time.sleep(0.5 * (attempt + 1))
     return {}
 
+_offline_index: Optional[OfflineIndex] = None
+
+def offline_index() -> Optional[OfflineIndex]:
+    """Índice local cargado una sola vez; None si el backend es la API en vivo."""
+    global _offline_index
+    if LINKER_BACKEND != "offline":
+        return None
+    if _offline_index is None:
+        _offline_index = OfflineIndex.load(OFFLINE_INDEX_PATH)
+    return _offline_index
+
 def wbsearchentities(search: str, language: str = "en", limit: int = SEARCH_LIMIT) -> List[Dict]:
     search = normalize_kw(search)
+    if offline_index(): return offline_index().search(search, language, limit)
     return _get({"action": "wbsearchentities", "search": search, "language": language, "uselang": language, "type": "item", "limit": limit, "strictlanguage": 0}).get("search", [])
 
 def wbsearch_label_only(search: str, language: str = "en", limit: int = SEARCH_LIMIT) -> List[Dict]:
     search = normalize_kw(search)
+    if offline_index(): return offline_index().search(f"label:{search}", language, limit)
     return _get({"action": "wbsearchentities", "search": f"label:{search}", "language": language, "uselang": language, "type": "item", "limit": limit, "strictlanguage": 0}).get("search", [])
 
 def chunked(seq, size):
     for i in range(0, len(seq), size): yield seq[i:i + size]
 
 def wbgetentities(ids: List[str], languages: List[str] = LANGS) -> Dict:
+    if offline_index(): return offline_index().get_entities(list(ids), languages)
     combined = {}
     for batch in chunked(list(ids), 50):
         data = _get({"action": "wbgetentities", "ids": "|".join(batch), "props": "labels|descriptions|aliases|claims", "languages": "|".join(languages), "languagefallback": 1}, sleep_sec=0.05)
@@ -213,40 +438,50 @@ def best_label_and_aliases_str(ent_like: Dict) -> str:
     aliases = " ".join(ent_like.get("aliases") or [])
     return f"{label} {aliases}".strip()
 
-def label_similarity(keyword: str, ent_like: Dict) -> float:
-    target = best_label_and_aliases_str(ent_like)
-    return float(fuzz.token_sort_ratio(normalize_kw(keyword), normalize_kw(target)))
+# =============== SCORING EN LOTE =================
+# El contexto (title + abstract) se tokeniza una sola vez por documento y se guarda
+# como conjunto de IDs de token internados; todos los candidatos se puntúan juntos.
+# Los IDs solo valen dentro de una llamada a map_keywords (ver reset_token_ids).
 
-def context_overlap(keyword: str, context: str, ent_like: Dict) -> int:
-    ctx_tokens = set(tokenize(normalize_kw(context)))
-    label = (ent_like.get("label") or "")
-    desc = (ent_like.get("description") or "")
-    
-    # MODIFICACIÓN CLAVE: Obtener las aliases originales.
-    raw_aliases = " ".join(ent_like.get("aliases") or []) 
-    
-    # Crear una única cadena de contexto del candidato (Label, Desc, Aliases)
-    candidate_context_str = " ".join([label, desc, raw_aliases])
-    
-    # Obtener todos los tokens del contexto del candidato
-    all_candidate_tokens = tokenize(candidate_context_str)
+_token_ids: Dict[str, int] = {}
 
-    # Filtrar tokens que son el propio keyword (o sus variantes) para evitar sesgos
-    keyword_tokens = set(tokenize(normalize_kw(keyword)))
-    
-    # Crear el set final de tokens del candidato que no sean parte del keyword
-    cand_tokens = set(token for token in all_candidate_tokens if token not in keyword_tokens) 
-    
-    # Devolver la superposición
-    return len(ctx_tokens & cand_tokens)
+def token_id_set(text: str) -> FrozenSet[int]:
+    ids = _token_ids
+    return frozenset(ids.setdefault(t, len(ids)) for t in tokenize(text))
+
+@lru_cache(maxsize=1024)
+def context_token_ids(context: str) -> FrozenSet[int]:
+    return token_id_set(normalize_kw(context))
+
+def reset_token_ids():
+    """Vacía el mapa token -> ID y la caché de contextos (que guarda IDs) a la vez."""
+    _token_ids.clear()
+    context_token_ids.cache_clear()
 
-def total_score(keyword: str, context: str, ent_like: Dict, allow_exact_bonus: bool = True) -> float:
-    lbl = normalize_kw(ent_like.get("label") or "").lower()
-    kw_norm = normalize_kw(keyword).lower()
-    kw_sing = singularize_en(kw_norm).lower()
-    exact = (lbl == kw_norm) or (lbl == kw_sing)
-    exact_bonus = 50.0 if (allow_exact_bonus and exact) else 0.0
-    return exact_bonus + context_overlap(keyword, context, ent_like) + 0.6 * label_similarity(keyword, ent_like)
+def score_candidates(keyword: str, context: str, candidates: List[Dict], allow_exact_bonus: bool = True) -> List[Tuple[float, float]]:
+    """Devuelve (label_similarity, total_score) por candidato.
+
+    label_similarity: token_sort_ratio entre el keyword normalizado y label + aliases.
+    total_score: bono de 50 si el label es el keyword (o su singular) + tokens del contexto
+    en label/descripción/aliases que no son del keyword + 0.6 * label_similarity.
+    """
+    if not candidates: return []
+    kw = VOCAB.forms(keyword)
+    kw_norm, kw_lower, kw_sing = kw.normalized, kw.lower, kw.singular_lower
+    kw_ids = token_id_set(kw_norm)
+    ctx_ids = context_token_ids(context)
+
+    targets = [normalize_kw(best_label_and_aliases_str(c)) for c in candidates]
+    sims = process.cdist([kw_norm], targets, scorer=fuzz.token_sort_ratio, dtype=float)[0].tolist()
+
+    out = []
+    for c, sim in zip(candidates, sims):
+        lbl = normalize_kw(c.get("label") or "").lower()
+        exact_bonus = 50.0 if (allow_exact_bonus and (lbl == kw_lower or lbl == kw_sing)) else 0.0
+        cand_text = " ".join([c.get("label") or "", c.get("description") or "", " ".join(c.get("aliases") or [])])
+        overlap = len(ctx_ids & (token_id_set(cand_text) - kw_ids))
+        out.append((float(sim), exact_bonus + overlap + 0.6 * float(sim)))
+    return out
 
 def _claim_ids(entity: Dict, pid: str) -> List[str]:
     out = []
@@ -301,9 +536,9 @@ def extract_label(entity: Dict, languages: List[str] = LANGS) -> str:
     return ""
 
 def pick_exact_label_only(keyword: str) -> Optional[Dict]:
-    kw_norm = normalize_kw(keyword).lower()
-    kw_sing = singularize_en(kw_norm).lower()
-    targets = {kw_norm, kw_sing}
+    kw = VOCAB.forms(keyword)
+    kw_sing = kw.singular_lower
+    targets = {kw.lower, kw_sing}
     for lg in LANGS:
         # CORREGIDO: Usando 'limit=5'
         hits = wbsearch_label_only(kw_sing, language=lg, limit=5) or \
@@ -324,8 +559,9 @@ def pick_exact_label_only(keyword: str) -> Optional[Dict]:
     return None
 
 def pick_with_context_then_exact(keyword: str, context: str) -> Optional[Dict]:
-    keyword = normalize_kw(keyword); context = normalize_kw(context)
-    terms = [keyword]; kw_sing = singularize_en(keyword)
+    kw = VOCAB.forms(keyword); context = normalize_kw(context)
+    keyword = kw.normalized
+    terms = [keyword]; kw_sing = kw.singular
     if kw_sing != keyword: terms.append(kw_sing)
     raw, seen = [], set()
     for term in terms:
@@ -336,13 +572,14 @@ def pick_with_context_then_exact(keyword: str, context: str) -> Optional[Dict]:
                 seen.add(qid)
                 raw.append({"id": qid, "label": hit.get("label"), "description": hit.get("description"), "aliases": hit.get("aliases") or [], "language": lg})
     if raw:
-        ents = wbgetentities([c["id"] for c in raw]); candidates = []
+        ents = wbgetentities([c["id"] for c in raw]); candidates, bonuses = [], []
         for c in raw:
             ent = ents.get(c["id"], {}); p31s = get_p31_ids(ent)
             block, type_bonus = type_bonus_or_block(p31s)
             if block: continue
-            sim = label_similarity(keyword, c); score = total_score(keyword, context, c, allow_exact_bonus=True) + type_bonus
-            c["label_similarity"] = sim; c["match_score"] = score; c["__p31s"] = p31s; candidates.append(c)
+            c["__p31s"] = p31s; candidates.append(c); bonuses.append(type_bonus)
+        for c, type_bonus, (sim, score) in zip(candidates, bonuses, score_candidates(keyword, context, candidates, allow_exact_bonus=True)):
+            c["label_similarity"] = sim; c["match_score"] = score + type_bonus
         if candidates:
             candidates.sort(key=lambda c: (c["match_score"], c["label_similarity"], -LANGS.index(c.get("language", "en")) if c.get("language", "en") in LANGS else -99,), reverse=True,)
             top = candidates[0]
@@ -352,7 +589,56 @@ def pick_with_context_then_exact(keyword: str, context: str) -> Optional[Dict]:
 
 
 # =============== Pipeline con Neo4j =================
-def map_keywords(records: List[Dict], neo4j_conn: Neo4jConnector) -> List[Dict]:
+CSV_FIELDNAMES = [
+    "docid", "title", "keyword", "wikidata_label", "wikidata_qid",
+    "bnf_id", "p279_path", "retry_source", "match_stage", "is_disambiguation",
+    "label_similarity", "match_score", "p31_types", "p31_label"
+]
+
+def write_csv(rows: List[Dict], path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def record_docid(rec: Dict):
+    return rec.get("docid") or rec.get("halId_s") or ""
+
+def record_keywords(rec: Dict) -> List[str]:
+    keywords = rec.get("keyword_s") or []
+    if not keywords and rec.get("keywords_joined"):
+        keywords = split_keywords(rec["keywords_joined"])
+    return keywords
+
+def keyword_pair(docid, keyword: str) -> Tuple[str, int]:
+    """Clave de (documento, keyword) para deduplicar: variantes del mismo keyword
+    (espacios, separadores) comparten ID de VOCAB y cuentan como una."""
+    return str(docid), VOCAB.id(keyword)
+
+def scoring_config_hash() -> str:
+    """Hash de todo lo que cambia el resultado del enlace; si cambia, se re-enlaza."""
+    config = {
+        "backend": LINKER_BACKEND, "langs": LANGS, "min_label_sim": MIN_LABEL_SIM,
+        "min_total_score": MIN_TOTAL_SCORE, "max_levels": MAX_LEVELS_LINEAGE, "search_limit": SEARCH_LIMIT,
+        "disallowed_p31": sorted(DISALLOWED_P31), "preferred_p31": sorted(PREFERRED_P31),
+    }
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def pending_records(records: List[Dict], state: MappingStateStore, config_hash: str) -> List[Dict]:
+    """Records reducidos a los keywords que aún no están enlazados con `config_hash`."""
+    done = {keyword_pair(docid, kw) for docid, kw in state.current_pairs(config_hash)}
+    out = []
+    for rec in records:
+        docid = record_docid(rec)
+        pending = [kw for kw in record_keywords(rec) if keyword_pair(docid, kw) not in done]
+        if pending:
+            out.append({**rec, "keyword_s": pending, "keywords_joined": None})
+    return out
+
+def map_keywords(records: List[Dict], neo4j_conn: Optional[Neo4jConnector]) -> List[Dict]:
+    """Enlaza los keywords de cada record; sin `neo4j_conn` solo produce las filas del CSV."""
+    reset_token_ids()  # el mapa de tokens no crece entre llamadas (runner, orquestador, bench)
     rows = []
     seen_pairs = set()
 
@@ -360,18 +646,16 @@ def map_keywords(records: List[Dict], neo4j_conn: Neo4jConnector) -> List[Dict]:
         title = rec.get("title_s") or ""
         abstract = rec.get("abstract_s") or ""
         context = f"{title}. {abstract}"
-        docid = rec.get("docid") or rec.get("halId_s") or ""
-        
-        keywords = rec.get("keyword_s") or []
-        if not keywords and rec.get("keywords_joined"):
-            raw = rec["keywords_joined"]
-            keywords = [k.strip() for k in re.split(r"[;,]", raw) if k.strip()]
+        docid = record_docid(rec)
+        keywords = record_keywords(rec)
 
         print(f"\n--- Procesando Documento {docid} con {len(keywords)} keywords ---")
 
         for kw in keywords:
-            if (docid, kw) in seen_pairs: continue
-            seen_pairs.add((docid, kw))
+            # variantes del mismo keyword (espacios, separadores) comparten ID: se enlazan una vez
+            pair = keyword_pair(docid, kw)
+            if pair in seen_pairs: continue
+            seen_pairs.add(pair)
 
             # ... (Inicialización de variables para CSV)
             qid = label = bnf = ""
@@ -403,7 +687,7 @@ def map_keywords(records: List[Dict], neo4j_conn: Neo4jConnector) -> List[Dict]:
                         p31_labels_out = ";".join(p31_labels.get(x, x) for x in p31s_out)
                         
                         # Neo4j: Guardar P31 (Instancia de)
-                        ingest_p31_types(neo4j_conn, qid, p31s_out, p31_labels)
+                        if neo4j_conn: ingest_p31_types(neo4j_conn, qid, p31s_out, p31_labels)
 
 
                         # P279 (subclase de)
@@ -419,7 +703,7 @@ def map_keywords(records: List[Dict], neo4j_conn: Neo4jConnector) -> List[Dict]:
                             p279_labels_map = get_labels_for(list(all_p279_qids), LANGS)
                             
                             # Neo4j: Guardar P279 (Jerarquía) - ¡AÑADIR EL MAPA DE ETIQUETAS!
-                            ingest_p279_hierarchy(neo4j_conn, qid, label, qid_paths, p279_labels_map)
+                            if neo4j_conn: ingest_p279_hierarchy(neo4j_conn, qid, label, qid_paths, p279_labels_map)
 
                             # CSV: Convertir QID paths a etiquetas para la columna (usando el nuevo mapa)
                             for qpath in qid_paths:
@@ -427,7 +711,7 @@ def map_keywords(records: List[Dict], neo4j_conn: Neo4jConnector) -> List[Dict]:
                                 p279_paths_labels.append(" > ".join(p279_labels_map.get(q, q) for q in qpath))
                         
                         # Neo4j: Guardar el mapeo Documento-Keyword-Item (QID)
-                        ingest_document_map(neo4j_conn, docid, kw, qid)
+                        if neo4j_conn: ingest_document_map(neo4j_conn, docid, kw, qid)
 
             # --- Escritura del CSV (se mantiene igual) ---
             paths = p279_paths_labels or [""] if qid else [""]
@@ -446,8 +730,8 @@ def map_keywords(records: List[Dict], neo4j_conn: Neo4jConnector) -> List[Dict]:
                 
     return rows
 
-# =============== Main (sin cambios) =================
-def main():
+# =============== Main =================
+def connect_neo4j() -> Optional[Neo4jConnector]:
     print(f"🔗 Intentando conectar a Neo4j en {NEO4J_URI}...")
     try:
         # Usamos 127.0.0.1 como fallback si localhost sigue dando problemas
@@ -457,30 +741,61 @@ def main():
         print("✅ Conexión con Neo4j exitosa.")
     except Exception as e:
         print(f"❌ Error al conectar a Neo4j. Verifica tus credenciales y si el servicio está corriendo. Detalle: {e}")
-        return
+        return None
+    # fuera del except: un esquema que no se puede crear no es un problema de credenciales,
+    # y sin él cada MERGE es un label scan, así que se aborta en vez de seguir sin Neo4j
+    try:
+        ensure_schema(neo4j_conn.driver)
+    except Exception as e:
+        neo4j_conn.close()
+        raise RuntimeError(f"Esquema de Neo4j (constraints e índices full-text) no disponible: {e}") from e
+    return neo4j_conn
+
+def main():
+    serve_from_env()
+    if GRAPH_MODE == "export":
+        print(f"📦 Modo exportación: CSV de neo4j-admin en {EXPORT_ADMIN_DIR}, LOAD CSV en {EXPORT_LOAD_CSV_DIR}")
+        neo4j_conn = BulkExportConnector(GraphCsvExporter(EXPORT_ADMIN_DIR, EXPORT_LOAD_CSV_DIR))
+    else:
+        neo4j_conn = connect_neo4j()
+        if neo4j_conn is None: return
 
     print(f"📥 Leyendo JSON de: {INPUT_JSON}")
-    with open(INPUT_JSON, "r", encoding="utf-8") as f:
+    with stage("read_input"), open(INPUT_JSON, "r", encoding="utf-8") as f:
         records = json.load(f)
 
+    state = MappingStateStore(STATE_DB) if INCREMENTAL else None
+    config_hash = scoring_config_hash()
+    if state and GRAPH_MODE == "export":
+        # los CSV de exportación se reescriben enteros: con solo los pendientes quedaría un grafo parcial
+        print("♻️  Modo exportación: se enlazan todos los records (el estado incremental solo se actualiza).")
+    elif state:
+        total = len(records)
+        records = pending_records(records, state, config_hash)
+        print(f"♻️  Modo incremental: {len(records)}/{total} records con keywords pendientes.")
+
     print(f"🔍 Procesando {len(records)} records e ingresando en Neo4j y CSV...")
     
-    rows = map_keywords(records, neo4j_conn)
-
-    fieldnames = [
-        "docid", "title", "keyword", "wikidata_label", "wikidata_qid",
-        "bnf_id", "p279_path", "retry_source", "match_stage", "is_disambiguation",
-        "label_similarity", "match_score", "p31_types", "p31_label"
-    ]
-    OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
+    with stage("link"):
+        rows = map_keywords(records, neo4j_conn)
+
+    if state:
+        state.record_rows(rows, config_hash)
+        rows = state.all_rows()
+        state.close()
+
     print(f"\n💾 Guardando resultados en CSV: {OUTPUT_CSV}")
-    with open(OUTPUT_CSV, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    with stage("write_csv"):
+        write_csv(rows, OUTPUT_CSV)
 
-    neo4j_conn.close()
+    with stage("close"):  # vacía los lotes pendientes (o escribe los CSV del modo export)
+        neo4j_conn.close()
     print("✅ Proceso finalizado. Conexión a Neo4j cerrada.")
+    finish_run("wikidata_linking")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Enlace keyword -> Wikidata y escritura en Neo4j.")
+    add_profile_args(parser)
+    args = parser.parse_args()
+    with maybe_profile("wikidata_linking", args):
+        main()
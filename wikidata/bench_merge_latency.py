@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: latencia de MERGE por clave a medida que crece el grafo, con y sin constraint.
+
+Usa un label propio (BenchItem) para no tocar los datos reales y lo borra al final.
+
+    python bench_merge_latency.py --sizes 1000,10000,50000 --samples 200
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from neo4j import GraphDatabase
+
+from graph_schema import create_constraint, drop_constraint
+
+BENCH_LABEL = "BenchItem"
+BENCH_CONSTRAINT = "bench_item_qid_unique"
+
+
+def grow_to(session, current: int, target: int, batch: int = 5000) -> int:
+    """Añade nodos BenchItem hasta tener `target` en total."""
+    while current < target:
+        n = min(batch, target - current)
+        session.run(
+            f"UNWIND range($start, $end) AS i CREATE (:{BENCH_LABEL} {{qid: 'Q' + toString(i)}})",
+            {"start": current, "end": current + n - 1},
+        ).consume()
+        current += n
+    return current
+
+
+def merge_latencies_ms(session, size: int, samples: int) -> list:
+    """Latencia de MERGE individuales sobre claves existentes (sin crear nodos nuevos)."""
+    out = []
+    for _ in range(samples):
+        qid = f"Q{random.randrange(size)}"
+        t0 = time.perf_counter()
+        session.run(f"MERGE (n:{BENCH_LABEL} {{qid: $qid}}) SET n.label = $qid", {"qid": qid}).consume()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def summarize(lat: list) -> dict:
+    lat = sorted(lat)
+    return {
+        "p50_ms": round(statistics.median(lat), 3),
+        "p99_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.99))], 3),
+        "mean_ms": round(statistics.fmean(lat), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de MERGE vs tamaño del grafo.")
+    parser.add_argument("--uri", default="bolt://127.0.0.1:7687")
+    parser.add_argument("--user", default="neo4j")
+    parser.add_argument("--password", default="test")
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+    sizes = sorted(int(x) for x in args.sizes.split(","))
+
+    driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
+    results = []
+    try:
+        with driver.session() as session:
+            drop_constraint(session, BENCH_CONSTRAINT)
+            session.run(f"MATCH (n:{BENCH_LABEL}) CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS").consume()
+            current = 0
+            for size in sizes:
+                current = grow_to(session, current, size)
+
+                drop_constraint(session, BENCH_CONSTRAINT)
+                without = summarize(merge_latencies_ms(session, size, args.samples))
+
+                create_constraint(session, BENCH_CONSTRAINT, BENCH_LABEL, "qid")
+                session.run("CALL db.awaitIndexes(300)").consume()
+                with_c = summarize(merge_latencies_ms(session, size, args.samples))
+
+                results.append({"nodes": size, "without_constraint": without, "with_constraint": with_c})
+                print(f"{size:>9} nodos | sin constraint p50={without['p50_ms']}ms p99={without['p99_ms']}ms"
+                      f" | con constraint p50={with_c['p50_ms']}ms p99={with_c['p99_ms']}ms")
+
+            drop_constraint(session, BENCH_CONSTRAINT)
+            session.run(f"MATCH (n:{BENCH_LABEL}) CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS").consume()
+    finally:
+        driver.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modo de exportación masiva del grafo Document/Keyword/Item/Class.
+
+`GraphCsvExporter` recibe las mismas filas que `BatchedGraphWriter` (item, subclass_of,
+instance_of, document_map), las deduplica en memoria y al cerrar escribe:
+
+  - <admin_dir>/*.csv + import_command.txt : formato `neo4j-admin import` (build inicial offline)
+  - <load_csv_dir>/*.csv + load_csv.cypher : archivos para LOAD CSV desde el volumen /import
+    de docker-compose.yml (./tests/resources -> /import)
+"""
+
+import csv
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+NODE_FILES = {
+    "Document": "documents.csv",
+    "Keyword": "keywords.csv",
+    "Item": "items.csv",
+    "Class": "classes.csv",
+}
+# tipo -> (archivo, label origen, label destino)
+REL_FILES = {
+    "CONTAINS_KEYWORD": ("contains_keyword.csv", "Document", "Keyword"),
+    "MAPS_TO": ("maps_to.csv", "Keyword", "Item"),
+    "SUBCLASS_OF": ("subclass_of.csv", "Item", "Item"),
+    "INSTANCE_OF": ("instance_of.csv", "Item", "Class"),
+}
+# label -> propiedad clave (la misma que usan los MERGE del pipeline)
+NODE_KEYS = {"Document": "id", "Keyword": "name", "Item": "qid", "Class": "qid"}
+
+
+class GraphCsvExporter:
+    def __init__(self, admin_dir: Path, load_csv_dir: Path, import_subdir: str = "wikidata_graph"):
+        self.admin_dir = Path(admin_dir)
+        self.load_csv_dir = Path(load_csv_dir)
+        self.import_subdir = import_subdir
+        # label -> clave -> label legible (o None)
+        self.nodes: Dict[str, Dict[object, Optional[str]]] = {label: {} for label in NODE_FILES}
+        self.rels: Dict[str, Set[Tuple[object, object]]] = {rel: set() for rel in REL_FILES}
+
+    # --- misma interfaz que BatchedGraphWriter ---
+    def add(self, name: str, row: Dict):
+        if name == "item":
+            self._node("Item", row["qid"], row.get("label"))
+        elif name == "subclass_of":
+            self._node("Item", row["child_qid"])
+            self._node("Item", row["parent_qid"])
+            self.rels["SUBCLASS_OF"].add((row["child_qid"], row["parent_qid"]))
+        elif name == "instance_of":
+            self._node("Item", row["item_qid"])
+            self._node("Class", row["type_qid"], row.get("type_label"))
+            self.rels["INSTANCE_OF"].add((row["item_qid"], row["type_qid"]))
+        elif name == "document_map":
+            self._node("Document", row["docid"])
+            self._node("Keyword", row["keyword"])
+            self._node("Item", row["qid"])
+            self.rels["CONTAINS_KEYWORD"].add((row["docid"], row["keyword"]))
+            self.rels["MAPS_TO"].add((row["keyword"], row["qid"]))
+        else:
+            raise KeyError(name)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.write_admin_import()
+        self.write_load_csv()
+
+    def _node(self, label: str, key, display: Optional[str] = None):
+        # como `SET n.label = ...`: el último label no vacío gana
+        if display or key not in self.nodes[label]:
+            self.nodes[label][key] = display or self.nodes[label].get(key)
+
+    def _int_doc_ids(self) -> bool:
+        return all(isinstance(k, int) for k in self.nodes["Document"])
+
+    # --- neo4j-admin import ---
+    def write_admin_import(self):
+        self.admin_dir.mkdir(parents=True, exist_ok=True)
+        doc_id_col = "id:long" if self._int_doc_ids() else "id"
+        for label, fname in NODE_FILES.items():
+            key = NODE_KEYS[label]
+            with open(self.admin_dir / fname, "w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                if label == "Document":
+                    w.writerow([f":ID({label})", doc_id_col])
+                    w.writerows([k, k] for k in self.nodes[label])
+                elif label == "Keyword":
+                    w.writerow([f"{key}:ID({label})"])
+                    w.writerows([k] for k in self.nodes[label])
+                else:
+                    w.writerow([f"{key}:ID({label})", "label"])
+                    w.writerows([k, v or ""] for k, v in self.nodes[label].items())
+        for rel, (fname, src, dst) in REL_FILES.items():
+            with open(self.admin_dir / fname, "w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                w.writerow([f":START_ID({src})", f":END_ID({dst})"])
+                w.writerows(sorted(self.rels[rel], key=str))
+
+        args = [f"--nodes={label}={fname}" for label, fname in NODE_FILES.items()]
+        args += [f"--relationships={rel}={fname}" for rel, (fname, _, _) in REL_FILES.items()]
+        cmd = "neo4j-admin import --database=neo4j --skip-duplicate-nodes=true \\\n  " + " \\\n  ".join(args)
+        (self.admin_dir / "import_command.txt").write_text(cmd + "\n", encoding="utf-8")
+
+    # --- LOAD CSV ---
+    def write_load_csv(self):
+        out = self.load_csv_dir / self.import_subdir
+        out.mkdir(parents=True, exist_ok=True)
+        for label, fname in NODE_FILES.items():
+            with open(out / fname, "w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                w.writerow(["key", "label"])
+                w.writerows([k, v or ""] for k, v in self.nodes[label].items())
+        for rel, (fname, _, _) in REL_FILES.items():
+            with open(out / fname, "w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                w.writerow(["start", "end"])
+                w.writerows(sorted(self.rels[rel], key=str))
+        (out / "load_csv.cypher").write_text(self._load_csv_script(), encoding="utf-8")
+
+    def _load_csv_script(self) -> str:
+        doc_key = "toInteger(r.key)" if self._int_doc_ids() else "r.key"
+        keys = {"Document": doc_key, "Keyword": "r.key", "Item": "r.key", "Class": "r.key"}
+        src_keys = {"Document": doc_key.replace("r.key", "r.start"), "Keyword": "r.start", "Item": "r.start"}
+        dst_keys = {"Keyword": "r.end", "Item": "r.end", "Class": "r.end"}
+        base = f"file:///{self.import_subdir}"
+        parts = ["// Ejecutar después de graph_schema.py (constraints) con cypher-shell"]
+        for label, fname in NODE_FILES.items():
+            # LOAD CSV lee un campo vacío como null: sin label, se conserva el que ya tenga el nodo
+            set_label = "" if label in ("Document", "Keyword") else \
+                " SET n.label = CASE WHEN r.label IS NULL OR r.label = '' THEN n.label ELSE r.label END"
+            parts.append(
+                f"LOAD CSV WITH HEADERS FROM '{base}/{fname}' AS r\n"
+                f"CALL {{ WITH r MERGE (n:{label} {{{NODE_KEYS[label]}: {keys[label]}}}){set_label} }} IN TRANSACTIONS OF 1000 ROWS;"
+            )
+        for rel, (fname, src, dst) in REL_FILES.items():
+            parts.append(
+                f"LOAD CSV WITH HEADERS FROM '{base}/{fname}' AS r\n"
+                f"CALL {{ WITH r MATCH (a:{src} {{{NODE_KEYS[src]}: {src_keys[src]}}}) "
+                f"MATCH (b:{dst} {{{NODE_KEYS[dst]}: {dst_keys[dst]}}}) MERGE (a)-[:{rel}]->(b) }} IN TRANSACTIONS OF 1000 ROWS;"
+            )
+        return "\n\n".join(parts) + "\n"
+
+
+class BulkExportConnector:
+    """Sustituto de Neo4jConnector para map_keywords: las filas van al exportador, no a Neo4j."""
+
+    def __init__(self, exporter: GraphCsvExporter):
+        self.batch = exporter
+        self.written_edges: Set[Tuple[str, str]] = set()
+        self.written_labels: Dict[str, str] = {}
+
+    def flush(self):
+        self.batch.flush()
+
+    def close(self):
+        self.batch.close()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Esquema Neo4j (constraints de unicidad e índices full-text) del grafo Document/Keyword/Item/Class.
+
+Cada MERGE del pipeline busca por una de estas propiedades; sin constraint (que crea
+su índice) cada MERGE es un label scan. `ensure_schema` es idempotente: crea lo que
+falte, espera a que los índices estén ONLINE y verifica el resultado.
+
+    python graph_schema.py                 # crea y verifica
+    python graph_schema.py --verify-only
+"""
+
+import argparse
+from typing import List, Tuple
+
+from neo4j import Driver, GraphDatabase
+
+# (nombre, label, propiedad)
+GRAPH_CONSTRAINTS: List[Tuple[str, str, str]] = [
+    ("item_qid_unique", "Item", "qid"),
+    ("document_id_unique", "Document", "id"),
+    ("keyword_name_unique", "Keyword", "name"),
+    ("class_qid_unique", "Class", "qid"),
+]
+
+# Índices full-text para la búsqueda/autocompletado (ver neo4j-keywords/movies/fulltext.py)
+GRAPH_FULLTEXT_INDEXES: List[Tuple[str, str, str]] = [
+    ("keyword_name_fulltext", "Keyword", "name"),
+    ("item_label_fulltext", "Item", "label"),
+]
+
+
+def create_constraint(session, name: str, label: str, prop: str):
+    session.run(
+        f"CREATE CONSTRAINT {name} IF NOT EXISTS "
+        f"FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+    ).consume()
+
+
+def drop_constraint(session, name: str):
+    session.run(f"DROP CONSTRAINT {name} IF EXISTS").consume()
+
+
+def missing_constraints(session, constraints: List[Tuple[str, str, str]] = GRAPH_CONSTRAINTS) -> List[Tuple[str, str, str]]:
+    """Constraints de `constraints` que no existen (comparando label + propiedad)."""
+    existing = set()
+    for rec in session.run("SHOW CONSTRAINTS YIELD labelsOrTypes, properties, type"):
+        if "UNIQUE" not in rec["type"]:
+            continue
+        for label in rec["labelsOrTypes"] or []:
+            existing.add((label, tuple(rec["properties"] or [])))
+    return [c for c in constraints if (c[1], (c[2],)) not in existing]
+
+
+def create_fulltext_index(session, name: str, label: str, prop: str):
+    session.run(f"CREATE FULLTEXT INDEX {name} IF NOT EXISTS FOR (n:{label}) ON EACH [n.{prop}]").consume()
+
+
+def missing_fulltext_indexes(session, indexes: List[Tuple[str, str, str]] = GRAPH_FULLTEXT_INDEXES) -> List[Tuple[str, str, str]]:
+    existing = {rec["name"] for rec in session.run("SHOW INDEXES YIELD name, type") if rec["type"] == "FULLTEXT"}
+    return [ix for ix in indexes if ix[0] not in existing]
+
+
+def ensure_schema(driver: Driver, constraints: List[Tuple[str, str, str]] = GRAPH_CONSTRAINTS,
+                  fulltext_indexes: List[Tuple[str, str, str]] = GRAPH_FULLTEXT_INDEXES,
+                  timeout_sec: int = 300):
+    """Crea los constraints e índices full-text que falten y falla si alguno sigue sin existir."""
+    with driver.session() as session:
+        for name, label, prop in missing_constraints(session, constraints):
+            create_constraint(session, name, label, prop)
+            print(f"   -> [Neo4j] Constraint {name} creado ({label}.{prop}).")
+        for name, label, prop in missing_fulltext_indexes(session, fulltext_indexes):
+            create_fulltext_index(session, name, label, prop)
+            print(f"   -> [Neo4j] Índice full-text {name} creado ({label}.{prop}).")
+        session.run("CALL db.awaitIndexes($timeout)", {"timeout": timeout_sec}).consume()
+        still_missing = missing_constraints(session, constraints) + missing_fulltext_indexes(session, fulltext_indexes)
+    if still_missing:
+        raise RuntimeError(f"Esquema de Neo4j incompleto: {[c[0] for c in still_missing]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Constraints Neo4j del grafo Wikidata.")
+    parser.add_argument("--uri", default="bolt://127.0.0.1:7687")
+    parser.add_argument("--user", default="neo4j")
+    parser.add_argument("--password", default="test")
+    parser.add_argument("--verify-only", action="store_true")
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
+    try:
+        if args.verify_only:
+            with driver.session() as session:
+                missing = missing_constraints(session) + missing_fulltext_indexes(session)
+            print("✅ Esquema completo." if not missing else f"❌ Faltan: {[c[0] for c in missing]}")
+        else:
+            ensure_schema(driver)
+            print("✅ Esquema Neo4j verificado.")
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Runner multiproceso para el enlace keyword -> Wikidata de Neo4j-wikidata_v2.py.
+
+Los documentos se reparten en bloques contiguos entre un pool de procesos. Cada
+worker carga su propia copia del linker (y por lo tanto su propia caché de la API),
+todas las llamadas HTTP pasan por un limitador de ritmo compartido entre procesos,
+y las filas se juntan en el orden original de los documentos, con el mismo esquema
+de CSV que el script secuencial.
+
+    python linking_runner.py --workers 4 --input ../api/data/upec_chemical_20_5.json --output out.csv
+"""
+
+import argparse
+import importlib.util
+import json
+import multiprocessing as mp
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+LINKER_PATH = Path(__file__).resolve().parent / "Neo4j-wikidata_v2.py"
+DEFAULT_MIN_INTERVAL = 0.1   # segundos entre llamadas a la API, sumando todos los workers
+
+
+def load_linker():
+    """Importa Neo4j-wikidata_v2.py (el guion en el nombre impide un import normal)."""
+    if "neo4j_wikidata_v2" in sys.modules:
+        return sys.modules["neo4j_wikidata_v2"]
+    sys.path.insert(0, str(LINKER_PATH.parent))
+    spec = importlib.util.spec_from_file_location("neo4j_wikidata_v2", LINKER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["neo4j_wikidata_v2"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class SharedRateLimiter:
+    """Reparte turnos separados por `min_interval` segundos entre todos los procesos."""
+
+    def __init__(self, min_interval: float, ctx=mp):
+        self.min_interval = min_interval
+        self._next_slot = ctx.Value("d", 0.0)
+
+    def wait(self):
+        with self._next_slot.get_lock():
+            now = time.time()
+            slot = max(now, self._next_slot.value)
+            self._next_slot.value = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# =============== WORKER =================
+
+_linker = None
+_conn = None
+_close_barrier = None
+CLOSE_TIMEOUT_SEC = 300
+
+
+def _init_worker(limiter: SharedRateLimiter, neo4j_cfg: Optional[Tuple[str, str, str]], close_barrier):
+    global _linker, _conn, _close_barrier
+    _linker = load_linker()
+    _linker.RATE_LIMITER = limiter
+    _close_barrier = close_barrier
+    if neo4j_cfg:
+        _conn = _linker.Neo4jConnector(*neo4j_cfg)
+
+
+def _link_chunk(chunk: List[Dict]) -> List[Dict]:
+    rows = _linker.map_keywords(chunk, _conn)
+    if _conn:
+        _conn.flush()  # lo encolado en el writer por lotes / asíncrono llega a Neo4j antes de devolver
+    return rows
+
+
+def _close_worker(_) -> bool:
+    """Una tarea por worker: cierra su conexión. La barrera impide que un mismo worker
+    tome dos de estas tareas y deje otro sin cerrar."""
+    global _conn
+    if _conn:
+        _conn.close()
+        _conn = None
+    _close_barrier.wait(CLOSE_TIMEOUT_SEC)
+    return True
+
+
+# =============== RUNNER =================
+
+def split_records(records: List[Dict], n_chunks: int) -> List[List[Dict]]:
+    """Bloques contiguos; los records de un mismo documento (record_docid) quedan en el mismo bloque."""
+    record_docid = load_linker().record_docid
+    n_chunks = max(1, min(n_chunks, len(records)))
+    size = -(-len(records) // n_chunks)
+    chunks, current = [], []
+    for i, rec in enumerate(records):
+        current.append(rec)
+        nxt = records[i + 1] if i + 1 < len(records) else None
+        same_doc = nxt is not None and record_docid(nxt) == record_docid(rec)
+        if len(current) >= size and not same_doc:
+            chunks.append(current)
+            current = []
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def run_linking(records: List[Dict], workers: int = 4, chunks_per_worker: int = 4,
+                min_interval: float = DEFAULT_MIN_INTERVAL,
+                neo4j_cfg: Optional[Tuple[str, str, str]] = None) -> List[Dict]:
+    """Enlaza `records` en paralelo y devuelve las filas en el orden de los documentos."""
+    ctx = mp.get_context("spawn")
+    limiter = SharedRateLimiter(min_interval, ctx)
+    chunks = split_records(records, workers * chunks_per_worker)
+    keyword_pair = load_linker().keyword_pair  # misma clave que map_keywords
+
+    rows, seen_pairs = [], set()
+    close_barrier = ctx.Barrier(workers)
+    with ctx.Pool(processes=workers, initializer=_init_worker, initargs=(limiter, neo4j_cfg, close_barrier)) as pool:
+        # imap conserva el orden de los bloques aunque terminen en otro orden
+        for chunk_rows in pool.imap(_link_chunk, chunks):
+            chunk_pairs = set()
+            for row in chunk_rows:
+                pair = keyword_pair(row["docid"], row["keyword"])
+                if pair in seen_pairs:
+                    continue
+                chunk_pairs.add(pair)
+                rows.append(row)
+            seen_pairs |= chunk_pairs
+        # salir del `with` llama a terminate(): cerrar las conexiones y esperar antes
+        pool.map(_close_worker, range(workers), chunksize=1)
+        pool.close()
+        pool.join()
+    return rows
+
+
+def main():
+    linker = load_linker()
+    parser = argparse.ArgumentParser(description="Enlace keyword -> Wikidata en paralelo.")
+    parser.add_argument("--input", type=Path, default=linker.INPUT_JSON)
+    parser.add_argument("--output", type=Path, default=linker.OUTPUT_CSV)
+    parser.add_argument("--workers", type=int, default=max(1, (mp.cpu_count() or 2) - 1))
+    parser.add_argument("--min-interval", type=float, default=DEFAULT_MIN_INTERVAL,
+                        help="segundos mínimos entre llamadas a Wikidata (global)")
+    parser.add_argument("--no-neo4j", action="store_true", help="solo CSV, sin escribir en Neo4j")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        records = json.load(f)
+
+    neo4j_cfg = None
+    if not args.no_neo4j:
+        neo4j_cfg = (linker.NEO4J_URI.replace("localhost", "127.0.0.1"), linker.NEO4J_USER, linker.NEO4J_PASSWORD)
+        conn = linker.Neo4jConnector(*neo4j_cfg)
+        linker.ensure_schema(conn.driver)  # una vez, antes de que los workers empiecen a hacer MERGE
+        conn.close()
+
+    state = None
+    if linker.INCREMENTAL:
+        state = linker.MappingStateStore(args.output.with_suffix(".state.sqlite"))
+        config_hash = linker.scoring_config_hash()
+        records = linker.pending_records(records, state, config_hash)
+
+    print(f"🔍 Enlazando {len(records)} records con {args.workers} procesos...")
+    start = time.time()
+    rows = run_linking(records, workers=args.workers, min_interval=args.min_interval, neo4j_cfg=neo4j_cfg) if records else []
+    if state:
+        state.record_rows(rows, config_hash)
+        rows = state.all_rows()
+        state.close()
+    linker.write_csv(rows, args.output)
+    print(f"✅ {len(rows)} filas en {time.time() - start:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,10 @@ OUTPUT_DIR = REPO_ROOT / "wikidata" / "hal_field_audit_out"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_CSV = OUTPUT_DIR / "Upec_Wikidata_Enriched_Improved.csv"
 
+import sys
+sys.path.insert(0, str(REPO_ROOT))  # vocabulary/ lives at the repo root
+from vocabulary import VOCAB, split_keywords
+
 # --- Load HAL documents ---
 with open(INPUT_JSON, "r", encoding="utf-8") as f:
     documents = json.load(f)
@@ -24,9 +28,10 @@ def get_keywords(d):
     # common HAL shapes: list under 'keywords' or 'keyword_s'
     ks = d.get("keywords")
     if ks is None: ks = d.get("keyword_s")
-    if isinstance(ks, str):  # sometimes comma-separated
-        ks = [k.strip() for k in ks.split(",") if k.strip()]
-    return ks or []
+    if isinstance(ks, str):  # sometimes joined with commas or semicolons
+        ks = split_keywords(ks)
+    # one entry per keyword, whatever its whitespace/separator variants in the record
+    return VOCAB.unique(ks or [])
 
 # Flatten keywords with context
 keyword_entries = []
@@ -45,17 +50,37 @@ sparql.addCustomHttpHeader("User-Agent",
 # Simple cache to avoid repeating requests
 dependency_cache = {}
 
-def search_candidates(term, limit=8, sleep=0.35):
-    clean = term.strip().lower().replace('"','').replace('\\','')
+def _sparql_literal(term):
+    """Make a keyword safe to embed inside a double-quoted SPARQL literal."""
+    return " ".join(term.replace('"', " ").replace("\\", " ").split())
+
+def search_candidates(term, limit=8, sleep=0.35, language="en"):
+    """
+    Candidate generation through the Wikidata entity-search index (mwapi EntitySearch).
+    Each call is an index lookup on labels/aliases instead of a scan over every
+    rdfs:label, so only the keyword goes in here; the document context is used later
+    for reranking (see score_candidate).
+    """
+    clean = _sparql_literal(term)
+    if not clean:
+        return []
     query = f"""
     SELECT ?item ?itemLabel ?bnfID WHERE {{
-      ?item rdfs:label ?label .
-      FILTER(CONTAINS(LCASE(?label), "{clean}"))
+      SERVICE wikibase:mwapi {{
+        bd:serviceParam wikibase:endpoint "www.wikidata.org" ;
+                        wikibase:api "EntitySearch" ;
+                        wikibase:limit {int(limit)} ;
+                        mwapi:search "{clean}" ;
+                        mwapi:language "{language}" .
+        ?item wikibase:apiOutputItem mwapi:item .
+        ?num wikibase:apiOrdinal true .
+      }}
       MINUS {{ ?item wdt:P31 wd:Q4167410 }}  # fuera páginas de desambiguación
       OPTIONAL {{ ?item wdt:P268 ?bnfID. }}
       SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en,fr". }}
     }}
-    LIMIT {limit}
+    ORDER BY ?num
+    LIMIT {int(limit)}
     """
     sparql.setQuery(query)
     try:
@@ -64,20 +89,39 @@ def search_candidates(term, limit=8, sleep=0.35):
     except Exception:
         return []
 
-
-
-def is_disambiguation(qid):
-    query = (
-        "ASK { "
-        f"  wd:{qid} wdt:P31 wd:Q4167410. "
-        "}"
-    )
+def search_fulltext(term, limit=8, sleep=0.35):
+    """
+    Fallback candidate generation through the CirrusSearch full-text index (mwapi Search).
+    Disambiguation pages are excluded inside the index with -haswbstatement.
+    """
+    clean = _sparql_literal(term)
+    if not clean:
+        return []
+    query = f"""
+    SELECT ?item ?itemLabel ?bnfID WHERE {{
+      SERVICE wikibase:mwapi {{
+        bd:serviceParam wikibase:endpoint "www.wikidata.org" ;
+                        wikibase:api "Search" ;
+                        wikibase:limit {int(limit)} ;
+                        mwapi:srsearch "{clean} -haswbstatement:P31=Q4167410" ;
+                        mwapi:srnamespace "0" .
+        ?item wikibase:apiOutputItem mwapi:title .
+        ?num wikibase:apiOrdinal true .
+      }}
+      OPTIONAL {{ ?item wdt:P268 ?bnfID. }}
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en,fr". }}
+    }}
+    ORDER BY ?num
+    LIMIT {int(limit)}
+    """
     sparql.setQuery(query)
     try:
-        time.sleep(0.2)
-        return sparql.query().convert()["boolean"]
+        time.sleep(sleep)
+        return sparql.query().convert()["results"]["bindings"]
     except Exception:
-        return False
+        return []
+
+
 
 def score_candidate(label, keyword, title, abstract):
     context = f"{keyword} {title} {abstract}".lower()
@@ -117,27 +161,22 @@ def build_lineage(qid, max_nodes=40):
 def enrich_keyword(entry):
     kw, title, abstract = entry["keyword"], entry["title"], entry["abstract"]
 
-    # Step 1: context-aware search
-    candidates = search_candidates(f"{kw} {title} {abstract}", limit=10, sleep=0.6)
+    # Step 1: index lookup on the keyword, reranked with the document context
+    candidates = search_candidates(kw, limit=10, sleep=0.6)
     scored = []
     for c in candidates:
+        # disambiguation pages are already removed by the MINUS in search_candidates
         label = c["itemLabel"]["value"]
-        qid = c["item"]["value"].split("/")[-1]
-        if is_disambiguation(qid):
-            continue
         scored.append((score_candidate(label, kw, title, abstract), c))
     scored.sort(reverse=True, key=lambda x: x[0])
     match_source = "context"
 
-    # Step 2: fallback to keyword-only
+    # Step 2: fallback to full-text search on the keyword, keyword-only scoring
     if not scored:
-        candidates = search_candidates(kw, limit=10, sleep=0.6)
+        candidates = search_fulltext(kw, limit=10, sleep=0.6)
         scored = []
         for c in candidates:
             label = c["itemLabel"]["value"]
-            qid = c["item"]["value"].split("/")[-1]
-            if is_disambiguation(qid):
-                continue
             scored.append((score_candidate(label, kw, "", ""), c))
         scored.sort(reverse=True, key=lambda x: x[0])
         match_source = "fallback"
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estado persistente del enlace keyword -> Wikidata (SQLite).
+
+Por cada par (docid, keyword) se guarda el QID elegido, sus scores, la etapa del
+match, la fecha y el hash de la configuración de scoring con la que se calculó,
+además de las filas del CSV. Así una ejecución solo enlaza los pares nuevos o los
+calculados con otra configuración, y el CSV completo se reconstruye desde aquí.
+"""
+
+import json
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mappings (
+    docid            TEXT NOT NULL,
+    keyword          TEXT NOT NULL,
+    wikidata_qid     TEXT,
+    match_stage      TEXT,
+    label_similarity REAL,
+    match_score      REAL,
+    config_hash      TEXT NOT NULL,
+    updated_at       TEXT NOT NULL,
+    rows_json        TEXT NOT NULL,
+    PRIMARY KEY (docid, keyword)
+);
+"""
+
+
+class MappingStateStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def current_pairs(self, config_hash: str) -> Set[Tuple[str, str]]:
+        """Pares ya enlazados con la configuración actual."""
+        cur = self.conn.execute("SELECT docid, keyword FROM mappings WHERE config_hash = ?", (config_hash,))
+        return {(d, k) for d, k in cur}
+
+    def record_rows(self, rows: Iterable[Dict], config_hash: str):
+        """Guarda (o reemplaza) las filas del CSV agrupadas por par (docid, keyword)."""
+        grouped: Dict[Tuple[str, str], List[Dict]] = {}
+        for row in rows:
+            grouped.setdefault((str(row["docid"]), row["keyword"]), []).append(row)
+
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self.conn:
+            for (docid, kw), pair_rows in grouped.items():
+                first = pair_rows[0]
+                self.conn.execute(
+                    """
+                    INSERT INTO mappings (docid, keyword, wikidata_qid, match_stage, label_similarity,
+                                          match_score, config_hash, updated_at, rows_json)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (docid, keyword) DO UPDATE SET
+                        wikidata_qid = excluded.wikidata_qid,
+                        match_stage = excluded.match_stage,
+                        label_similarity = excluded.label_similarity,
+                        match_score = excluded.match_score,
+                        config_hash = excluded.config_hash,
+                        updated_at = excluded.updated_at,
+                        rows_json = excluded.rows_json
+                    """,
+                    (docid, kw, first.get("wikidata_qid") or None, first.get("match_stage"),
+                     first.get("label_similarity"), first.get("match_score"), config_hash, now,
+                     json.dumps(pair_rows, ensure_ascii=False)),
+                )
+
+    def all_rows(self) -> List[Dict]:
+        """Todas las filas guardadas, en el orden en que se enlazó cada par por primera vez."""
+        rows = []
+        for (rows_json,) in self.conn.execute("SELECT rows_json FROM mappings ORDER BY rowid"):
+            rows.extend(json.loads(rows_json))
+        return rows
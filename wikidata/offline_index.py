@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice local (offline) de un subconjunto de Wikidata para la generación de candidatos.
+
+Construcción:
+    python offline_index.py dump_slice.json.gz cache/*.json -o hal_field_audit_out/wikidata_subset_index.json.gz
+
+Las fuentes pueden ser:
+  - un fragmento del dump JSON de Wikidata (una entidad por línea, con o sin los
+    corchetes/comas del dump completo; .gz y .bz2 aceptados),
+  - respuestas guardadas de `wbgetentities` ({"entities": {...}}).
+
+Por entidad se guardan solo labels, descriptions, aliases, P31, P279 y P268.
+`OfflineIndex` expone `search` (mismo formato que `wbsearchentities`) y
+`get_entities` (mismo formato que `wbgetentities`), así que el linker de
+Neo4j-wikidata_v2.py puede usarlo sin cambios en el scoring.
+"""
+
+import argparse
+import bz2
+import gzip
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+LANGS = ["en", "fr"]
+KEPT_PROPERTIES = ("P31", "P279", "P268")
+Q_DISAMBIGUATION = "Q4167410"
+
+_ws_re = re.compile(r"\s+", re.UNICODE)
+
+
+def normalize_key(s: str) -> str:
+    """Clave de búsqueda: minúsculas y espacios colapsados."""
+    s = (s or "").replace("\u00A0", " ").replace("\ufeff", "")
+    return _ws_re.sub(" ", s.strip()).lower()
+
+
+# =============== LECTURA DE FUENTES =================
+
+def _open_text(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_entities(path: Path) -> Iterator[Dict]:
+    """Recorre las entidades de un fragmento de dump o de una respuesta wbgetentities."""
+    with _open_text(path) as f:
+        head = f.read(1 << 16).lstrip()
+    if head.startswith("{") and not head.startswith('{"type"'):
+        # respuesta wbgetentities guardada tal cual
+        with _open_text(path) as f:
+            data = json.load(f)
+        yield from (e for e in data.get("entities", {}).values() if isinstance(e, dict))
+        return
+    with _open_text(path) as f:
+        for line in f:
+            line = line.strip().rstrip(",")
+            if not line or line in ("[", "]"):
+                continue
+            yield json.loads(line)
+
+
+def _claim_values(entity: Dict, pid: str) -> List[str]:
+    out = []
+    for cl in entity.get("claims", {}).get(pid, []):
+        dv = cl.get("mainsnak", {}).get("datavalue", {}).get("value")
+        if isinstance(dv, dict) and dv.get("id"):
+            out.append(dv["id"])
+        elif isinstance(dv, str) and dv:
+            out.append(dv)
+    return out
+
+
+def compact_entity(entity: Dict, languages: List[str] = LANGS) -> Optional[Dict]:
+    """Reduce una entidad completa a los campos que usa el linker."""
+    qid = entity.get("id")
+    if not qid or not qid.startswith("Q"):
+        return None
+    labels = {lg: v["value"] for lg, v in entity.get("labels", {}).items() if lg in languages}
+    if not labels:
+        return None
+    rec = {
+        "l": labels,
+        "d": {lg: v["value"] for lg, v in entity.get("descriptions", {}).items() if lg in languages},
+        "a": {lg: [a["value"] for a in vals] for lg, vals in entity.get("aliases", {}).items() if lg in languages},
+    }
+    for pid in KEPT_PROPERTIES:
+        vals = _claim_values(entity, pid)
+        if vals:
+            rec[pid] = vals
+    return rec
+
+
+def _iter_compact(sources: List[Path], languages: List[str]) -> Iterator[Tuple[str, Dict]]:
+    """(qid, rec) de las fuentes, sin páginas de desambiguación."""
+    for src in sources:
+        for ent in iter_entities(Path(src)):
+            rec = compact_entity(ent, languages)
+            if rec is None or Q_DISAMBIGUATION in rec.get("P31", []):
+                continue
+            yield ent["id"], rec
+
+
+def lineage_closure(sources: List[Path], languages: List[str], classes: Set[str]) -> Set[str]:
+    """
+    QIDs a conservar con `classes`: las entidades cuyo P31/P279 cae en el conjunto y
+    todos sus ancestros P279 (y sus tipos P31), para que expand_p279_paths pueda
+    recorrer el linaje completo también offline. Recorre las fuentes solo guardando aristas.
+    """
+    parents: Dict[str, List[str]] = {}
+    keep: Set[str] = set()
+    for qid, rec in _iter_compact(sources, languages):
+        p279 = rec.get("P279", [])
+        if p279:
+            parents[qid] = p279
+        if (set(rec.get("P31", [])) | set(p279)) & classes:
+            keep.add(qid)
+            keep.update(rec.get("P31", []))
+    stack = list(keep)
+    while stack:
+        for parent in parents.get(stack.pop(), []):
+            if parent not in keep:
+                keep.add(parent)
+                stack.append(parent)
+    return keep
+
+
+def build_index(sources: List[Path], out_path: Path, languages: List[str] = LANGS,
+                classes: Optional[Set[str]] = None) -> int:
+    """
+    Construye el índice compacto y lo guarda como JSON gzip.
+    Si se pasa `classes`, se conservan las entidades cuyo P31/P279 cae en ese conjunto
+    (los dominios relevantes) más sus ancestros P279; las fuentes se leen dos veces.
+    Las páginas de desambiguación siempre se descartan.
+    """
+    keep = lineage_closure(sources, languages, classes) if classes else None
+    entities: Dict[str, Dict] = {}
+    for qid, rec in _iter_compact(sources, languages):
+        if keep is None or qid in keep:
+            entities[qid] = rec
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(out_path, "wt", encoding="utf-8") as f:
+        json.dump({"languages": languages, "entities": entities}, f, ensure_ascii=False, separators=(",", ":"))
+    return len(entities)
+
+
+# =============== TRIE DE ETIQUETAS =================
+
+class LabelTrie:
+    """Trie de caracteres sobre labels/aliases normalizados -> QIDs."""
+
+    _END = "\0"
+
+    def __init__(self):
+        self.root: Dict = {}
+
+    def insert(self, key: str, qid: str):
+        node = self.root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        bucket = node.setdefault(self._END, [])
+        if qid not in bucket:
+            bucket.append(qid)
+
+    def exact(self, key: str) -> List[str]:
+        node = self._walk(key)
+        return list(node.get(self._END, [])) if node else []
+
+    def prefix(self, key: str, limit: int) -> List[str]:
+        """QIDs cuyos labels empiezan por `key`, claves más cortas primero."""
+        node = self._walk(key)
+        if node is None:
+            return []
+        out, seen, level = [], set(), [node]
+        while level and len(out) < limit:
+            nxt = []
+            for n in level:
+                for qid in n.get(self._END, []):
+                    if qid not in seen:
+                        seen.add(qid)
+                        out.append(qid)
+                for ch in sorted(k for k in n if k != self._END):
+                    nxt.append(n[ch])
+            level = nxt
+        return out[:limit]
+
+    def _walk(self, key: str) -> Optional[Dict]:
+        node = self.root
+        for ch in key:
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node
+
+
+# =============== BACKEND DEL LINKER =================
+
+class OfflineIndex:
+    """Backend en memoria con la misma forma de respuesta que la API de Wikidata."""
+
+    def __init__(self, entities: Dict[str, Dict]):
+        self.entities = entities
+        self.label_trie = LabelTrie()
+        self.alias_trie = LabelTrie()
+        for qid, rec in entities.items():
+            for lab in rec.get("l", {}).values():
+                self.label_trie.insert(normalize_key(lab), qid)
+            for aliases in rec.get("a", {}).values():
+                for al in aliases:
+                    self.alias_trie.insert(normalize_key(al), qid)
+
+    @classmethod
+    def load(cls, path: Path) -> "OfflineIndex":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("entities", {}))
+
+    def search(self, search: str, language: str = "en", limit: int = 50) -> List[Dict]:
+        """Equivalente a wbsearchentities; acepta el prefijo `label:` de wbsearch_label_only."""
+        labels_only = search.startswith("label:")
+        key = normalize_key(search[len("label:"):] if labels_only else search)
+        if not key:
+            return []
+        qids = self.label_trie.exact(key)
+        if not labels_only:
+            qids += [q for q in self.alias_trie.exact(key) if q not in qids]
+        qids += [q for q in self.label_trie.prefix(key, limit) if q not in qids]
+        if not labels_only and len(qids) < limit:
+            qids += [q for q in self.alias_trie.prefix(key, limit) if q not in qids]
+        return [self._hit(q, language) for q in qids[:limit]]
+
+    def get_entities(self, ids: List[str], languages: List[str] = LANGS) -> Dict[str, Dict]:
+        """Equivalente a wbgetentities; los QIDs fuera del subconjunto simplemente no aparecen."""
+        out = {}
+        for qid in ids:
+            rec = self.entities.get(qid)
+            if rec is not None:
+                out[qid] = self._entity(qid, rec, languages)
+        return out
+
+    def _hit(self, qid: str, language: str) -> Dict:
+        rec = self.entities[qid]
+        label = rec["l"].get(language) or next(iter(rec["l"].values()))
+        return {
+            "id": qid,
+            "label": label,
+            "description": rec.get("d", {}).get(language, ""),
+            "aliases": rec.get("a", {}).get(language, []),
+        }
+
+    @staticmethod
+    def _entity(qid: str, rec: Dict, languages: List[str]) -> Dict:
+        claims = {}
+        for pid in KEPT_PROPERTIES:
+            vals = rec.get(pid, [])
+            if pid == "P268":
+                claims[pid] = [{"mainsnak": {"datavalue": {"value": v}}} for v in vals]
+            else:
+                claims[pid] = [{"mainsnak": {"datavalue": {"value": {"id": v}}}} for v in vals]
+        return {
+            "id": qid,
+            "labels": {lg: {"language": lg, "value": v} for lg, v in rec["l"].items() if lg in languages},
+            "descriptions": {lg: {"language": lg, "value": v} for lg, v in rec.get("d", {}).items() if lg in languages},
+            "aliases": {lg: [{"language": lg, "value": a} for a in vals] for lg, vals in rec.get("a", {}).items() if lg in languages},
+            "claims": claims,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el índice offline de Wikidata.")
+    parser.add_argument("sources", nargs="+", type=Path, help="fragmentos de dump o respuestas wbgetentities")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="ruta del índice (.json.gz)")
+    parser.add_argument("--languages", default=",".join(LANGS))
+    parser.add_argument("--classes", default="",
+                        help="QIDs P31/P279 a conservar, separados por coma (se añaden sus ancestros P279)")
+    args = parser.parse_args()
+
+    classes = {c.strip() for c in args.classes.split(",") if c.strip()} or None
+    n = build_index(args.sources, args.output, args.languages.split(","), classes)
+    print(f"✅ Índice guardado en {args.output} con {n} entidades.")
+
+
+if __name__ == "__main__":
+    main()